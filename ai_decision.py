@@ -1,52 +1,100 @@
+import time
 import pandas as pd
 import numpy as np
+from sqlalchemy import func, insert, update
 from database import StockPrice, AISignal, SessionLocal
 from datetime import datetime, timedelta
-import yfinance as yf
 from config import Config
+from market_data import get_market_data_provider
+from metrics import SIGNAL_WRITES, LLM_REQUESTS, LLM_LATENCY, LLM_TOKENS, LLM_COST, log_event
+from signal_model import SignalModel, FEATURE_LOOKBACK_DAYS, daily_panel, latest_features
 
-# Try to import scikit-learn (optional - may not be available on Python 3.13)
-try:
-    from sklearn.ensemble import RandomForestClassifier
-    from sklearn.preprocessing import StandardScaler
-    SKLEARN_AVAILABLE = True
-except ImportError:
-    SKLEARN_AVAILABLE = False
-    RandomForestClassifier = None
-    StandardScaler = None
+# Tickers per IN (...) lookup of the latest stored signals
+SIGNAL_LOOKUP_CHUNK = 500
 
 # Try to import Gemini API
 try:
     import google.generativeai as genai
+    from google.api_core.exceptions import DeadlineExceeded
     if Config.GEMINI_API_KEY:
-        genai.configure(api_key=Config.GEMINI_API_KEY)
+        # gRPC keeps one multiplexed HTTP/2 channel open for all requests
+        genai.configure(api_key=Config.GEMINI_API_KEY, transport='grpc')
         GEMINI_AVAILABLE = True
     else:
         GEMINI_AVAILABLE = False
 except ImportError:
     GEMINI_AVAILABLE = False
+    DeadlineExceeded = TimeoutError
+
+def conviction(signal):
+    """How far a signal's confidence is from a coin flip, 0.0 - 1.0"""
+    return abs(signal['confidence'] - 0.5) * 2
+
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token) when the API reports none"""
+    return max(1, len(text) // 4)
+
+
+class LLMBudget:
+    """Wall-clock and token allowance for the LLM calls of one signal run"""
+
+    def __init__(self, seconds=None, tokens=None):
+        self.seconds = Config.GEMINI_RUN_SECONDS if seconds is None else seconds
+        self.tokens = Config.GEMINI_RUN_TOKENS if tokens is None else tokens
+        self.started = time.monotonic()
+        self.tokens_used = 0
+        self.calls = 0
+        self.skipped = 0
+
+    def remaining_seconds(self):
+        return self.seconds - (time.monotonic() - self.started)
+
+    def allows(self, tokens):
+        return self.remaining_seconds() > 0 and self.tokens_used + tokens <= self.tokens
+
+    def charge(self, tokens):
+        self.tokens_used += tokens
+        self.calls += 1
+
+    def summary(self):
+        return {
+            'calls': self.calls,
+            'skipped': self.skipped,
+            'tokens': self.tokens_used,
+            'token_budget': self.tokens,
+            'seconds': round(time.monotonic() - self.started, 3),
+            'second_budget': self.seconds
+        }
+
 
 class AIDecisionMaker:
     def __init__(self):
-        if SKLEARN_AVAILABLE:
-            self.model = RandomForestClassifier(n_estimators=100, random_state=42)
-            self.scaler = StandardScaler()
-        else:
-            self.model = None
-            self.scaler = None
-            print("Warning: scikit-learn not available. Using technical indicators only.")
-        self.is_trained = False
+        # Trained offline by signal_model.py; without it signals come from the indicator rules
+        self.model = SignalModel.load()
+        self.is_trained = self.model is not None
+        if not self.is_trained:
+            print("Warning: no trained signal model (python signal_model.py train). Using technical indicators only.")
         self.use_gemini = GEMINI_AVAILABLE and Config.GEMINI_API_KEY
+        self._gemini_model = None  # created once so calls share the client's gRPC (HTTP/2) channel
+        self.market_data = get_market_data_provider()
     
-    def get_technical_indicators(self, ticker, period_days=30):
+    def get_daily_history(self, tickers, period_days=30):
+        """Get daily bars for a batch of tickers"""
+        start = self.market_data.now() - timedelta(days=period_days)
+        return self.market_data.get_bars(tickers, start, interval='1d')
+    
+    def get_technical_indicators(self, ticker, period_days=30, hist=None):
         """Get technical indicators for a stock"""
         try:
-            stock = yf.Ticker(ticker)
-            hist = stock.history(period=f"{period_days}d")
+            if hist is None:
+                hist = self.get_daily_history([ticker], period_days).get(ticker)
             
-            if hist.empty or len(hist) < 10:
+            if hist is None or hist.empty or len(hist) < 10:
                 return None
             
+            hist = hist.copy()
+            
             # Calculate indicators
             hist['SMA_5'] = hist['Close'].rolling(window=5).mean()
             hist['SMA_20'] = hist['Close'].rolling(window=20).mean()
@@ -87,13 +135,8 @@ class AIDecisionMaker:
         macd_signal = macd.ewm(span=signal).mean()
         return macd, macd_signal
     
-    def generate_signal(self, ticker):
-        """Generate trading signal for a stock"""
-        indicators = self.get_technical_indicators(ticker)
-        
-        if not indicators:
-            return None
-        
+    def score_indicators(self, indicators):
+        """Rule-based signal from technical indicators: (signal_type, confidence, signals)"""
         # Simple rule-based system (can be enhanced with ML)
         signals = []
         confidence = 0.5
@@ -143,62 +186,187 @@ class AIDecisionMaker:
             signal_type = 'hold'
         
         confidence = max(0.0, min(1.0, abs(confidence)))
-        reasoning = "; ".join(signals) if signals else "No strong signals"
+        return signal_type, confidence, signals
+    
+    def generate_signal(self, ticker, hist=None, persist=True):
+        """Generate trading signal for a stock (persist=False leaves saving to the caller)"""
+        if self.is_trained:
+            if hist is None:
+                hist = self.get_daily_history([ticker], FEATURE_LOOKBACK_DAYS).get(ticker)
+            signals = self.model_signals({ticker: hist})
+            signal = signals[0] if signals else None
+        else:
+            signal = self.rule_signal(ticker, hist=hist)
         
-        # Enhance with Gemini AI if available
-        if self.use_gemini:
-            gemini_reasoning = self.get_gemini_analysis(ticker, indicators, signals)
-            if gemini_reasoning:
-                reasoning += f" | AI Analysis: {gemini_reasoning}"
+        if not signal:
+            return None
+        self.explain_signals([signal])
+        if persist:
+            self.save_signals([signal])
+        return signal
+    
+    def rule_signal(self, ticker, hist=None):
+        """Signal from the indicator rules in score_indicators"""
+        indicators = self.get_technical_indicators(ticker, hist=hist)
         
-        # Save signal to database
-        db = SessionLocal()
-        try:
-            ai_signal = AISignal(
-                ticker=ticker,
-                signal_type=signal_type,
-                confidence=confidence,
-                reasoning=reasoning,
-                timestamp=datetime.utcnow()
-            )
-            db.add(ai_signal)
-            db.commit()
-        except Exception as e:
-            db.rollback()
-            print(f"Error saving signal: {e}")
-        finally:
-            db.close()
+        if not indicators:
+            return None
         
+        signal_type, confidence, signals = self.score_indicators(indicators)
         return {
             'ticker': ticker,
             'signal_type': signal_type,
             'confidence': confidence,
-            'reasoning': reasoning,
+            'reasoning': "; ".join(signals) if signals else "No strong signals",
             'indicators': indicators
         }
     
+    def model_signals(self, history):
+        """Score every ticker in {ticker: daily bars} with one call to the local model"""
+        close, volume = daily_panel(history)
+        if close.empty:
+            return []
+        tickers, X, prices, volumes = latest_features(close, volume)
+        probabilities = self.model.predict(X)
+        
+        results = []
+        for ticker, features, price, day_volume, p in zip(tickers, X, prices, volumes, probabilities):
+            p = float(p)
+            if p > 0.6:
+                signal_type = 'buy'
+            elif p < 0.4:
+                signal_type = 'sell'
+            else:
+                signal_type = 'hold'
+            indicators = {'price': float(price), 'volume': float(day_volume)}
+            indicators.update({name: float(value) for name, value in zip(self.model.artifact['features'], features)})
+            results.append({
+                'ticker': ticker,
+                'signal_type': signal_type,
+                'confidence': p,
+                'reasoning': (f"Local model: {p:.0%} chance that a {self.model.target_percent:g}%+ move "
+                              f"over {self.model.horizon_days} trading days is up"),
+                'indicators': indicators
+            })
+        return results
+    
+    def explain_signals(self, signals, budget=None):
+        """Add Gemini's analysis to the highest-conviction signals, within the run's budget
+        
+        Only buy and sell signals with at least GEMINI_MIN_CONVICTION are
+        considered, strongest first, up to GEMINI_TOP_N. A signal that does not
+        fit the remaining time or tokens keeps its rule or model reasoning.
+        """
+        if not self.use_gemini or not signals:
+            return
+        budget = budget or LLMBudget()
+        candidates = [s for s in signals
+                      if s['signal_type'] != 'hold' and conviction(s) >= Config.GEMINI_MIN_CONVICTION]
+        candidates.sort(key=conviction, reverse=True)
+        
+        for signal in candidates[:Config.GEMINI_TOP_N]:
+            prompt = self.gemini_prompt(signal['ticker'], signal['indicators'], [signal['reasoning']])
+            if not budget.allows(estimate_tokens(prompt) + Config.GEMINI_MAX_OUTPUT_TOKENS):
+                budget.skipped += 1
+                LLM_REQUESTS.inc(provider='gemini', result='over_budget')
+                continue
+            gemini_reasoning, tokens = self.get_gemini_analysis(prompt, timeout=budget.remaining_seconds())
+            budget.charge(tokens)
+            if gemini_reasoning:
+                signal['reasoning'] += f" | AI Analysis: {gemini_reasoning}"
+        
+        if budget.skipped:
+            print(f"⚠️  Gemini budget reached: {budget.skipped} signal(s) kept rule-based reasoning")
+        log_event('llm_budget', provider='gemini', candidates=len(candidates), **budget.summary())
+    
     def generate_signals_for_stocks(self, tickers, limit=50):
         """Generate signals for multiple stocks"""
-        results = []
-        for i, ticker in enumerate(tickers[:limit]):
-            if i % 10 == 0:
-                print(f"Generating signals: {i}/{min(len(tickers), limit)}")
-            
-            signal = self.generate_signal(ticker)
-            if signal:
-                results.append(signal)
+        tickers = tickers[:limit]
         
+        # Fetch daily history for every ticker in one batched request
+        history = self.get_daily_history(tickers, FEATURE_LOOKBACK_DAYS if self.is_trained else 30)
+        
+        if self.is_trained:
+            results = self.model_signals(history)
+        else:
+            results = []
+            for i, ticker in enumerate(tickers):
+                if i % 10 == 0:
+                    print(f"Generating signals: {i}/{len(tickers)}")
+                
+                signal = self.rule_signal(ticker, hist=history.get(ticker))
+                if signal:
+                    results.append(signal)
+        
+        self.explain_signals(results)
+        self.save_signals(results)
         return results
     
-    def get_gemini_analysis(self, ticker, indicators, signals):
-        """Get AI analysis from Gemini API"""
-        if not self.use_gemini:
-            return None
+    def latest_signals(self, db, tickers):
+        """Most recent stored signal row per ticker"""
+        latest = {}
+        for i in range(0, len(tickers), SIGNAL_LOOKUP_CHUNK):
+            chunk = tickers[i:i + SIGNAL_LOOKUP_CHUNK]
+            ids = (db.query(func.max(AISignal.id))
+                   .filter(AISignal.ticker.in_(chunk))
+                   .group_by(AISignal.ticker))
+            for row in db.query(AISignal).filter(AISignal.id.in_(ids.scalar_subquery())):
+                latest[row.ticker] = row
+        return latest
+    
+    def save_signals(self, signals):
+        """Store signals that changed; fold unchanged ones into their previous row
         
+        A signal is new when its type differs from the ticker's latest stored
+        signal or its confidence moved by at least SIGNAL_CONFIDENCE_CHANGE.
+        Otherwise the stored row's last_seen_at and seen_count are bumped.
+        New rows go out as one batched INSERT, bumps as one UPDATE.
+        """
+        if not signals:
+            return {'inserted': 0, 'unchanged': 0}
+        now = datetime.utcnow()
+        db = SessionLocal()
         try:
-            model = genai.GenerativeModel('gemini-pro')
+            latest = self.latest_signals(db, sorted({s['ticker'] for s in signals}))
+            rows, unchanged_ids = [], []
+            for signal in signals:
+                previous = latest.get(signal['ticker'])
+                if (previous is not None and previous.signal_type == signal['signal_type']
+                        and abs((previous.confidence or 0) - signal['confidence']) < Config.SIGNAL_CONFIDENCE_CHANGE):
+                    unchanged_ids.append(previous.id)
+                    continue
+                rows.append({
+                    'ticker': signal['ticker'],
+                    'signal_type': signal['signal_type'],
+                    'confidence': signal['confidence'],
+                    'reasoning': signal['reasoning'][:1000],
+                    'timestamp': now,
+                    'last_seen_at': now,
+                    'seen_count': 1
+                })
             
-            prompt = f"""
+            if rows:
+                db.execute(insert(AISignal), rows)
+            if unchanged_ids:
+                db.execute(
+                    update(AISignal)
+                    .where(AISignal.id.in_(unchanged_ids))
+                    .values(last_seen_at=now, seen_count=func.coalesce(AISignal.seen_count, 1) + 1)
+                    .execution_options(synchronize_session=False)
+                )
+            db.commit()
+            SIGNAL_WRITES.inc(len(rows), result='inserted')
+            SIGNAL_WRITES.inc(len(unchanged_ids), result='unchanged')
+            return {'inserted': len(rows), 'unchanged': len(unchanged_ids)}
+        except Exception as e:
+            db.rollback()
+            print(f"Error saving signals: {e}")
+            return {'inserted': 0, 'unchanged': 0}
+        finally:
+            db.close()
+    
+    def gemini_prompt(self, ticker, indicators, signals):
+        return f"""
             Analyze the stock {ticker} with the following technical indicators:
             - Current Price: ${indicators.get('price', 'N/A')}
             - RSI: {indicators.get('rsi', 'N/A')}
@@ -211,18 +379,50 @@ class AIDecisionMaker:
             Provide a brief trading recommendation (buy/sell/hold) with 1-2 sentence reasoning.
             Focus on risk assessment and market conditions.
             """
-            
-            response = model.generate_content(prompt)
-            return response.text.strip()
+    
+    def _generate_content(self, prompt, timeout=None):
+        if self._gemini_model is None:
+            self._gemini_model = genai.GenerativeModel('gemini-pro')
+        # The deadline goes on the request itself, so a slow call is cancelled rather than left running
+        return self._gemini_model.generate_content(
+            prompt, generation_config={'max_output_tokens': Config.GEMINI_MAX_OUTPUT_TOKENS},
+            request_options={'timeout': timeout} if timeout is not None else None)
+    
+    def get_gemini_analysis(self, prompt, timeout=None):
+        """Get AI analysis from Gemini API: (text or None, tokens used)"""
+        if not self.use_gemini:
+            return None, 0
+        
+        started = time.perf_counter()
+        prompt_tokens = estimate_tokens(prompt)
+        try:
+            response = self._generate_content(prompt, timeout=timeout)
+            text = response.text.strip()
+            usage = getattr(response, 'usage_metadata', None)
+            prompt_tokens = getattr(usage, 'prompt_token_count', None) or prompt_tokens
+            output_tokens = getattr(usage, 'candidates_token_count', None) or estimate_tokens(text)
+            result = 'ok'
+        except DeadlineExceeded:
+            # The server may have generated up to the limit before the deadline
+            print(f"Gemini analysis timed out after {timeout:.1f}s")
+            text, output_tokens, result = None, Config.GEMINI_MAX_OUTPUT_TOKENS, 'timeout'
         except Exception as e:
             print(f"Error getting Gemini analysis: {e}")
-            return None
+            text, output_tokens, result = None, 0, 'error'
+        
+        LLM_REQUESTS.inc(provider='gemini', result=result)
+        LLM_LATENCY.observe(time.perf_counter() - started, provider='gemini')
+        LLM_TOKENS.inc(prompt_tokens, provider='gemini', kind='prompt')
+        LLM_TOKENS.inc(output_tokens, provider='gemini', kind='output')
+        LLM_COST.inc((prompt_tokens + output_tokens) / 1000 * Config.GEMINI_COST_PER_1K_TOKENS, provider='gemini')
+        return text, prompt_tokens + output_tokens
     
     def get_recent_signals(self, limit=100):
         """Get recent AI signals from database"""
         db = SessionLocal()
         try:
-            signals = db.query(AISignal).order_by(AISignal.timestamp.desc()).limit(limit).all()
+            # A repeated signal keeps its first timestamp; last_seen_at is when it was last produced
+            signals = db.query(AISignal).order_by(func.coalesce(AISignal.last_seen_at, AISignal.timestamp).desc()).limit(limit).all()
             return [s.to_dict() for s in signals]
         finally:
             db.close()
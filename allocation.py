@@ -0,0 +1,123 @@
+"""
+Ranked capital allocation for the momentum strategy.
+
+Candidates are scored by momentum strength and intraday liquidity, then
+integer share counts are solved for the whole list at once:
+
+1. Rank by score (ALLOCATION_MOMENTUM_WEIGHT x momentum percentile +
+   ALLOCATION_LIQUIDITY_WEIGHT x dollar-volume percentile) and keep the top
+   MAX_POSITIONS.
+2. Split the budget (buying power less CASH_RESERVE_PERCENT) equally or by
+   score (ALLOCATION_WEIGHTING), capped at MAX_POSITION_PERCENT per name.
+3. Drop candidates whose target cannot buy one share or reach
+   MIN_POSITION_NOTIONAL and re-split their capital among the rest, instead
+   of forcing a one-share position.
+4. Round down to whole shares and hand leftover cash back one share at a
+   time in priority order.
+
+Orders are then placed in priority order so the best signals fill first.
+The backtester uses the same functions, so backtests size positions exactly
+like the live strategy.
+"""
+
+import numpy as np
+from config import Config
+
+
+def _percentile_rank(values):
+    """Rank of each value scaled to [0, 1]; NaN ranks lowest"""
+    values = np.nan_to_num(np.asarray(values, dtype=np.float64), nan=-np.inf)
+    if len(values) < 2:
+        return np.ones(len(values))
+    ranks = np.empty(len(values))
+    ranks[np.argsort(values, kind='stable')] = np.arange(len(values))
+    return ranks / (len(values) - 1)
+
+
+def score_candidates(change_percent, dollar_volume=None):
+    """Blend of momentum and liquidity percentiles (higher is better)"""
+    momentum = _percentile_rank(change_percent)
+    if dollar_volume is None:
+        liquidity = np.full(len(momentum), 0.5)
+    else:
+        liquidity = _percentile_rank(np.log1p(np.clip(np.asarray(dollar_volume, dtype=np.float64), 0, None)))
+    return Config.ALLOCATION_MOMENTUM_WEIGHT * momentum + Config.ALLOCATION_LIQUIDITY_WEIGHT * liquidity
+
+
+def allocate_shares(prices, scores, buying_power, max_positions=None, min_notional=None,
+                    max_position_percent=None, weighting=None, cash_reserve_percent=None):
+    """Integer share allocation under budget, position-count and size constraints
+
+    Returns (order, shares): candidate indices in priority order (only those
+    that received shares) and a share count per candidate.
+    """
+    prices = np.asarray(prices, dtype=np.float64)
+    scores = np.asarray(scores, dtype=np.float64)
+    max_positions = Config.MAX_POSITIONS if max_positions is None else max_positions
+    min_notional = Config.MIN_POSITION_NOTIONAL if min_notional is None else min_notional
+    max_position_percent = Config.MAX_POSITION_PERCENT if max_position_percent is None else max_position_percent
+    weighting = weighting or Config.ALLOCATION_WEIGHTING
+    cash_reserve_percent = Config.CASH_RESERVE_PERCENT if cash_reserve_percent is None else cash_reserve_percent
+
+    shares = np.zeros(len(prices), dtype=np.int64)
+    budget = buying_power * (1 - cash_reserve_percent / 100)
+    if len(prices) == 0 or budget <= 0:
+        return np.zeros(0, dtype=np.int64), shares
+
+    order = np.lexsort((np.arange(len(prices)), -np.nan_to_num(scores, nan=-np.inf)))
+    order = order[np.isfinite(prices[order]) & (prices[order] > 0)]
+    if max_positions:
+        order = order[:max_positions]
+    cap = budget * max_position_percent / 100 if max_position_percent else np.inf
+
+    # Dropping candidates only raises everyone else's target, so this settles in a few passes
+    active = order
+    target = np.zeros(0)
+    while len(active):
+        weights = np.ones(len(active)) if weighting == 'equal' else np.maximum(scores[active], 1e-9)
+        target = np.minimum(budget * weights / weights.sum(), cap)
+        feasible = target >= np.maximum(prices[active], min_notional)
+        if feasible.all():
+            break
+        active, target = active[feasible], target[feasible]
+    if not len(active):
+        return active, shares
+
+    shares[active] = np.floor(target / prices[active])
+
+    # Spend what rounding left over, one extra share per name per pass, best first
+    leftover = budget - float(np.sum(shares * prices))
+    while True:
+        price = prices[active]
+        eligible = active[(price <= leftover) & ((shares[active] + 1) * price <= cap)]
+        if not len(eligible):
+            break
+        take = eligible[np.cumsum(prices[eligible]) <= leftover]
+        shares[take] += 1
+        leftover -= float(np.sum(prices[take]))
+
+    return active[shares[active] > 0], shares
+
+
+def plan_purchases(candidates, buying_power, max_positions=None):
+    """Allocation plan for momentum candidates, in the order orders should be sent
+
+    candidates are calculate_momentum() dicts; 'dollar_volume' is optional.
+    """
+    if not candidates:
+        return []
+    prices = np.array([c['current_price'] for c in candidates], dtype=np.float64)
+    change = np.array([c['change_percent'] for c in candidates], dtype=np.float64)
+    dollar_volume = np.array([c.get('dollar_volume') if c.get('dollar_volume') is not None else np.nan
+                              for c in candidates], dtype=np.float64)
+    scores = score_candidates(change, None if np.isnan(dollar_volume).all() else dollar_volume)
+    order, shares = allocate_shares(prices, scores, buying_power, max_positions=max_positions)
+
+    return [{
+        'ticker': candidates[i]['ticker'],
+        'rank': rank,
+        'score': float(scores[i]),
+        'shares': int(shares[i]),
+        'estimated_price': float(prices[i]),
+        'estimated_cost': float(shares[i] * prices[i])
+    } for rank, i in enumerate(order, start=1)]
@@ -4,15 +4,44 @@ from alpaca.trade.enums import OrderSide, TimeInForce
 from config import Config
 from database import Position, Trade, SessionLocal
 from datetime import datetime
+from metrics import ORDER_SUBMIT_LATENCY, ORDER_FILL_LATENCY, ORDER_FAILURES, log_event
+from http_client import pool_sdk_client
+from order_store import save_orders
+
+def create_trade_client():
+    """Build the broker client selected by Config.BROKER_BACKEND"""
+    if Config.BROKER_BACKEND == 'simulator':
+        from broker_sim import get_simulated_broker
+        return get_simulated_broker()
+    
+    return pool_sdk_client(TradeClient(
+        api_key=Config.ALPACA_API_KEY,
+        secret_key=Config.ALPACA_SECRET_KEY,
+        base_url=Config.ALPACA_BASE_URL,
+        paper=True
+    ))
 
 class AlpacaClient:
-    def __init__(self):
-        self.client = TradeClient(
-            api_key=Config.ALPACA_API_KEY,
-            secret_key=Config.ALPACA_SECRET_KEY,
-            base_url=Config.ALPACA_BASE_URL,
-            paper=True
-        )
+    def __init__(self, client=None):
+        # Any object with the TradeClient interface can be injected (e.g. the broker simulator)
+        self.client = client or create_trade_client()
+    
+    def _submit(self, order_data, side, order_type):
+        """Submit an order and record submission and fill latency"""
+        try:
+            with ORDER_SUBMIT_LATENCY.time(side=side, order_type=order_type):
+                order = self.client.submit_order(order_data=order_data)
+        except Exception:
+            ORDER_FAILURES.inc(side=side, order_type=order_type)
+            raise
+        
+        submitted_at = getattr(order, 'submitted_at', None)
+        filled_at = getattr(order, 'filled_at', None)
+        if submitted_at and filled_at:
+            ORDER_FILL_LATENCY.observe((filled_at - submitted_at).total_seconds(), side=side, order_type=order_type)
+        log_event('order_submitted', symbol=order.symbol, side=side, order_type=order_type,
+                  qty=str(order.qty), status=str(order.status))
+        return order
     
     def get_account(self):
         """Get account information"""
@@ -47,85 +76,35 @@ class AlpacaClient:
             print(f"Error getting positions: {e}")
             return []
     
-    def place_market_order(self, symbol, qty, side='buy'):
-        """Place a market order"""
+    def place_market_order(self, symbol, qty, side='buy', strategy=None, client_order_id=None, estimated_price=None,
+                           signal_at=None):
+        """Place a market order (strategy is recorded on the trade for attribution)
+        
+        A client_order_id makes the order idempotent: the broker rejects a
+        second order with the same ID. An estimated_price (and the signal_at
+        time of the quote it came from) is stored with the order in the
+        order store for execution analytics.
+        """
         try:
             order_data = MarketOrderRequest(
                 symbol=symbol,
                 qty=qty,
                 side=OrderSide.BUY if side == 'buy' else OrderSide.SELL,
-                time_in_force=TimeInForce.DAY
+                time_in_force=TimeInForce.DAY,
+                client_order_id=client_order_id
             )
             
-            order = self.client.submit_order(order_data=order_data)
+            order = self._submit(order_data, side, 'market')
             
-            # Save to database
-            db = SessionLocal()
-            try:
-                trade = Trade(
-                    ticker=symbol,
-                    action=side,
-                    quantity=qty,
-                    price=float(order.filled_avg_price) if order.filled_avg_price else 0,
-                    timestamp=datetime.utcnow()
-                )
-                db.add(trade)
-                
-                # Update or create position
-                if side == 'buy':
-                    position = db.query(Position).filter_by(
-                        ticker=symbol,
-                        status='open'
-                    ).first()
-                    
-                    if position:
-                        # Update existing position
-                        total_qty = position.quantity + qty
-                        total_cost = (position.entry_price * position.quantity) + (float(order.filled_avg_price) * qty)
-                        position.entry_price = total_cost / total_qty
-                        position.quantity = total_qty
-                    else:
-                        # Create new position
-                        position = Position(
-                            ticker=symbol,
-                            quantity=qty,
-                            entry_price=float(order.filled_avg_price) if order.filled_avg_price else 0,
-                            position_type='long',
-                            status='open'
-                        )
-                        db.add(position)
-                else:  # sell
-                    position = db.query(Position).filter_by(
-                        ticker=symbol,
-                        status='open'
-                    ).first()
-                    
-                    if position:
-                        position.quantity -= qty
-                        if position.quantity <= 0:
-                            position.status = 'closed'
-                            position.closed_at = datetime.utcnow()
-                    else:
-                        # Position not in DB but exists in Alpaca - mark as closed
-                        position = Position(
-                            ticker=symbol,
-                            quantity=qty,
-                            entry_price=float(order.filled_avg_price) if order.filled_avg_price else 0,
-                            position_type='long',
-                            status='closed',
-                            closed_at=datetime.utcnow()
-                        )
-                        db.add(position)
-                
-                db.commit()
-            except Exception as e:
-                db.rollback()
-                print(f"Error saving trade to database: {e}")
-            finally:
-                db.close()
+            self.record_trade(symbol, qty, side, float(order.filled_avg_price) if order.filled_avg_price else 0,
+                              strategy=strategy, client_order_id=client_order_id)
+            if estimated_price:
+                save_orders([self._order_dict(order)], plans={str(order.id): {
+                    'estimated_price': float(estimated_price), 'signal_at': signal_at, 'strategy': strategy}})
             
             return {
                 'id': order.id,
+                'client_order_id': getattr(order, 'client_order_id', client_order_id),
                 'symbol': order.symbol,
                 'qty': float(order.qty),
                 'filled_qty': float(order.filled_qty),
@@ -137,6 +116,99 @@ class AlpacaClient:
             print(f"Error placing market order: {e}")
             return None
     
+    def record_trade(self, symbol, qty, side, price, strategy=None, client_order_id=None):
+        """Save a market order fill as a trade and update the position in the database
+        
+        A trade with a client_order_id is only recorded once.
+        """
+        db = SessionLocal()
+        try:
+            if client_order_id and db.query(Trade.id).filter_by(client_order_id=client_order_id).first():
+                return
+            trade = Trade(
+                ticker=symbol,
+                action=side,
+                quantity=qty,
+                price=price,
+                strategy=strategy,
+                client_order_id=client_order_id,
+                timestamp=datetime.utcnow()
+            )
+            db.add(trade)
+            
+            # Update or create position
+            if side == 'buy':
+                position = db.query(Position).filter_by(
+                    ticker=symbol,
+                    status='open'
+                ).first()
+                
+                if position:
+                    # Update existing position
+                    total_qty = position.quantity + qty
+                    total_cost = (position.entry_price * position.quantity) + (price * qty)
+                    position.entry_price = total_cost / total_qty
+                    position.quantity = total_qty
+                else:
+                    # Create new position
+                    position = Position(
+                        ticker=symbol,
+                        quantity=qty,
+                        entry_price=price,
+                        position_type='long',
+                        status='open'
+                    )
+                    db.add(position)
+            else:  # sell
+                position = db.query(Position).filter_by(
+                    ticker=symbol,
+                    status='open'
+                ).first()
+                
+                if position:
+                    position.quantity -= qty
+                    if position.quantity <= 0:
+                        position.status = 'closed'
+                        position.closed_at = datetime.utcnow()
+                else:
+                    # Position not in DB but exists in Alpaca - mark as closed
+                    position = Position(
+                        ticker=symbol,
+                        quantity=qty,
+                        entry_price=price,
+                        position_type='long',
+                        status='closed',
+                        closed_at=datetime.utcnow()
+                    )
+                    db.add(position)
+            
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error saving trade to database: {e}")
+        finally:
+            db.close()
+    
+    def get_order_by_client_id(self, client_order_id):
+        """Look up an order by its client order ID; None if the broker has no such order"""
+        try:
+            order = self.client.get_order_by_client_id(client_order_id)
+        except Exception as e:
+            if getattr(e, 'status_code', None) != 404:
+                print(f"Error looking up order {client_order_id}: {e}")
+            return None
+        return {
+            'id': order.id,
+            'client_order_id': order.client_order_id,
+            'symbol': order.symbol,
+            'qty': float(order.qty),
+            'filled_qty': float(order.filled_qty or 0),
+            'filled_avg_price': float(order.filled_avg_price) if order.filled_avg_price else None,
+            'stop_price': float(order.stop_price) if getattr(order, 'stop_price', None) else None,
+            'status': order.status,
+            'side': order.side
+        }
+    
     def place_limit_order(self, symbol, qty, limit_price, side='buy'):
         """Place a limit order"""
         try:
@@ -148,7 +220,7 @@ class AlpacaClient:
                 limit_price=limit_price
             )
             
-            order = self.client.submit_order(order_data=order_data)
+            order = self._submit(order_data, side, 'limit')
             
             return {
                 'id': order.id,
@@ -171,7 +243,7 @@ class AlpacaClient:
             print(f"Error canceling order: {e}")
             return False
     
-    def place_stop_loss_order(self, symbol, qty, stop_price):
+    def place_stop_loss_order(self, symbol, qty, stop_price, client_order_id=None):
         """Place a stop-loss order"""
         try:
             stop_order = StopLossRequest(
@@ -179,10 +251,11 @@ class AlpacaClient:
                 qty=qty,
                 side=OrderSide.SELL,
                 stop_price=stop_price,
-                time_in_force=TimeInForce.GTC
+                time_in_force=TimeInForce.GTC,
+                client_order_id=client_order_id
             )
             
-            order = self.client.submit_order(order_data=stop_order)
+            order = self._submit(stop_order, 'sell', 'stop')
             
             return {
                 'id': order.id,
@@ -196,23 +269,75 @@ class AlpacaClient:
             print(f"Error placing stop-loss order: {e}")
             return None
     
-    def get_orders(self, status='all'):
-        """Get orders"""
+    def replace_stop_order(self, order_id, symbol, qty, stop_price):
+        """Move an open stop order to a new stop price
+        
+        Uses the broker's replace endpoint when the client has one, otherwise
+        cancels the old stop and places a new one.
+        """
+        stop_price = round(stop_price, 2)
+        if order_id and hasattr(self.client, 'replace_order_by_id'):
+            try:
+                from alpaca.trade.requests import ReplaceOrderRequest
+                
+                order = self.client.replace_order_by_id(order_id, ReplaceOrderRequest(stop_price=stop_price))
+                return {'id': order.id, 'symbol': symbol, 'qty': float(qty), 'stop_price': stop_price,
+                        'status': order.status, 'side': order.side}
+            except Exception as e:
+                print(f"Replace failed for {symbol} stop, re-placing instead: {e}")
+        
+        if order_id and not self.cancel_order(order_id):
+            return None
+        return self.place_stop_loss_order(symbol, qty, stop_price)
+    
+    def get_assets(self):
+        """Active assets by symbol with tradability flags, or None if they cannot be listed"""
         try:
-            orders = self.client.list_orders(status=status)
-            return [{
-                'id': order.id,
-                'symbol': order.symbol,
-                'qty': float(order.qty),
-                'filled_qty': float(order.filled_qty),
-                'filled_avg_price': float(order.filled_avg_price) if order.filled_avg_price else None,
-                'status': order.status,
-                'side': order.side,
-                'order_type': order.order_type,
-                'time_in_force': order.time_in_force,
-                'created_at': order.created_at.isoformat() if order.created_at else None
-            } for order in orders]
+            assets = self.client.list_assets(status='active')
+            return {asset.symbol: {
+                'tradable': bool(asset.tradable),
+                'shortable': bool(getattr(asset, 'shortable', False)),
+                'easy_to_borrow': bool(getattr(asset, 'easy_to_borrow', False))
+            } for asset in assets}
+        except Exception as e:
+            print(f"Error listing assets: {e}")
+            return None
+    
+    def _order_dict(self, order):
+        return {
+            'id': order.id,
+            'client_order_id': getattr(order, 'client_order_id', None),
+            'symbol': order.symbol,
+            'qty': float(order.qty),
+            'filled_qty': float(order.filled_qty or 0),
+            'filled_avg_price': float(order.filled_avg_price) if order.filled_avg_price else None,
+            'status': order.status,
+            'side': order.side,
+            'order_type': order.order_type,
+            'limit_price': float(order.limit_price) if getattr(order, 'limit_price', None) else None,
+            'stop_price': float(order.stop_price) if getattr(order, 'stop_price', None) else None,
+            'time_in_force': order.time_in_force,
+            'created_at': order.created_at.isoformat() if order.created_at else None,
+            'updated_at': order.updated_at.isoformat() if getattr(order, 'updated_at', None) else None,
+            'filled_at': order.filled_at.isoformat() if getattr(order, 'filled_at', None) else None
+        }
+    
+    def get_orders(self, status='all', after=None, limit=None, direction=None):
+        """Get orders (after: ISO timestamp, exclusive; direction: 'asc' or 'desc')"""
+        try:
+            params = {key: value for key, value in
+                      (('after', after), ('limit', limit), ('direction', direction)) if value is not None}
+            orders = self.client.list_orders(status=status, **params)
+            return [self._order_dict(order) for order in orders]
         except Exception as e:
             print(f"Error getting orders: {e}")
             return []
+    
+    def get_order(self, order_id):
+        """One order by broker ID, or None"""
+        try:
+            return self._order_dict(self.client.get_order_by_id(order_id))
+        except Exception as e:
+            print(f"Error getting order {order_id}: {e}")
+            return None
 
@@ -1,14 +1,23 @@
 # MangoTrades V3 - Automated Trading System
-from flask import Flask, jsonify, request, send_file
+from flask import Flask, jsonify, request, send_file, Response
 from flask_cors import CORS
-from database import init_db, get_db, StockPrice, Position, Trade, AISignal
+from database import init_db, get_read_db, StockPrice, Position, Trade, AISignal, JobRun, ScanShard, StrategyRun, RunOrder
 from stock_checker import StockChecker
 from alpaca_client import AlpacaClient
 from ai_decision import AIDecisionMaker
 from trading_strategy import MomentumStrategy
+from metrics import REGISTRY
+from order_store import sync_orders, query_orders, daily_stats
+from execution_analytics import order_executions, daily_summary
+from profiler import profile_run, list_profiles, profile_path
+from config import Config
 from datetime import datetime, timedelta
 from sqlalchemy import func
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from functools import wraps
+from werkzeug.exceptions import HTTPException
 import os
+import threading
 
 app = Flask(__name__, static_folder='static')
 CORS(app)
@@ -22,10 +31,55 @@ momentum_strategy = MomentumStrategy()
 # Initialize database
 init_db()
 
+# The shared components keep per-run state (bar cache, bought tickers, scan time), so gthread
+# workers run one strategy, signal or stock-check request at a time per process
+strategy_lock = threading.Lock()
+signals_lock = threading.Lock()
+stock_check_lock = threading.Lock()
+
+def exclusive(lock):
+    """Run the route only while no other request holds lock; 409 otherwise"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not lock.acquire(blocking=False):
+                return jsonify({'error': 'Another run is in progress, try again when it finishes',
+                                'success': False}), 409
+            try:
+                return view(*args, **kwargs)
+            finally:
+                lock.release()
+        return wrapper
+    return decorator
+
+@app.errorhandler(PoolTimeoutError)
+@app.errorhandler(OperationalError)
+def database_busy(e):
+    """Read pool exhausted or a read hit its statement timeout: shed the request instead of queueing"""
+    if not getattr(e, 'read_session', False):
+        # Not a dashboard read (e.g. a write hit "database is locked"); report it as the error it is
+        print(f"Database error: {e}")
+        return jsonify({'error': str(e)}), 500
+    print(f"Database busy: {e}")
+    return jsonify({'error': 'Database busy, try again shortly'}), 503
+
+@app.errorhandler(Exception)
+def unhandled_error(e):
+    """Any other exception a route doesn't handle itself is answered as a JSON 500"""
+    if isinstance(e, HTTPException):
+        return e
+    print(f"Error handling {request.path}: {e}")
+    return jsonify({'error': str(e)}), 500
+
 @app.route('/api/health', methods=['GET'])
 def health():
     return jsonify({'status': 'healthy', 'timestamp': datetime.utcnow().isoformat()})
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Prometheus metrics for this process"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/api/account', methods=['GET'])
 def get_account():
     """Get Alpaca account information"""
@@ -37,7 +91,7 @@ def get_account():
 @app.route('/api/positions', methods=['GET'])
 def get_positions():
     """Get all positions"""
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         positions = db.query(Position).filter_by(status='open').all()
         return jsonify([p.to_dict() for p in positions])
@@ -47,7 +101,7 @@ def get_positions():
 @app.route('/api/positions/<ticker>', methods=['GET'])
 def get_position(ticker):
     """Get position for a specific ticker"""
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         position = db.query(Position).filter_by(ticker=ticker.upper(), status='open').first()
         if position:
@@ -59,10 +113,14 @@ def get_position(ticker):
 @app.route('/api/trades', methods=['GET'])
 def get_trades():
     """Get all trades"""
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         limit = request.args.get('limit', 100, type=int)
-        trades = db.query(Trade).order_by(Trade.timestamp.desc()).limit(limit).all()
+        query = db.query(Trade)
+        strategy = request.args.get('strategy')
+        if strategy:
+            query = query.filter_by(strategy=strategy)
+        trades = query.order_by(Trade.timestamp.desc()).limit(limit).all()
         return jsonify([t.to_dict() for t in trades])
     finally:
         db.close()
@@ -100,7 +158,7 @@ def get_stock_prices():
     limit = request.args.get('limit', 100, type=int)
     ticker = request.args.get('ticker')
     
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         query = db.query(StockPrice)
         
@@ -127,42 +185,79 @@ def get_stock_prices():
         db.close()
 
 @app.route('/api/stocks/check', methods=['POST'])
+@exclusive(stock_check_lock)
 def check_stocks():
     """Manually trigger stock price check"""
     try:
-        results = stock_checker.check_all_stocks()
+        summary = stock_checker.check_all_stocks()
         return jsonify({
             'success': True,
-            'count': len(results),
-            'message': f'Checked {len(results)} stocks'
+            'count': summary['checked'],
+            'advancing': summary['advancing'],
+            'declining': summary['declining'],
+            'top_gainers': summary['top_gainers'],
+            'top_losers': summary['top_losers'],
+            'message': f"Checked {summary['checked']} stocks"
         })
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/api/strategy/execute', methods=['POST'])
+@exclusive(strategy_lock)
 def execute_strategy():
     """Manually execute the 30-minute momentum strategy"""
     try:
-        result = momentum_strategy.execute_daily_strategy()
+        with profile_run('strategy-manual'):
+            result = momentum_strategy.execute_daily_strategy()
         return jsonify(result)
     except Exception as e:
         return jsonify({'error': str(e), 'success': False}), 500
 
 @app.route('/api/strategy/analyze', methods=['POST'])
+@exclusive(strategy_lock)
 def analyze_stocks():
     """Analyze stocks for momentum without purchasing"""
     try:
-        qualifying_stocks, all_results = momentum_strategy.analyze_all_stocks()
+        qualifying_stocks, scan = momentum_strategy.analyze_all_stocks()
         return jsonify({
             'success': True,
-            'total_analyzed': len(all_results),
+            'total_analyzed': len(scan),
             'qualifying_count': len(qualifying_stocks),
             'qualifying_stocks': qualifying_stocks[:50],  # Limit to 50 for response
-            'all_results': all_results[:100]  # Limit to 100 for response
+            'all_results': scan.rows(100)  # Limit to 100 for response
         })
     except Exception as e:
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/api/scans', methods=['GET'])
+def get_scans():
+    """Saved daily scan snapshots (metadata only), newest first"""
+    from scan_snapshots import list_scans
+    return jsonify(list_scans(request.args.get('start'), request.args.get('end')))
+
+@app.route('/api/scans/<session_date>', methods=['GET'])
+def get_scan(session_date):
+    """One day's full scan; ?qualifying=true, ?sort=<column> and ?limit=N narrow it down"""
+    from scan_snapshots import load_scan, records
+    df = load_scan(session_date)
+    if df is None:
+        return jsonify({'error': 'No scan saved for that day'}), 404
+    if request.args.get('qualifying', 'false').lower() == 'true':
+        df = df[df['qualifies']]
+    sort = request.args.get('sort')
+    if sort in df.columns:
+        df = df.sort_values(sort, ascending=sort == 'ticker')
+    limit = request.args.get('limit', type=int)
+    if limit:
+        df = df.head(limit)
+    return jsonify({'session_date': session_date, 'count': len(df), 'results': records(df)})
+
+@app.route('/api/scans/history/<ticker>', methods=['GET'])
+def get_scan_history(ticker):
+    """A ticker's scan results across saved days (?start=&end= as YYYY-MM-DD)"""
+    from scan_snapshots import ticker_history
+    return jsonify(ticker_history(ticker.upper(), request.args.get('start'), request.args.get('end')))
+
 @app.route('/api/ai/signals', methods=['GET'])
 def get_ai_signals():
     """Get AI trading signals"""
@@ -170,7 +265,7 @@ def get_ai_signals():
     ticker = request.args.get('ticker')
     signal_type = request.args.get('signal_type')  # 'buy', 'sell', 'hold'
     
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         query = db.query(AISignal)
         
@@ -179,12 +274,14 @@ def get_ai_signals():
         if signal_type:
             query = query.filter_by(signal_type=signal_type)
         
-        signals = query.order_by(AISignal.timestamp.desc()).limit(limit).all()
+        # A repeated signal keeps its first timestamp; last_seen_at is when it was last produced
+        signals = query.order_by(func.coalesce(AISignal.last_seen_at, AISignal.timestamp).desc()).limit(limit).all()
         return jsonify([s.to_dict() for s in signals])
     finally:
         db.close()
 
 @app.route('/api/ai/signals/generate', methods=['POST'])
+@exclusive(signals_lock)
 def generate_signals():
     """Manually trigger AI signal generation"""
     data = request.json or {}
@@ -208,10 +305,17 @@ def generate_signals():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/ai/model', methods=['GET'])
+def get_ai_model():
+    """Local signal model details"""
+    if not ai_decision.is_trained:
+        return jsonify({'trained': False})
+    return jsonify({'trained': True, **ai_decision.model.describe()})
+
 @app.route('/api/portfolio/summary', methods=['GET'])
 def get_portfolio_summary():
     """Get portfolio summary"""
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         # Get account info
         account = alpaca_client.get_account()
@@ -233,12 +337,77 @@ def get_portfolio_summary():
     finally:
         db.close()
 
+def sync_for_request(force=False):
+    """Sync at most ORDER_SYNC_REQUEST_PAGES pages, and not while another request syncs"""
+    sync_orders(alpaca_client, force=force, max_pages=Config.ORDER_SYNC_REQUEST_PAGES, wait=False)
+
 @app.route('/api/orders', methods=['GET'])
 def get_orders():
-    """Get all orders"""
-    status = request.args.get('status', 'all')
-    orders = alpaca_client.get_orders(status=status)
-    return jsonify(orders)
+    """Orders from the local order store, synced incrementally from the broker
+    
+    Filters: status (all, open, closed or an exact status), symbol, side,
+    type, start/end (YYYY-MM-DD), limit (max 1000) and offset. refresh=true
+    forces a sync.
+    """
+    sync_for_request(force=request.args.get('refresh', 'false').lower() == 'true')
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    offset = request.args.get('offset', 0, type=int)
+    
+    db = next(get_read_db())
+    try:
+        query = query_orders(db, status=request.args.get('status', 'all'), symbol=request.args.get('symbol'),
+                             side=request.args.get('side'), order_type=request.args.get('type'),
+                             start=request.args.get('start'), end=request.args.get('end'))
+        return jsonify([o.to_dict() for o in query.offset(offset).limit(limit)])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
+
+@app.route('/api/orders/stats', methods=['GET'])
+def get_order_stats():
+    """Per-day fill rate, slippage vs. estimated price and stop-loss hits (start/end as YYYY-MM-DD)"""
+    sync_for_request()
+    
+    db = next(get_read_db())
+    try:
+        return jsonify(daily_stats(db, start=request.args.get('start'), end=request.args.get('end')))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
+
+@app.route('/api/executions', methods=['GET'])
+def get_executions():
+    """Strategy buys with slippage, signal-to-fill latency and stop-outs (start/end, strategy, symbol)"""
+    sync_for_request()
+    limit = min(request.args.get('limit', 200, type=int), 1000)
+    
+    db = next(get_read_db())
+    try:
+        executions = order_executions(db, start=request.args.get('start'), end=request.args.get('end'),
+                                      strategy=request.args.get('strategy'), symbol=request.args.get('symbol'))
+        return jsonify(executions[:limit])
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
+
+@app.route('/api/executions/daily', methods=['GET'])
+def get_execution_summary():
+    """Daily slippage, fill latency and stop-out rate of strategy buys (default: last 30 days)"""
+    sync_for_request()
+    start = request.args.get('start') or (datetime.utcnow().date() - timedelta(days=29)).isoformat()
+    
+    db = next(get_read_db())
+    try:
+        executions = order_executions(db, start=start, end=request.args.get('end'),
+                                      strategy=request.args.get('strategy'))
+        return jsonify(daily_summary(executions))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    finally:
+        db.close()
 
 @app.route('/api/orders/<order_id>', methods=['DELETE'])
 def cancel_order(order_id):
@@ -257,7 +426,7 @@ def get_alpaca_positions():
 @app.route('/api/strategy/history', methods=['GET'])
 def get_strategy_history():
     """Get execution history from database"""
-    db = next(get_db())
+    db = next(get_read_db())
     try:
         limit = request.args.get('limit', 100, type=int)
         
@@ -281,12 +450,30 @@ def get_strategy_history():
     finally:
         db.close()
 
+@app.route('/api/strategies', methods=['GET'])
+def get_strategies():
+    """Configured strategies with trades and capital attributed to each"""
+    from strategies import load_strategies
+    db = next(get_read_db())
+    try:
+        strategies = [s.describe() for s in load_strategies()]
+        rows = db.query(Trade.strategy, Trade.action, func.count(Trade.id), func.sum(Trade.quantity * Trade.price)) \
+            .group_by(Trade.strategy, Trade.action).all()
+        attribution = {}
+        for strategy, action, count, notional in rows:
+            entry = attribution.setdefault(strategy or 'unattributed', {})
+            entry[action] = {'count': count, 'notional': float(notional or 0)}
+        return jsonify({'strategies': strategies, 'trades': attribution})
+    finally:
+        db.close()
+
 @app.route('/api/strategy/test', methods=['POST'])
+@exclusive(strategy_lock)
 def test_strategy():
     """Test the strategy without making purchases - returns detailed results"""
     try:
         # Run analysis only (no purchases)
-        qualifying_stocks, all_results = momentum_strategy.analyze_all_stocks()
+        qualifying_stocks, scan = momentum_strategy.analyze_all_stocks()
         
         # Get current Alpaca positions
         current_positions = alpaca_client.get_positions()
@@ -300,15 +487,76 @@ def test_strategy():
             'current_positions_count': len(current_positions),
             'current_positions': current_positions,
             'account_buying_power': account.get('buying_power', 0) if account else 0,
-            'total_analyzed': len(all_results),
+            'total_analyzed': len(scan),
             'qualifying_count': len(qualifying_stocks),
             'qualifying_stocks': qualifying_stocks[:50],
-            'all_results': all_results[:100],
+            'all_results': scan.rows(100),
             'message': 'Test completed - no purchases made'
         })
     except Exception as e:
         return jsonify({'error': str(e), 'success': False}), 500
 
+@app.route('/api/strategy/runs', methods=['GET'])
+def get_strategy_runs():
+    """Daily run checkpoints, newest first; ?orders=true includes each run's orders"""
+    db = next(get_read_db())
+    try:
+        limit = request.args.get('limit', 10, type=int)
+        runs = db.query(StrategyRun).order_by(StrategyRun.session_date.desc()).limit(limit).all()
+        result = [run.to_dict() for run in runs]
+        if request.args.get('orders', 'false').lower() == 'true':
+            for run in result:
+                run['orders'] = [o.to_dict() for o in db.query(RunOrder).filter_by(run_id=run['id']).order_by(RunOrder.id)]
+        return jsonify(result)
+    finally:
+        db.close()
+
+@app.route('/api/scheduler/runs', methods=['GET'])
+def get_job_runs():
+    """Recent scheduler job runs, including missed triggers"""
+    db = next(get_read_db())
+    try:
+        limit = request.args.get('limit', 50, type=int)
+        query = db.query(JobRun)
+        status = request.args.get('status')
+        if status:
+            query = query.filter_by(status=status)
+        runs = query.order_by(JobRun.scheduled_for.desc()).limit(limit).all()
+        return jsonify([run.to_dict() for run in runs])
+    finally:
+        db.close()
+
+@app.route('/api/scan/shards', methods=['GET'])
+def get_scan_shards():
+    """Shards of a sharded scan (default: the most recent run)"""
+    db = next(get_read_db())
+    try:
+        run_key = request.args.get('run_key')
+        if not run_key:
+            latest = db.query(ScanShard.run_key).order_by(ScanShard.id.desc()).first()
+            run_key = latest[0] if latest else None
+        shards = db.query(ScanShard).filter_by(run_key=run_key).order_by(ScanShard.shard_index).all() if run_key else []
+        return jsonify({'run_key': run_key, 'shards': [shard.to_dict() for shard in shards]})
+    finally:
+        db.close()
+
+@app.route('/api/profiles', methods=['GET'])
+def get_profiles():
+    """Recent strategy profiles (folded stacks), newest first"""
+    try:
+        limit = request.args.get('limit', 20, type=int)
+        return jsonify({'enabled': Config.PROFILE_STRATEGY, 'profiles': list_profiles()[:limit]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """Download one profile for flamegraph.pl / speedscope"""
+    path = profile_path(name)
+    if not path:
+        return jsonify({'error': 'Profile not found'}), 404
+    return send_file(path, mimetype='text/plain', as_attachment=True, download_name=name)
+
 @app.route('/')
 def index():
     """Serve the dashboard"""
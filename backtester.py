@@ -0,0 +1,332 @@
+"""
+Offline backtester for the 30-Minute Momentum Strategy.
+
+Replays recorded 1-minute sessions from the bar store and applies the same
+rules as MomentumStrategy.execute_daily_strategy:
+1. Liquidate yesterday's positions at the entry time
+2. Qualify stocks that moved up more than the momentum threshold from the open
+3. Size positions with the allocation engine and buy in priority order,
+   skipping anything that no longer fits the remaining buying power
+4. Exit at the stop-loss price if a later bar trades through it
+
+All per-ticker work is vectorized over the session arrays, so a day costs a
+handful of numpy operations regardless of universe size.
+"""
+
+import argparse
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from bar_store import BarStore, minute_index
+from allocation import allocate_shares, score_candidates
+from config import Config
+
+
+def _first_valid(values):
+    """Column of the first non-NaN value per row, plus a row mask of rows that have one"""
+    mask = ~np.isnan(values)
+    return mask.argmax(axis=1), mask.any(axis=1)
+
+
+def _last_valid(values):
+    """Column of the last non-NaN value per row, plus a row mask of rows that have one"""
+    mask = ~np.isnan(values)
+    return values.shape[1] - 1 - mask[:, ::-1].argmax(axis=1), mask.any(axis=1)
+
+
+def scan_momentum(session, entry_index):
+    """Vectorized equivalent of MomentumStrategy.calculate_momentum for every ticker
+
+    Returns (open_price, current_price, change_percent) arrays; change_percent
+    is NaN where either price is unavailable.
+    """
+    rows = np.arange(len(session))
+    window = slice(0, entry_index + 1)
+
+    open_col, has_open = _first_valid(session.open[:, window])
+    close_col, has_close = _last_valid(session.close[:, window])
+
+    open_price = session.open[rows, open_col].astype(np.float64)
+    current_price = session.close[rows, close_col].astype(np.float64)
+    valid = has_open & has_close & (open_price > 0)
+
+    change_percent = np.full(len(session), np.nan)
+    change_percent[valid] = (current_price[valid] - open_price[valid]) / open_price[valid] * 100
+    return open_price, current_price, change_percent
+
+
+def check_stops(stop_prices, window_open, window_low):
+    """Vectorized stop-hit check over the holding window
+
+    Returns (hit, exit_price) where exit_price is the stop price, or the bar's
+    open when the bar gapped through the stop.
+    """
+    if window_low.shape[1] == 0:
+        return np.zeros(len(stop_prices), dtype=bool), np.full(len(stop_prices), np.nan)
+
+    with np.errstate(invalid='ignore'):
+        crossed = window_low <= stop_prices[:, None]
+    hit = crossed.any(axis=1)
+    first = crossed.argmax(axis=1)
+
+    bar_open = window_open[np.arange(len(stop_prices)), first].astype(np.float64)
+    exit_price = np.where(np.isnan(bar_open), stop_prices, np.minimum(stop_prices, bar_open))
+    return hit, np.where(hit, exit_price, np.nan)
+
+
+def simulate_day(today, tomorrow, buying_power, momentum_threshold=2.0,
+                 stop_loss_percent=1.0, entry_index=None, slippage_bps=0.0,
+                 max_positions=0):
+    """Simulate one trading day
+
+    today and tomorrow are BarSessions aligned to the same ticker order;
+    tomorrow may be None for the last recorded day, in which case positions
+    are marked out at today's last close.
+
+    Positions are sized by allocation.allocate_shares, like
+    MomentumStrategy.purchase_stocks; max_positions > 0 keeps only the
+    highest-ranked candidates.
+
+    Returns (stats, fills) where stats is a dict for the daily report and
+    fills is a list of per-position dicts.
+    """
+    if entry_index is None:
+        entry_index = minute_index(10, 0)
+
+    open_price, current_price, change_percent = scan_momentum(today, entry_index)
+    analyzed = int(np.count_nonzero(~np.isnan(change_percent)))
+    with np.errstate(invalid='ignore'):
+        qualifies = change_percent > momentum_threshold
+    candidates = np.flatnonzero(qualifies)
+    qualifying = len(candidates)
+
+    dollar_volume = None
+    if today.volume is not None and qualifying:
+        window = slice(0, entry_index + 1)
+        dollar_volume = np.nansum(today.close[candidates, window].astype(np.float64)
+                                  * today.volume[candidates, window], axis=1)
+    scores = score_candidates(change_percent[candidates], dollar_volume)
+    order, planned_shares = allocate_shares(current_price[candidates], scores, buying_power,
+                                            max_positions=max_positions)
+
+    rows = candidates[order]
+    shares = planned_shares[order]
+    prices = current_price[rows]
+    fill_prices = prices * (1 + slippage_bps / 10000)
+
+    # purchase_stocks walks the plans in priority order and skips what no longer fits
+    filled = np.zeros(len(rows), dtype=bool)
+    remaining = buying_power
+    for i in range(len(rows)):
+        if shares[i] * prices[i] > remaining:
+            continue
+        filled[i] = True
+        remaining -= shares[i] * fill_prices[i]
+
+    rows, shares, fill_prices = rows[filled], shares[filled], fill_prices[filled]
+    stop_prices = fill_prices * (1 - stop_loss_percent / 100)
+
+    # Holding window: the rest of today, then tomorrow up to the liquidation time
+    after_entry = slice(entry_index + 1, None)
+    window_open = today.open[rows, after_entry]
+    window_low = today.low[rows, after_entry]
+    if tomorrow is not None:
+        until_entry = slice(0, entry_index + 1)
+        window_open = np.hstack([window_open, tomorrow.open[rows, until_entry]])
+        window_low = np.hstack([window_low, tomorrow.low[rows, until_entry]])
+
+    hit, stop_exit = check_stops(stop_prices, window_open, window_low)
+
+    if tomorrow is not None:
+        _, liquidation_price, _ = scan_momentum(tomorrow, entry_index)
+        liquidation_price = liquidation_price[rows]
+        has_next = ~np.isnan(tomorrow.close[rows, :entry_index + 1]).all(axis=1)
+    else:
+        liquidation_price = np.full(len(rows), np.nan)
+        has_next = np.zeros(len(rows), dtype=bool)
+
+    last_col, has_close = _last_valid(today.close[rows, after_entry])
+    last_close = today.close[rows, entry_index + 1 + last_col].astype(np.float64)
+    mark_price = np.where(has_close, last_close, fill_prices)
+
+    exit_price = np.where(hit, stop_exit, np.where(has_next, liquidation_price, mark_price))
+    exit_reason = np.where(hit, 'stop_loss', np.where(has_next, 'liquidation', 'mark'))
+    pnl = (exit_price - fill_prices) * shares
+
+    invested = float(np.sum(shares * fill_prices))
+    day_pnl = float(np.sum(pnl))
+
+    stats = {
+        'date': today.date,
+        'analyzed': analyzed,
+        'qualifying': int(qualifying),
+        'planned': int(len(filled)),
+        'filled': int(np.count_nonzero(filled)),
+        'skipped_funds': int(len(filled) - np.count_nonzero(filled)),
+        'stop_hits': int(np.count_nonzero(hit)),
+        'invested': invested,
+        'utilization': invested / buying_power * 100 if buying_power > 0 else 0.0,
+        'pnl': day_pnl,
+        'return_pct': day_pnl / buying_power * 100 if buying_power > 0 else 0.0,
+    }
+
+    fills = [{
+        'date': today.date,
+        'ticker': str(today.tickers[row]),
+        'change_percent': float(change_percent[row]),
+        'shares': int(shares[i]),
+        'entry_price': float(fill_prices[i]),
+        'stop_loss_price': float(stop_prices[i]),
+        'exit_price': float(exit_price[i]),
+        'exit_reason': str(exit_reason[i]),
+        'pnl': float(pnl[i])
+    } for i, row in enumerate(rows)]
+
+    return stats, fills
+
+
+class BacktestResult:
+    """Per-day P&L and per-position fills from a backtest run"""
+
+    def __init__(self, daily, fills, initial_capital):
+        self.daily = daily
+        self.fills = fills
+        self.initial_capital = initial_capital
+
+    def summary(self):
+        """Aggregate statistics over the whole run"""
+        if self.daily.empty:
+            return {'days': 0}
+
+        returns = self.daily['return_pct'] / 100
+        equity = self.daily['equity']
+        drawdown = (equity / equity.cummax() - 1).min() * 100
+        std = returns.std()
+        planned = self.daily['planned'].sum()
+        filled = self.daily['filled'].sum()
+
+        return {
+            'days': int(len(self.daily)),
+            'initial_capital': self.initial_capital,
+            'final_equity': float(equity.iloc[-1]),
+            'total_return_pct': float((equity.iloc[-1] / self.initial_capital - 1) * 100),
+            'total_pnl': float(self.daily['pnl'].sum()),
+            'avg_daily_return_pct': float(returns.mean() * 100),
+            'sharpe': float(returns.mean() / std * np.sqrt(252)) if std > 0 else 0.0,
+            'max_drawdown_pct': float(drawdown),
+            'winning_days': int((self.daily['pnl'] > 0).sum()),
+            'trades': int(filled),
+            'fill_rate': float(filled / planned * 100) if planned else 0.0,
+            'stop_hit_rate': float(self.daily['stop_hits'].sum() / filled * 100) if filled else 0.0,
+            'avg_utilization': float(self.daily['utilization'].mean())
+        }
+
+
+def replay(day_pairs, initial_capital, collect_fills=True, **params):
+    """Run simulate_day over (today, tomorrow) session pairs, compounding equity
+
+    params are passed through to simulate_day.
+    """
+    equity = initial_capital
+    daily = []
+    fills = []
+
+    for today, tomorrow in day_pairs:
+        stats, day_fills = simulate_day(today, tomorrow, equity, **params)
+        equity += stats['pnl']
+        stats['equity'] = equity
+        daily.append(stats)
+        if collect_fills:
+            fills.extend(day_fills)
+
+    return BacktestResult(pd.DataFrame(daily), pd.DataFrame(fills), initial_capital)
+
+
+class Backtester:
+    def __init__(self, store=None, initial_capital=100000.0, momentum_threshold=None,
+                 stop_loss_percent=None, entry_hour=None, entry_minute=None,
+                 max_positions=None, slippage_bps=0.0, universe=None):
+        self.store = store or BarStore()
+        self.initial_capital = initial_capital
+        self.momentum_threshold = Config.MOMENTUM_THRESHOLD if momentum_threshold is None else momentum_threshold
+        self.stop_loss_percent = Config.STOP_LOSS_PERCENT if stop_loss_percent is None else stop_loss_percent
+        self.entry_index = minute_index(
+            Config.STOCK_CHECK_HOUR if entry_hour is None else entry_hour,
+            Config.STOCK_CHECK_MINUTE if entry_minute is None else entry_minute
+        )
+        self.max_positions = Config.MAX_POSITIONS if max_positions is None else max_positions
+        self.slippage_bps = slippage_bps
+        self.universe = universe
+
+    def _load(self, day):
+        # volume feeds the liquidity score in score_candidates, as in live trading
+        session = self.store.load(day, fields=('open', 'low', 'close', 'volume'))
+        if self.universe is not None:
+            session = session.reindex(self.universe)
+        return session
+
+    def _day_pairs(self, days):
+        """Yield (today, tomorrow) with tomorrow aligned to today's tickers"""
+        today = self._load(days[0])
+        for i in range(len(days)):
+            next_session = self._load(days[i + 1]) if i + 1 < len(days) else None
+            tomorrow = next_session
+            if next_session is not None and self.universe is None:
+                tomorrow = next_session.reindex(today.tickers)
+            yield today, tomorrow
+            today = next_session
+
+    def run(self, start=None, end=None):
+        """Replay every recorded session in [start, end] and return a BacktestResult"""
+        days = self.store.dates(start, end)
+        if not days:
+            print("No recorded sessions found for the requested range")
+            return BacktestResult(pd.DataFrame(), pd.DataFrame(), self.initial_capital)
+
+        print(f"Backtesting {len(days)} sessions ({days[0]} to {days[-1]})...")
+        return replay(
+            self._day_pairs(days), self.initial_capital,
+            momentum_threshold=self.momentum_threshold,
+            stop_loss_percent=self.stop_loss_percent,
+            entry_index=self.entry_index,
+            slippage_bps=self.slippage_bps,
+            max_positions=self.max_positions
+        )
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backtest the 30-minute momentum strategy on recorded bars")
+    parser.add_argument('--start', type=_parse_date, help="First session (YYYY-MM-DD)")
+    parser.add_argument('--end', type=_parse_date, help="Last session (YYYY-MM-DD)")
+    parser.add_argument('--bars-dir', help="Bar store directory (default: Config.BAR_CACHE_DIR)")
+    parser.add_argument('--capital', type=float, default=100000.0)
+    parser.add_argument('--threshold', type=float, help="Momentum threshold in percent")
+    parser.add_argument('--stop-loss', type=float, help="Stop-loss in percent")
+    parser.add_argument('--max-positions', type=int, help="Keep only the N strongest movers (0 = all)")
+    parser.add_argument('--slippage-bps', type=float, default=0.0)
+    parser.add_argument('--output', help="Write the daily report to this CSV file")
+    args = parser.parse_args()
+
+    backtester = Backtester(
+        store=BarStore(args.bars_dir),
+        initial_capital=args.capital,
+        momentum_threshold=args.threshold,
+        stop_loss_percent=args.stop_loss,
+        max_positions=args.max_positions,
+        slippage_bps=args.slippage_bps
+    )
+    result = backtester.run(args.start, args.end)
+
+    print("\n" + "=" * 60)
+    print("📊 Backtest Summary")
+    print("=" * 60)
+    for key, value in result.summary().items():
+        print(f"{key}: {value:,.2f}" if isinstance(value, float) else f"{key}: {value}")
+
+    if args.output and not result.daily.empty:
+        result.daily.to_csv(args.output, index=False)
+        print(f"\nDaily report written to {args.output}")
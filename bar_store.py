@@ -0,0 +1,164 @@
+"""
+Local storage for recorded 1-minute trading sessions.
+
+Each trading day is stored as one compressed .npz file holding the ticker
+list and OHLCV arrays shaped (tickers, minutes). Every session uses the same
+regular-hours minute grid (9:30 - 15:59 EST), so minute offsets are identical
+across days and the backtester can index bars without timestamp lookups.
+Missing bars are stored as NaN.
+"""
+
+import os
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytz
+from config import Config
+
+MARKET_OPEN_MINUTE = 9 * 60 + 30
+MARKET_CLOSE_MINUTE = 16 * 60
+SESSION_MINUTES = np.arange(MARKET_OPEN_MINUTE, MARKET_CLOSE_MINUTE, dtype=np.int16)
+BAR_FIELDS = ('open', 'high', 'low', 'close', 'volume')
+
+
+def minute_index(hour, minute=0):
+    """Column index of a wall-clock EST minute on the session grid"""
+    return hour * 60 + minute - MARKET_OPEN_MINUTE
+
+
+def _as_bars(values):
+    return None if values is None else np.asarray(values, dtype=np.float32)
+
+
+class BarSession:
+    """One trading day of 1-minute bars for a universe of tickers"""
+
+    def __init__(self, day, tickers, open, high, low, close, volume):
+        self.date = day
+        self.tickers = np.asarray(tickers, dtype=str)
+        self.open = _as_bars(open)
+        self.high = _as_bars(high)
+        self.low = _as_bars(low)
+        self.close = _as_bars(close)
+        self.volume = _as_bars(volume)
+        self._index = None
+
+    def __len__(self):
+        return len(self.tickers)
+
+    @property
+    def ticker_index(self):
+        """Mapping of ticker -> row"""
+        if self._index is None:
+            self._index = {t: i for i, t in enumerate(self.tickers)}
+        return self._index
+
+    def reindex(self, tickers):
+        """Return a copy aligned to the given ticker order (missing rows are NaN)"""
+        tickers = np.asarray(tickers, dtype=str)
+        rows = np.array([self.ticker_index.get(t, -1) for t in tickers], dtype=np.int64)
+        present = rows >= 0
+
+        def take(values):
+            if values is None:
+                return None
+            out = np.full((len(tickers), values.shape[1]), np.nan, dtype=np.float32)
+            out[present] = values[rows[present]]
+            return out
+
+        return BarSession(self.date, tickers, *(take(getattr(self, f)) for f in BAR_FIELDS))
+
+    @classmethod
+    def from_frames(cls, day, frames):
+        """Build a session from {ticker: DataFrame} with Open/High/Low/Close/Volume columns"""
+        tickers = list(frames.keys())
+        shape = (len(tickers), len(SESSION_MINUTES))
+        arrays = {f: np.full(shape, np.nan, dtype=np.float32) for f in BAR_FIELDS}
+        est = Config.STOCK_CHECK_TIMEZONE
+
+        for row, ticker in enumerate(tickers):
+            df = frames[ticker]
+            if df is None or df.empty:
+                continue
+            index = pd.to_datetime(df.index)
+            index = index.tz_localize('UTC') if index.tz is None else index
+            index = index.tz_convert(est)
+            on_day = index.date == day
+            minutes = index.hour * 60 + index.minute - MARKET_OPEN_MINUTE
+            keep = on_day & (minutes >= 0) & (minutes < len(SESSION_MINUTES))
+            cols = np.asarray(minutes[keep], dtype=np.int64)
+            for field in BAR_FIELDS:
+                arrays[field][row, cols] = df[field.capitalize()].to_numpy(dtype=np.float32)[keep]
+
+        return cls(day, tickers, **arrays)
+
+
+class BarStore:
+    """Directory of recorded sessions, one YYYY-MM-DD.npz file per trading day"""
+
+    def __init__(self, root=None):
+        self.root = root or Config.BAR_CACHE_DIR
+
+    def path_for(self, day):
+        return os.path.join(self.root, f"{day.isoformat()}.npz")
+
+    def dates(self, start=None, end=None):
+        """Sorted list of recorded trading days, optionally limited to [start, end]"""
+        if not os.path.isdir(self.root):
+            return []
+        days = []
+        for name in os.listdir(self.root):
+            if not name.endswith('.npz'):
+                continue
+            try:
+                day = datetime.strptime(name[:-4], '%Y-%m-%d').date()
+            except ValueError:
+                continue
+            if (start is None or day >= start) and (end is None or day <= end):
+                days.append(day)
+        return sorted(days)
+
+    def has(self, day):
+        return os.path.exists(self.path_for(day))
+
+    def load(self, day, fields=BAR_FIELDS):
+        """Load a recorded session; fields not requested are left as None"""
+        with np.load(self.path_for(day), allow_pickle=False) as data:
+            arrays = {f: (data[f] if f in fields else None) for f in BAR_FIELDS}
+            tickers = data['tickers']
+        return BarSession(day, tickers, **arrays)
+
+    def save(self, session):
+        """Write a session to disk, replacing any existing recording for that day"""
+        os.makedirs(self.root, exist_ok=True)
+        np.savez_compressed(
+            self.path_for(session.date),
+            tickers=session.tickers,
+            **{f: getattr(session, f) for f in BAR_FIELDS}
+        )
+        return self.path_for(session.date)
+
+
+def record_session(tickers, day=None, store=None, provider=None, chunk_size=200):
+    """Fetch a day's 1-minute bars from the market data provider and save them to the bar store"""
+    from market_data import get_market_data_provider
+
+    provider = provider or get_market_data_provider()
+    est = pytz.timezone(Config.STOCK_CHECK_TIMEZONE)
+    day = day or provider.now().date()
+    store = store or BarStore()
+    day_start = est.localize(datetime.combine(day, datetime.min.time()))
+    day_end = day_start + timedelta(days=1)
+    frames = {}
+
+    for start in range(0, len(tickers), chunk_size):
+        chunk = tickers[start:start + chunk_size]
+        print(f"Recording bars: {start}/{len(tickers)} tickers")
+        bars = provider.get_bars(chunk, day_start, day_end, interval='1m')
+        for ticker in chunk:
+            frames[ticker] = bars.get(ticker)
+
+    session = BarSession.from_frames(day, frames)
+    path = store.save(session)
+    print(f"Saved {len(session)} tickers to {path}")
+    return path
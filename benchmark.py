@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+"""
+End-to-end benchmark for the daily strategy critical path.
+
+Runs the real MomentumStrategy code against offline stand-ins: synthetic
+1-minute sessions served by the replay market data provider, the local
+broker simulator, and a throwaway SQLite database. Each stage is timed over
+several repetitions at each universe size and reported as p50/p99.
+Every stage starts with an empty bar cache, so analyze_all_stocks and
+execute_daily_strategy measure the cold 10:00 path; analyze_after_warmup
+times the scan right after warmup(), as the scheduler runs it.
+
+Results are compared against a stored baseline; any stage whose p50 or p99
+exceeds the baseline by more than the tolerance fails the run with a
+non-zero exit code.
+
+    python benchmark.py                        # compare against benchmark_baseline.json
+    python benchmark.py --update-baseline      # record new baselines on this machine
+    python benchmark.py --sizes 100,1000 --repeat 10
+
+Baselines are machine-specific; record them on the machine that runs the
+comparison. The scan and order pacing sleeps are disabled by default so
+the numbers reflect the work itself (pass --keep-delays to include them).
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+
+_work_dir = tempfile.mkdtemp(prefix='mangotrades-bench-')
+# Point the ORM at a scratch database before database.py creates its engine
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_work_dir, 'bench.db')}"
+os.environ['BROKER_BACKEND'] = 'simulator'
+os.environ['MARKET_DATA_PROVIDER'] = 'replay'
+
+import pandas as pd
+from config import Config
+from bar_store import BarStore, BarSession, SESSION_MINUTES
+from market_data import ReplayProvider, set_market_data_provider
+from broker_sim import SimulatedTradeClient
+from database import init_db
+
+DEFAULT_SIZES = [100, 1000, 7700]
+STAGES = ['load_stock_list', 'analyze_all_stocks', 'analyze_after_warmup', 'close_all_positions', 'purchase_stocks',
+          'execute_daily_strategy']
+BASELINE_FILE = 'benchmark_baseline.json'
+SESSION_DAY = date(2024, 3, 12)
+SEEDED_POSITIONS = 20
+
+
+def synthetic_session(day, tickers, seed):
+    """Random-walk 1-minute bars; roughly 4% of tickers clear a 2% gain by 10:00"""
+    rng = np.random.default_rng(seed)
+    shape = (len(tickers), len(SESSION_MINUTES))
+    base = rng.uniform(5, 300, size=(len(tickers), 1))
+    close = base * np.exp(rng.normal(0, 0.002, size=shape).cumsum(axis=1))
+    open_ = np.concatenate([base, close[:, :-1]], axis=1)
+    spread = np.abs(rng.normal(0, 0.0005, size=shape))
+    high = np.maximum(open_, close) * (1 + spread)
+    low = np.minimum(open_, close) * (1 - spread)
+    volume = rng.integers(100, 50000, size=shape).astype(np.float32)
+    return BarSession(day, tickers, open_, high, low, close, volume)
+
+
+def build_fixture(size, root):
+    """Write a stock list and two recorded sessions for `size` tickers"""
+    tickers = [f"SYN{i:05d}" for i in range(size)]
+    fixture_dir = os.path.join(root, f"universe-{size}")
+    store = BarStore(os.path.join(fixture_dir, 'bars'))
+    previous_day = SESSION_DAY - timedelta(days=1)
+    store.save(synthetic_session(previous_day, tickers, seed=size))
+    store.save(synthetic_session(SESSION_DAY, tickers, seed=size + 1))
+
+    stock_list = os.path.join(fixture_dir, 'Stock_list.csv')
+    pd.DataFrame({'Ticker': tickers, 'Movement': '', 'Confidence': '', 'Rank': ''}).to_csv(stock_list, index=False)
+    return tickers, store, stock_list
+
+
+def seed_positions(strategy, tickers):
+    """Open yesterday's positions (with GTC stops) so there is something to liquidate"""
+    for ticker in tickers[:SEEDED_POSITIONS]:
+        order = strategy.alpaca.place_market_order(ticker, 10, 'buy')
+        if order and order.get('filled_avg_price'):
+            strategy.alpaca.place_stop_loss_order(ticker, 10, round(order['filled_avg_price'] * 0.5, 2))
+
+
+def clear_bar_cache(strategy):
+    """Drop the bars cached by earlier stages so the next one fetches the session cold"""
+    strategy.release_bar_cache()
+
+
+def timed(func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    return time.perf_counter() - start, result
+
+
+def benchmark_size(size, repeat, broker_latency_ms):
+    """Time every stage `repeat` times for one universe size"""
+    from trading_strategy import MomentumStrategy
+
+    tickers, store, stock_list = build_fixture(size, _work_dir)
+    provider = set_market_data_provider(ReplayProvider(store))
+    provider.start(SESSION_DAY, start_at=datetime.strptime('10:01', '%H:%M').time())
+    Config.STOCK_LIST_FILE = stock_list
+    # Every repetition trades the same day; a checkpointed run would return 'already completed'
+    Config.RUN_CHECKPOINTS = False
+
+    broker = SimulatedTradeClient(provider=provider, latency_ms=broker_latency_ms, rate_limit_per_minute=0)
+    strategy = MomentumStrategy()
+    strategy.market_data = provider
+    strategy.alpaca.client = broker
+
+    timings = {stage: [] for stage in STAGES}
+    for i in range(repeat):
+        print(f"  universe={size} run {i + 1}/{repeat}")
+        broker.reset()
+        seed_positions(strategy, tickers)
+
+        elapsed, _ = timed(strategy.load_stock_list)
+        timings['load_stock_list'].append(elapsed)
+        elapsed, _ = timed(strategy.close_all_positions)
+        timings['close_all_positions'].append(elapsed)
+        clear_bar_cache(strategy)
+        elapsed, (qualifying, _) = timed(strategy.analyze_all_stocks)
+        timings['analyze_all_stocks'].append(elapsed)
+        elapsed, _ = timed(strategy.purchase_stocks, qualifying)
+        timings['purchase_stocks'].append(elapsed)
+
+        # The scheduled entry path: warmup fills the cache, the scan only fetches the latest bars
+        clear_bar_cache(strategy)
+        strategy.warmup()
+        elapsed, _ = timed(strategy.analyze_all_stocks)
+        timings['analyze_after_warmup'].append(elapsed)
+
+        broker.reset()
+        seed_positions(strategy, tickers)
+        clear_bar_cache(strategy)
+        elapsed, _ = timed(strategy.execute_daily_strategy)
+        timings['execute_daily_strategy'].append(elapsed)
+
+    return {
+        stage: {
+            'p50': float(np.percentile(values, 50)),
+            'p99': float(np.percentile(values, 99)),
+            'runs': len(values)
+        } for stage, values in timings.items()
+    }
+
+
+def compare(results, baseline, tolerance, min_delta=0.05):
+    """Return a list of regression messages (empty when everything is within tolerance)
+
+    Slowdowns smaller than min_delta seconds are ignored so that millisecond
+    stages do not fail on scheduler noise.
+    """
+    regressions = []
+    for size, stages in results.items():
+        for stage, stats in stages.items():
+            reference = baseline.get(size, {}).get(stage)
+            if not reference:
+                continue
+            for metric in ('p50', 'p99'):
+                limit = max(reference[metric] * (1 + tolerance), reference[metric] + min_delta)
+                if stats[metric] > limit:
+                    regressions.append(
+                        f"universe={size} {stage} {metric}: {stats[metric]:.3f}s "
+                        f"> baseline {reference[metric]:.3f}s (+{tolerance:.0%} allowed)"
+                    )
+    return regressions
+
+
+def print_report(results, baseline):
+    print("\n" + "=" * 78)
+    print("⏱️  Critical Path Benchmark")
+    print("=" * 78)
+    print(f"{'universe':>8}  {'stage':<24}{'p50 (s)':>10}{'p99 (s)':>10}{'baseline p50':>14}{'delta':>10}")
+    for size, stages in results.items():
+        for stage in STAGES:
+            stats = stages[stage]
+            reference = baseline.get(size, {}).get(stage)
+            if reference and reference['p50'] > 0:
+                delta = f"{(stats['p50'] / reference['p50'] - 1) * 100:+.1f}%"
+                ref = f"{reference['p50']:.3f}"
+            else:
+                delta, ref = '-', '-'
+            print(f"{size:>8}  {stage:<24}{stats['p50']:>10.3f}{stats['p99']:>10.3f}{ref:>14}{delta:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the daily strategy critical path offline")
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help="Comma-separated universe sizes")
+    parser.add_argument('--repeat', type=int, default=5, help="Repetitions per universe size")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help="Store these results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="Allowed slowdown before failing (0.25 = 25%%)")
+    parser.add_argument('--min-delta', type=float, default=0.05, help="Ignore slowdowns smaller than this many seconds")
+    parser.add_argument('--broker-latency-ms', type=float, default=0.0, help="Simulated broker round-trip latency")
+    parser.add_argument('--keep-delays', action='store_true', help="Keep the scan and order pacing sleeps")
+    args = parser.parse_args()
+
+    if not args.keep_delays:
+        Config.SCAN_BATCH_DELAY = 0
+        Config.ORDER_DELAY_SECONDS = 0
+        Config.ORDER_SETTLE_SECONDS = 0
+
+    init_db()
+    sizes = [int(s) for s in args.sizes.split(',') if s]
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    results = {}
+    try:
+        for size in sizes:
+            print(f"\nBenchmarking universe of {size} tickers...")
+            results[str(size)] = benchmark_size(size, args.repeat, args.broker_latency_ms)
+    finally:
+        shutil.rmtree(_work_dir, ignore_errors=True)
+
+    print_report(results, baseline)
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"\nBaseline written to {args.baseline}")
+        return 0
+
+    if not baseline:
+        print(f"\nNo baseline at {args.baseline}; run with --update-baseline to record one")
+        return 0
+
+    regressions = compare(results, baseline, args.tolerance, args.min_delta)
+    if regressions:
+        print("\n❌ PERFORMANCE REGRESSION")
+        for message in regressions:
+            print(f"   {message}")
+        return 1
+
+    print("\n✅ All stages within tolerance of baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,369 @@
+"""
+Local broker simulator for offline load testing.
+
+SimulatedTradeClient implements the subset of the Alpaca TradeClient used by
+AlpacaClient (get_account, list_positions, submit_order, cancel_order_by_id,
+list_orders) against an in-memory cash account. Prices come from the market
+data provider, so with the replay provider the whole order path runs offline.
+
+- Market orders fill at the latest bar close (plus optional slippage)
+- Limit orders fill once a bar trades through the limit
+- Stop orders trigger when a bar's low reaches the stop and fill at the
+  stop price, or at the bar's open if it gapped through
+- Resting limit and stop orders are evaluated against the bars elapsed since
+  the last request at the start of every call, so stops fire without
+  anything polling the simulator
+- Shares under an open sell order (e.g. a GTC stop) are held and cannot be
+  sold again until that order is canceled, as on the real account
+- Every call can be delayed by a configurable latency, and requests beyond
+  the configured rate limit are rejected with HTTP 429 like the real API
+
+Select it with BROKER_BACKEND=simulator.
+"""
+
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+from config import Config
+from market_data import get_market_data_provider
+
+
+class SimulatedAPIError(Exception):
+    """Raised for rejected requests, mirroring the Alpaca APIError"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _naive_utc(value):
+    """Timestamps as the simulator stores them: naive UTC (accepts ISO strings like the real API)"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.astimezone(timezone.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _enum_value(value):
+    return str(getattr(value, 'value', value)).lower() if value is not None else None
+
+
+class SimulatedTradeClient:
+    def __init__(self, provider=None, starting_cash=None, latency_ms=None, latency_jitter_ms=None,
+                 rate_limit_per_minute=None, slippage_bps=None):
+        self.provider = provider or get_market_data_provider()
+        self.starting_cash = Config.SIM_STARTING_CASH if starting_cash is None else starting_cash
+        self.latency_ms = Config.SIM_LATENCY_MS if latency_ms is None else latency_ms
+        self.latency_jitter_ms = Config.SIM_LATENCY_JITTER_MS if latency_jitter_ms is None else latency_jitter_ms
+        self.rate_limit_per_minute = Config.SIM_RATE_LIMIT_PER_MINUTE if rate_limit_per_minute is None else rate_limit_per_minute
+        self.slippage_bps = Config.SIM_SLIPPAGE_BPS if slippage_bps is None else slippage_bps
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self, starting_cash=None):
+        """Clear all positions and orders and restore the starting cash"""
+        with self._lock:
+            self.cash = self.starting_cash if starting_cash is None else starting_cash
+            self.positions = {}  # symbol -> {'qty': int, 'cost': float}
+            self.orders = {}  # order id -> order namespace, in submission order
+            self._requests = deque()
+            self._processed_until = {}  # order id -> last bar timestamp evaluated
+            self.request_count = 0
+
+    # ------------------------------------------------------------------
+    # Request plumbing
+    # ------------------------------------------------------------------
+
+    def _request(self):
+        """Apply simulated latency and the rate limit to one API call
+
+        Resting orders are then evaluated against the bars elapsed since the
+        previous call, so every request sees the account as the broker would.
+        """
+        if self.latency_ms or self.latency_jitter_ms:
+            time.sleep(max(0.0, self.latency_ms + random.uniform(-1, 1) * self.latency_jitter_ms) / 1000)
+
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit_per_minute:
+                now = time.monotonic()
+                while self._requests and now - self._requests[0] > 60:
+                    self._requests.popleft()
+                if len(self._requests) >= self.rate_limit_per_minute:
+                    raise SimulatedAPIError("rate limit exceeded", status_code=429)
+                self._requests.append(now)
+        self.process_bars()
+
+    def _recent_bars(self, symbols, since=None):
+        now = self.provider.now()
+        start = since or now.replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.provider.get_bars(symbols, start, interval='1m')
+
+    def _last_prices(self, symbols):
+        """Latest close for each symbol, from today's bars or else recent daily bars"""
+        prices = {}
+        bars = self._recent_bars(symbols) if symbols else {}
+        missing = [s for s in symbols if s not in bars]
+        if missing:
+            bars.update(self.provider.get_bars(missing, self.provider.now() - timedelta(days=7), interval='1d'))
+        for symbol, df in bars.items():
+            closes = df['Close'].dropna()
+            if len(closes):
+                prices[symbol] = float(closes.iloc[-1])
+        return prices
+
+    def _last_price(self, symbol):
+        return self._last_prices([symbol]).get(symbol)
+
+    # ------------------------------------------------------------------
+    # Account and positions
+    # ------------------------------------------------------------------
+
+    def get_account(self):
+        self._request()
+        with self._lock:
+            positions = dict(self.positions)
+            cash = self.cash
+        prices = self._last_prices(list(positions))
+        market_value = sum(p['qty'] * prices.get(symbol, p['cost'] / p['qty'])
+                           for symbol, p in positions.items())
+        equity = cash + market_value
+        return SimpleNamespace(
+            buying_power=str(max(cash, 0.0)),
+            cash=str(cash),
+            portfolio_value=str(equity),
+            equity=str(equity),
+            day_trading_buying_power=str(max(cash, 0.0))
+        )
+
+    def list_positions(self):
+        self._request()
+        with self._lock:
+            positions = dict(self.positions)
+        prices = self._last_prices(list(positions))
+        result = []
+        for symbol, p in positions.items():
+            avg_entry = p['cost'] / p['qty']
+            current = prices.get(symbol, avg_entry)
+            unrealized = (current - avg_entry) * p['qty']
+            result.append(SimpleNamespace(
+                symbol=symbol,
+                qty=str(p['qty']),
+                avg_entry_price=str(avg_entry),
+                current_price=str(current),
+                market_value=str(current * p['qty']),
+                unrealized_pl=str(unrealized),
+                unrealized_plpc=str(unrealized / p['cost'] if p['cost'] else 0.0),
+                side='long'
+            ))
+        return result
+
+    # ------------------------------------------------------------------
+    # Orders
+    # ------------------------------------------------------------------
+
+    def submit_order(self, order_data):
+        self._request()
+        symbol = order_data.symbol
+        qty = int(float(order_data.qty))
+        side = _enum_value(order_data.side)
+        limit_price = getattr(order_data, 'limit_price', None)
+        stop_price = getattr(order_data, 'stop_price', None)
+        order_type = 'stop' if stop_price is not None else 'limit' if limit_price is not None else 'market'
+        client_order_id = getattr(order_data, 'client_order_id', None) or str(uuid.uuid4())
+
+        if qty <= 0:
+            raise SimulatedAPIError("qty must be > 0", status_code=422)
+
+        now = datetime.utcnow()
+        order = SimpleNamespace(
+            id=str(uuid.uuid4()),
+            client_order_id=client_order_id,
+            symbol=symbol,
+            qty=str(qty),
+            filled_qty='0',
+            filled_avg_price=None,
+            status='new',
+            side=side,
+            order_type=order_type,
+            type=order_type,
+            time_in_force=_enum_value(getattr(order_data, 'time_in_force', None)) or 'day',
+            limit_price=str(limit_price) if limit_price is not None else None,
+            stop_price=str(stop_price) if stop_price is not None else None,
+            created_at=now,
+            submitted_at=now,
+            updated_at=now,
+            filled_at=None,
+            canceled_at=None
+        )
+
+        with self._lock:
+            if any(o.client_order_id == client_order_id for o in self.orders.values()):
+                raise SimulatedAPIError("client_order_id must be unique", status_code=422)
+            if side == 'sell' and self._available_qty(symbol) < qty:
+                raise SimulatedAPIError(f"insufficient qty available for order (requested: {qty})", status_code=403)
+
+        if order_type == 'market':
+            price = self._last_price(symbol)
+            if price is None:
+                raise SimulatedAPIError(f"no market data for {symbol}", status_code=422)
+            slip = self.slippage_bps / 10000
+            price = price * (1 + slip) if side == 'buy' else price * (1 - slip)
+            with self._lock:
+                if side == 'buy' and price * qty > self.cash:
+                    raise SimulatedAPIError("insufficient buying power", status_code=403)
+                self.orders[order.id] = order
+                self._fill(order, price)
+        else:
+            with self._lock:
+                self.orders[order.id] = order
+                self._processed_until[order.id] = self.provider.now()
+            if order_type == 'limit':
+                price = self._last_price(symbol)
+                if price is not None and self._limit_crosses(order, price):
+                    with self._lock:
+                        self._fill(order, price)
+
+        return order
+
+    def _available_qty(self, symbol):
+        """Position qty not already held for open sell orders (caller holds the lock)"""
+        held = sum(int(o.qty) for o in self.orders.values()
+                   if o.symbol == symbol and o.side == 'sell' and o.status in ('new', 'accepted'))
+        return self.positions.get(symbol, {}).get('qty', 0) - held
+
+    def _limit_crosses(self, order, price):
+        limit = float(order.limit_price)
+        return price <= limit if order.side == 'buy' else price >= limit
+
+    def _fill(self, order, price):
+        """Apply a fill to cash and positions (caller holds the lock)"""
+        qty = int(order.qty)
+        position = self.positions.get(order.symbol)
+
+        if order.side == 'buy':
+            self.cash -= price * qty
+            if position:
+                position['qty'] += qty
+                position['cost'] += price * qty
+            else:
+                self.positions[order.symbol] = {'qty': qty, 'cost': price * qty}
+        else:
+            if not position or position['qty'] < qty:
+                order.status = 'rejected'
+                order.updated_at = datetime.utcnow()
+                return
+            avg_entry = position['cost'] / position['qty']
+            self.cash += price * qty
+            position['qty'] -= qty
+            position['cost'] -= avg_entry * qty
+            if position['qty'] == 0:
+                del self.positions[order.symbol]
+
+        now = datetime.utcnow()
+        order.status = 'filled'
+        order.filled_qty = str(qty)
+        order.filled_avg_price = str(price)
+        order.filled_at = now
+        order.updated_at = now
+        self._processed_until.pop(order.id, None)
+
+    def process_bars(self):
+        """Evaluate open limit and stop orders against bars closed since the last check
+
+        Runs at the start of every request, like the real broker filling
+        resting orders between requests. Returns the orders filled by this call.
+        """
+        with self._lock:
+            pending = [o for o in self.orders.values() if o.status in ('new', 'accepted')]
+        if not pending:
+            return []
+
+        since = min(self._processed_until.get(o.id, self.provider.now()) for o in pending)
+        bars = self._recent_bars(sorted({o.symbol for o in pending}), since=since)
+        filled = []
+
+        with self._lock:
+            for order in pending:
+                df = bars.get(order.symbol)
+                if df is None or df.empty or order.status not in ('new', 'accepted'):
+                    continue
+                df = df[df.index >= self._processed_until.get(order.id, since)]
+                if df.empty:
+                    continue
+
+                if order.order_type == 'stop':
+                    stop = float(order.stop_price)
+                    if order.side == 'sell':
+                        hit = df[df['Low'] <= stop]
+                        price = min(stop, float(hit['Open'].iloc[0])) if not hit.empty else None
+                    else:
+                        hit = df[df['High'] >= stop]
+                        price = max(stop, float(hit['Open'].iloc[0])) if not hit.empty else None
+                else:
+                    limit = float(order.limit_price)
+                    hit = df[df['Low'] <= limit] if order.side == 'buy' else df[df['High'] >= limit]
+                    price = limit if not hit.empty else None
+
+                self._processed_until[order.id] = df.index[-1] + timedelta(minutes=1)
+                if price is not None:
+                    self._fill(order, price)
+                    if order.status == 'filled':
+                        filled.append(order)
+
+        return filled
+
+    def cancel_order_by_id(self, order_id):
+        self._request()
+        with self._lock:
+            order = self.orders.get(order_id)
+            if order is None:
+                raise SimulatedAPIError("order not found", status_code=404)
+            if order.status not in ('new', 'accepted'):
+                raise SimulatedAPIError(f"order is already in \"{order.status}\" state", status_code=422)
+            order.status = 'canceled'
+            order.canceled_at = order.updated_at = datetime.utcnow()
+            self._processed_until.pop(order_id, None)
+
+    def get_order_by_id(self, order_id):
+        self._request()
+        order = self.orders.get(order_id)
+        if order is None:
+            raise SimulatedAPIError("order not found", status_code=404)
+        return order
+
+    def get_order_by_client_id(self, client_order_id):
+        self._request()
+        for order in self.orders.values():
+            if order.client_order_id == client_order_id:
+                return order
+        raise SimulatedAPIError("order not found", status_code=404)
+
+    def list_orders(self, status='open', limit=None, after=None, until=None, direction='desc'):
+        self._request()
+        with self._lock:
+            orders = list(self.orders.values())
+        if status == 'open':
+            orders = [o for o in orders if o.status in ('new', 'accepted')]
+        elif status == 'closed':
+            orders = [o for o in orders if o.status not in ('new', 'accepted')]
+        if after is not None:
+            orders = [o for o in orders if o.created_at > _naive_utc(after)]
+        if until is not None:
+            orders = [o for o in orders if o.created_at < _naive_utc(until)]
+        orders = sorted(orders, key=lambda o: o.created_at, reverse=direction != 'asc')
+        return orders[:limit] if limit else orders
+
+
+_simulator = None
+
+
+def get_simulated_broker():
+    """Shared simulator so every AlpacaClient in the process sees the same account"""
+    global _simulator
+    if _simulator is None:
+        _simulator = SimulatedTradeClient()
+    return _simulator
@@ -9,9 +9,30 @@ class Config:
     ALPACA_SECRET_KEY = os.getenv('ALPACA_SECRET_KEY', '')
     ALPACA_BASE_URL = os.getenv('ALPACA_BASE_URL', 'https://paper-api.alpaca.markets')
     
+    # Broker Backend: 'alpaca' (paper API) or 'simulator' (local, offline)
+    BROKER_BACKEND = os.getenv('BROKER_BACKEND', 'alpaca')
+    SIM_STARTING_CASH = float(os.getenv('SIM_STARTING_CASH', '100000'))
+    SIM_LATENCY_MS = float(os.getenv('SIM_LATENCY_MS', '0'))
+    SIM_LATENCY_JITTER_MS = float(os.getenv('SIM_LATENCY_JITTER_MS', '0'))
+    SIM_RATE_LIMIT_PER_MINUTE = int(os.getenv('SIM_RATE_LIMIT_PER_MINUTE', '200'))  # Alpaca's default
+    SIM_SLIPPAGE_BPS = float(os.getenv('SIM_SLIPPAGE_BPS', '0'))
+    
     # AI API Configuration
     OPENAI_API_KEY = os.getenv('OPENAI_API_KEY', '')
     GEMINI_API_KEY = os.getenv('GEMINI_API_KEY', '')
+    SIGNAL_CONFIDENCE_CHANGE = float(os.getenv('SIGNAL_CONFIDENCE_CHANGE', '0.05'))  # smaller moves only bump last_seen_at
+    # Gemini explanations: only high-conviction signals, within a per-run budget
+    GEMINI_TOP_N = int(os.getenv('GEMINI_TOP_N', '5'))  # strongest signals per run explained by Gemini
+    GEMINI_MIN_CONVICTION = float(os.getenv('GEMINI_MIN_CONVICTION', '0.3'))  # |confidence - 0.5| * 2; 0.3 = >=0.65 or <=0.35
+    GEMINI_RUN_SECONDS = float(os.getenv('GEMINI_RUN_SECONDS', '20'))  # wall clock for all of a run's Gemini calls
+    GEMINI_RUN_TOKENS = int(os.getenv('GEMINI_RUN_TOKENS', '5000'))  # prompt + output tokens per run
+    GEMINI_MAX_OUTPUT_TOKENS = int(os.getenv('GEMINI_MAX_OUTPUT_TOKENS', '150'))
+    GEMINI_COST_PER_1K_TOKENS = float(os.getenv('GEMINI_COST_PER_1K_TOKENS', '0'))  # for the cost metric
+    
+    # Local signal model (signal_model.py)
+    SIGNAL_MODEL_PATH = os.getenv('SIGNAL_MODEL_PATH', 'data/signal_model.pkl')
+    SIGNAL_MODEL_HORIZON_DAYS = int(os.getenv('SIGNAL_MODEL_HORIZON_DAYS', '5'))  # trading days to the outcome
+    SIGNAL_MODEL_TARGET_PERCENT = float(os.getenv('SIGNAL_MODEL_TARGET_PERCENT', '2.0'))  # smaller moves are left out of training
     
     # GitHub Configuration
     GITHUB_TOKEN = os.getenv('GITHUB_TOKEN', '')
@@ -25,15 +46,111 @@ class Config:
     # Convert Render's postgres:// to sqlalchemy's postgresql://
     if DATABASE_URL.startswith('postgres://'):
         DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
+    # Read-only API queries: a replica URL, or (empty) a separate small pool on DATABASE_URL
+    DATABASE_READ_URL = os.getenv('DATABASE_READ_URL', '')
+    if DATABASE_READ_URL.startswith('postgres://'):
+        DATABASE_READ_URL = DATABASE_READ_URL.replace('postgres://', 'postgresql://', 1)
+    READ_POOL_SIZE = int(os.getenv('READ_POOL_SIZE', '3'))
+    READ_MAX_OVERFLOW = int(os.getenv('READ_MAX_OVERFLOW', '2'))
+    READ_POOL_TIMEOUT = float(os.getenv('READ_POOL_TIMEOUT', '5'))  # seconds to wait for a read connection
+    READ_STATEMENT_TIMEOUT_MS = int(os.getenv('READ_STATEMENT_TIMEOUT_MS', '5000'))  # PostgreSQL only
     
     # Stock Check Schedule (10 AM EST)
-    STOCK_CHECK_HOUR = 10
-    STOCK_CHECK_MINUTE = 0
+    STOCK_CHECK_HOUR = int(os.getenv('STOCK_CHECK_HOUR', '10'))
+    STOCK_CHECK_MINUTE = int(os.getenv('STOCK_CHECK_MINUTE', '0'))
     STOCK_CHECK_TIMEZONE = 'America/New_York'
+
+    # Scheduler
+    MARKET_EXTRA_HOLIDAYS = os.getenv('MARKET_EXTRA_HOLIDAYS', '')  # comma-separated YYYY-MM-DD closures
+    SCHEDULER_GRACE_SECONDS = int(os.getenv('SCHEDULER_GRACE_SECONDS', '120'))  # later than this = missed
+    WARMUP_MINUTES = int(os.getenv('WARMUP_MINUTES', '5'))  # warm caches this long before entry; 0 = off
+    WARMUP_REFRESH_SECONDS = int(os.getenv('WARMUP_REFRESH_SECONDS', '60'))  # final bar top-up before entry; 0 = off
+    RECORD_SESSIONS = os.getenv('RECORD_SESSIONS', 'False').lower() == 'true'  # save 1m bars after the close
+    EXECUTION_REPORT = os.getenv('EXECUTION_REPORT', 'True').lower() == 'true'  # execution quality after the close
+
+    # Momentum Strategy Parameters (tune with param_sweep.py)
+    MOMENTUM_THRESHOLD = float(os.getenv('MOMENTUM_THRESHOLD', '2.0'))  # % gain from open
+    STOP_LOSS_PERCENT = float(os.getenv('STOP_LOSS_PERCENT', '1.0'))  # % below purchase price
+    MAX_POSITIONS = int(os.getenv('MAX_POSITIONS', '0'))  # 0 = buy every qualifying stock
+    RUN_CHECKPOINTS = os.getenv('RUN_CHECKPOINTS', 'True').lower() == 'true'  # resumable, idempotent daily runs
+    SAVE_SCAN_SNAPSHOTS = os.getenv('SAVE_SCAN_SNAPSHOTS', 'True').lower() == 'true'  # full scan per day (scan_snapshots.py)
+    STRATEGIES_FILE = os.getenv('STRATEGIES_FILE', '')  # JSON strategy list for strategies.py; empty = momentum only
+    
+    # Capital allocation (allocation.py)
+    ALLOCATION_WEIGHTING = os.getenv('ALLOCATION_WEIGHTING', 'equal')  # 'equal' or 'score'
+    ALLOCATION_MOMENTUM_WEIGHT = float(os.getenv('ALLOCATION_MOMENTUM_WEIGHT', '0.7'))
+    ALLOCATION_LIQUIDITY_WEIGHT = float(os.getenv('ALLOCATION_LIQUIDITY_WEIGHT', '0.3'))
+    MIN_POSITION_NOTIONAL = float(os.getenv('MIN_POSITION_NOTIONAL', '0'))  # smallest position worth opening ($)
+    MAX_POSITION_PERCENT = float(os.getenv('MAX_POSITION_PERCENT', '0'))  # % of buying power per name; 0 = no cap
+    CASH_RESERVE_PERCENT = float(os.getenv('CASH_RESERVE_PERCENT', '0'))  # % of buying power left unallocated
+    
+    # Intraday position monitor (position_monitor.py)
+    POSITION_MONITOR = os.getenv('POSITION_MONITOR', 'False').lower() == 'true'
+    TRAILING_STOP_PERCENT = float(os.getenv('TRAILING_STOP_PERCENT', '1.0'))  # 0 = keep the fixed stop
+    TAKE_PROFIT_PERCENT = float(os.getenv('TAKE_PROFIT_PERCENT', '0'))  # 0 = off
+    MONITOR_EXIT_TIME = os.getenv('MONITOR_EXIT_TIME', '')  # HH:MM EST to exit everything; empty = hold overnight
+    STOP_UPDATE_MIN_STEP_PERCENT = float(os.getenv('STOP_UPDATE_MIN_STEP_PERCENT', '0.25'))  # smallest stop raise sent to the broker
+    MONITOR_INTERVAL_SECONDS = int(os.getenv('MONITOR_INTERVAL_SECONDS', '60'))
+    MONITOR_BAR_DELAY_SECONDS = int(os.getenv('MONITOR_BAR_DELAY_SECONDS', '3'))
+    MONITOR_RESYNC_MINUTES = int(os.getenv('MONITOR_RESYNC_MINUTES', '15'))
     
     # Stock List File
     STOCK_LIST_FILE = 'Stock_list.csv'
     
+    # Nightly universe pre-filter (universe.py)
+    UNIVERSE_PREFILTER = os.getenv('UNIVERSE_PREFILTER', 'False').lower() == 'true'
+    ACTIVE_UNIVERSE_FILE = os.getenv('ACTIVE_UNIVERSE_FILE', 'data/active_universe.csv')
+    UNIVERSE_MIN_PRICE = float(os.getenv('UNIVERSE_MIN_PRICE', '5.0'))
+    UNIVERSE_MIN_AVG_VOLUME = float(os.getenv('UNIVERSE_MIN_AVG_VOLUME', '200000'))
+    UNIVERSE_LOOKBACK_DAYS = int(os.getenv('UNIVERSE_LOOKBACK_DAYS', '20'))
+    UNIVERSE_REQUIRE_SHORTABLE = os.getenv('UNIVERSE_REQUIRE_SHORTABLE', 'False').lower() == 'true'
+    UNIVERSE_MAX_AGE_HOURS = float(os.getenv('UNIVERSE_MAX_AGE_HOURS', '96'))  # covers long weekends
+    UNIVERSE_MIN_COVERAGE = float(os.getenv('UNIVERSE_MIN_COVERAGE', '0.5'))  # share of tickers with data needed to replace the file
+    
+    # Recorded 1-minute sessions used by the backtester
+    BAR_CACHE_DIR = os.getenv('BAR_CACHE_DIR', 'data/bars')
+    
+    # Market Data Provider: 'yfinance', 'alpaca' or 'replay'
+    MARKET_DATA_PROVIDER = os.getenv('MARKET_DATA_PROVIDER', 'yfinance')
+    # Replay provider: session to serve (YYYY-MM-DD) and clock speed (0 = frozen at 9:30)
+    REPLAY_SESSION_DATE = os.getenv('REPLAY_SESSION_DATE', '')
+    REPLAY_SPEED = float(os.getenv('REPLAY_SPEED', '0'))
+    # Tickers per batched bar request and pause between batches during scans
+    SCAN_BATCH_SIZE = int(os.getenv('SCAN_BATCH_SIZE', '200'))
+    SCAN_BATCH_DELAY = float(os.getenv('SCAN_BATCH_DELAY', '0.5'))
+    # Sharded scan (scan_shards.py): shards leased to scan workers through the database
+    SCAN_SHARDS = int(os.getenv('SCAN_SHARDS', '0'))  # 0 or 1 = scan in the strategy process
+    SCAN_LEASE_SECONDS = int(os.getenv('SCAN_LEASE_SECONDS', '60'))  # renewed after every batch
+    SCAN_WORKER_POLL_SECONDS = float(os.getenv('SCAN_WORKER_POLL_SECONDS', '1'))
+    SCAN_SHARD_RETENTION_DAYS = int(os.getenv('SCAN_SHARD_RETENTION_DAYS', '7'))
+    SCAN_SHARD_MAX_ATTEMPTS = int(os.getenv('SCAN_SHARD_MAX_ATTEMPTS', '3'))  # then the shard is marked failed
+    SCAN_SHARD_DEADLINE_SECONDS = float(os.getenv('SCAN_SHARD_DEADLINE_SECONDS', '300'))  # then the strategy scans what's left itself
+    
+    # Pauses on the order path (between orders, and after liquidation)
+    ORDER_DELAY_SECONDS = float(os.getenv('ORDER_DELAY_SECONDS', '0.5'))
+    ORDER_SETTLE_SECONDS = float(os.getenv('ORDER_SETTLE_SECONDS', '2'))
+    
+    # Local order store behind /api/orders (order_store.py)
+    ORDER_SYNC_SECONDS = float(os.getenv('ORDER_SYNC_SECONDS', '15'))  # at most one broker sync per interval
+    ORDER_SYNC_PAGE_SIZE = int(os.getenv('ORDER_SYNC_PAGE_SIZE', '500'))  # Alpaca's maximum
+    ORDER_SYNC_BACKFILL_DAYS = int(os.getenv('ORDER_SYNC_BACKFILL_DAYS', '365'))  # history loaded by the first sync
+    ORDER_SYNC_REQUEST_PAGES = int(os.getenv('ORDER_SYNC_REQUEST_PAGES', '2'))  # pages one API request may fetch; a backfill resumes on the next
+    
+    # Outbound HTTP connection pools (see http_client.py)
+    HTTP_POOL_HOSTS = int(os.getenv('HTTP_POOL_HOSTS', '10'))
+    HTTP_POOL_MAXSIZE = int(os.getenv('HTTP_POOL_MAXSIZE', '32'))  # per host; match yfinance download threads
+    HTTP_POOL_BLOCK = os.getenv('HTTP_POOL_BLOCK', 'True').lower() == 'true'
+    HTTP_RETRIES = int(os.getenv('HTTP_RETRIES', '2'))
+    HTTP_USER_AGENT = os.getenv('HTTP_USER_AGENT', 'Mozilla/5.0 (compatible; MangoTrades/3.0)')
+    
+    # Observability: 'text' (default) or 'json' structured logs, and the worker's /metrics port
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    METRICS_PORT = int(os.getenv('METRICS_PORT', '0'))  # 0 = disabled
+    PROFILE_STRATEGY = os.getenv('PROFILE_STRATEGY', 'False').lower() == 'true'
+    PROFILE_DIR = os.getenv('PROFILE_DIR', 'data/profiles')
+    PROFILE_INTERVAL_MS = float(os.getenv('PROFILE_INTERVAL_MS', '10'))
+    PROFILE_KEEP = int(os.getenv('PROFILE_KEEP', '30'))  # most recent profiles kept on disk
+    
     # Flask Configuration
     FLASK_ENV = os.getenv('FLASK_ENV', 'development')
     FLASK_DEBUG = os.getenv('FLASK_DEBUG', 'False').lower() == 'true'
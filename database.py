@@ -1,8 +1,13 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, Boolean
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, DateTime, Boolean, Text, LargeBinary, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.orm import Session, sessionmaker, deferred
 from datetime import datetime
 from config import Config
+from metrics import DB_COMMIT_LATENCY
+import json
+import time
 
 Base = declarative_base()
 
@@ -80,6 +85,8 @@ class Trade(Base):
     quantity = Column(Integer, nullable=False)
     price = Column(Float, nullable=False)
     position_id = Column(Integer)
+    strategy = Column(String(50))  # strategy that placed the order (see strategies.py)
+    client_order_id = Column(String(64))  # set for checkpointed runs (see run_checkpoint.py)
     timestamp = Column(DateTime, default=datetime.utcnow)
     
     def to_dict(self):
@@ -90,18 +97,23 @@ class Trade(Base):
             'quantity': self.quantity,
             'price': self.price,
             'position_id': self.position_id,
+            'strategy': self.strategy,
+            'client_order_id': self.client_order_id,
             'timestamp': self.timestamp.isoformat() if self.timestamp else None
         }
 
 class AISignal(Base):
     __tablename__ = 'ai_signals'
+    __table_args__ = (Index('ix_ai_signals_ticker_timestamp', 'ticker', 'timestamp'),)
     
     id = Column(Integer, primary_key=True)
     ticker = Column(String(10), nullable=False)
     signal_type = Column(String(20), nullable=False)  # 'buy', 'sell', 'hold'
     confidence = Column(Float)  # 0.0 to 1.0
     reasoning = Column(String(1000))
-    timestamp = Column(DateTime, default=datetime.utcnow)
+    timestamp = Column(DateTime, default=datetime.utcnow)  # when the signal first took this value
+    last_seen_at = Column(DateTime)  # most recent generation that produced the same signal
+    seen_count = Column(Integer, default=1)  # generations folded into this row
     
     def to_dict(self):
         return {
@@ -110,15 +122,307 @@ class AISignal(Base):
             'signal_type': self.signal_type,
             'confidence': self.confidence,
             'reasoning': self.reasoning,
-            'timestamp': self.timestamp.isoformat() if self.timestamp else None
+            'timestamp': self.timestamp.isoformat() if self.timestamp else None,
+            'last_seen_at': self.last_seen_at.isoformat() if self.last_seen_at else None,
+            'seen_count': self.seen_count or 1
+        }
+
+class JobRun(Base):
+    __tablename__ = 'job_runs'
+
+    id = Column(Integer, primary_key=True)
+    job_name = Column(String(50), nullable=False)
+    session_date = Column(String(10), nullable=False)  # YYYY-MM-DD trading day
+    scheduled_for = Column(DateTime, nullable=False)  # UTC
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    status = Column(String(20), nullable=False)  # 'running', 'success', 'failed' or 'missed'
+    lag_seconds = Column(Float)  # start delay relative to the scheduled time
+    message = Column(String(1000))
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'job_name': self.job_name,
+            'session_date': self.session_date,
+            'scheduled_for': self.scheduled_for.isoformat() if self.scheduled_for else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'status': self.status,
+            'lag_seconds': self.lag_seconds,
+            'message': self.message
+        }
+
+class StrategyRun(Base):
+    __tablename__ = 'strategy_runs'
+    __table_args__ = (UniqueConstraint('session_date', 'name'),)
+
+    id = Column(Integer, primary_key=True)
+    session_date = Column(String(10), nullable=False)  # YYYY-MM-DD trading day
+    name = Column(String(50), nullable=False, default='momentum')
+    status = Column(String(20), nullable=False, default='running')  # 'running' or 'complete'
+    attempts = Column(Integer, nullable=False, default=1)  # 1 + number of resumes
+    liquidated_at = Column(DateTime)
+    positions_closed = Column(Integer)
+    scanned_at = Column(DateTime)
+    analyzed_count = Column(Integer)
+    qualifying = Column(Text)  # JSON list of qualifying calculate_momentum() dicts
+    planned_at = Column(DateTime)
+    buying_power = Column(Float)  # buying power the plan was sized with
+    plan = Column(Text)  # JSON allocation plan
+    summary = Column(Text)  # JSON result of the completed run
+    started_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'session_date': self.session_date,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'liquidated_at': self.liquidated_at.isoformat() if self.liquidated_at else None,
+            'positions_closed': self.positions_closed,
+            'scanned_at': self.scanned_at.isoformat() if self.scanned_at else None,
+            'analyzed_count': self.analyzed_count,
+            'qualifying_count': len(json.loads(self.qualifying)) if self.qualifying else None,
+            'planned_at': self.planned_at.isoformat() if self.planned_at else None,
+            'planned_orders': len(json.loads(self.plan)) if self.plan else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class RunOrder(Base):
+    __tablename__ = 'run_orders'
+
+    id = Column(Integer, primary_key=True)
+    run_id = Column(Integer, nullable=False, index=True)
+    client_order_id = Column(String(64), unique=True, nullable=False)  # mt-YYYYMMDD-TICKER-kind
+    ticker = Column(String(10), nullable=False)
+    kind = Column(String(10), nullable=False)  # 'close', 'buy' or 'stop'
+    qty = Column(Integer, nullable=False)
+    status = Column(String(20), nullable=False)  # 'submitting', 'submitted' or 'failed'
+    broker_order_id = Column(String(64))
+    filled_avg_price = Column(Float)
+    stop_price = Column(Float)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_id': self.run_id,
+            'client_order_id': self.client_order_id,
+            'ticker': self.ticker,
+            'kind': self.kind,
+            'qty': self.qty,
+            'status': self.status,
+            'broker_order_id': self.broker_order_id,
+            'filled_avg_price': self.filled_avg_price,
+            'stop_price': self.stop_price,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class ScanShard(Base):
+    __tablename__ = 'scan_shards'
+    __table_args__ = (UniqueConstraint('run_key', 'shard_index'),)
+
+    id = Column(Integer, primary_key=True)
+    run_key = Column(String(64), nullable=False, index=True)  # one sharded scan, e.g. momentum-20240312-1000
+    shard_index = Column(Integer, nullable=False)
+    shard_count = Column(Integer, nullable=False)
+    as_of = Column(DateTime, nullable=False)  # UTC scan time every worker prices against
+    tickers = Column(Text, nullable=False)  # JSON list
+    status = Column(String(20), nullable=False, default='pending')  # 'pending', 'leased', 'done' or 'failed'
+    worker_id = Column(String(100))
+    lease_expires_at = Column(DateTime)  # UTC; an expired lease can be taken over
+    attempts = Column(Integer, nullable=False, default=0)
+    result = Column(Text)  # JSON list of calculate_momentum() dicts
+    created_at = Column(DateTime, default=datetime.utcnow)
+    finished_at = Column(DateTime)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'run_key': self.run_key,
+            'shard_index': self.shard_index,
+            'shard_count': self.shard_count,
+            'tickers': len(json.loads(self.tickers)) if self.tickers else 0,
+            'status': self.status,
+            'worker_id': self.worker_id,
+            'attempts': self.attempts,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+class BrokerOrder(Base):
+    __tablename__ = 'broker_orders'
+
+    id = Column(String(64), primary_key=True)  # broker order ID
+    client_order_id = Column(String(64), index=True)
+    symbol = Column(String(10), nullable=False, index=True)
+    side = Column(String(10))
+    order_type = Column(String(20))
+    time_in_force = Column(String(10))
+    qty = Column(Float)
+    filled_qty = Column(Float)
+    filled_avg_price = Column(Float)
+    limit_price = Column(Float)
+    stop_price = Column(Float)
+    estimated_price = Column(Float)  # allocation's price estimate for strategy buys (the scan quote)
+    signal_at = Column(DateTime)  # UTC time of the scan quote a strategy buy was sized from
+    strategy = Column(String(50))  # strategy that placed a buy (see strategies.py)
+    status = Column(String(20), index=True)
+    created_at = Column(DateTime, index=True)
+    updated_at = Column(DateTime)  # broker's last change; rows are only rewritten when it moves
+    filled_at = Column(DateTime)
+    synced_at = Column(DateTime)  # first seen by a broker sync; unset for orders only saved at submission
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'client_order_id': self.client_order_id,
+            'symbol': self.symbol,
+            'side': self.side,
+            'order_type': self.order_type,
+            'time_in_force': self.time_in_force,
+            'qty': self.qty,
+            'filled_qty': self.filled_qty,
+            'filled_avg_price': self.filled_avg_price,
+            'limit_price': self.limit_price,
+            'stop_price': self.stop_price,
+            'estimated_price': self.estimated_price,
+            'signal_at': self.signal_at.isoformat() if self.signal_at else None,
+            'strategy': self.strategy,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'filled_at': self.filled_at.isoformat() if self.filled_at else None
+        }
+
+class ScanSnapshot(Base):
+    __tablename__ = 'scan_snapshots'
+    __table_args__ = (UniqueConstraint('session_date', 'scan'),)
+
+    id = Column(Integer, primary_key=True)
+    session_date = Column(String(10), nullable=False)  # YYYY-MM-DD trading day
+    scan = Column(String(30), nullable=False, default='momentum')
+    scanned_at = Column(DateTime, nullable=False)  # UTC
+    ticker_count = Column(Integer, nullable=False)
+    qualifying_count = Column(Integer, nullable=False)
+    threshold = Column(Float)
+    data = deferred(Column(LargeBinary, nullable=False))  # compressed columnar arrays (see scan_snapshots.py)
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'session_date': self.session_date,
+            'scan': self.scan,
+            'scanned_at': self.scanned_at.isoformat() if self.scanned_at else None,
+            'ticker_count': self.ticker_count,
+            'qualifying_count': self.qualifying_count,
+            'threshold': self.threshold
         }
 
 # Database setup
 engine = create_engine(Config.DATABASE_URL, echo=False)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def create_read_engine():
+    """Engine for read-only API queries: a replica, or a separate small pool on the primary
+
+    Dashboard reads never take connections from the strategy's pool. On
+    PostgreSQL every read session is read-only and statements are cancelled
+    after READ_STATEMENT_TIMEOUT_MS, so a heavy report can't hold locks or
+    CPU through the entry window.
+    """
+    url = make_url(Config.DATABASE_READ_URL or Config.DATABASE_URL)
+    if url.get_backend_name() != 'postgresql':
+        # SQLite: no replicas, server-side timeouts or connection pool worth splitting
+        return engine if not Config.DATABASE_READ_URL else create_engine(url, echo=False)
+    options = f"-c default_transaction_read_only=on -c statement_timeout={Config.READ_STATEMENT_TIMEOUT_MS}"
+    return create_engine(url, echo=False, pool_size=Config.READ_POOL_SIZE, max_overflow=Config.READ_MAX_OVERFLOW,
+                         pool_timeout=Config.READ_POOL_TIMEOUT, pool_pre_ping=bool(Config.DATABASE_READ_URL),
+                         connect_args={'options': options, 'application_name': 'mangotrades-read'})
+
+class ReadSession(Session):
+    """Session for read_engine; its pool timeouts and database errors carry read_session=True
+
+    The API sheds only those with a 503, so write-path failures (such as
+    SQLite's "database is locked") still surface as errors.
+    """
+
+    def _marked(self, method, *args, **kwargs):
+        try:
+            return method(*args, **kwargs)
+        except (PoolTimeoutError, OperationalError) as e:
+            e.read_session = True
+            raise
+
+    def execute(self, *args, **kwargs):
+        return self._marked(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._marked(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._marked(super().scalars, *args, **kwargs)
+
+read_engine = create_read_engine()
+ReadSessionLocal = sessionmaker(class_=ReadSession, autocommit=False, autoflush=False, bind=read_engine)
+
+@event.listens_for(SessionLocal, 'before_commit')
+def _start_commit_timer(session):
+    session.info['commit_started'] = time.perf_counter()
+
+@event.listens_for(SessionLocal, 'after_commit')
+def _record_commit_time(session):
+    started = session.info.pop('commit_started', None)
+    if started is not None:
+        DB_COMMIT_LATENCY.observe(time.perf_counter() - started)
+
+def warm_connection_pool(connections=None):
+    """Open pooled connections ahead of a run so the first queries skip the connect handshake"""
+    connections = connections or getattr(engine.pool, 'size', lambda: 1)()
+    opened = []
+    try:
+        for _ in range(connections):
+            conn = engine.connect()
+            conn.exec_driver_sql('SELECT 1')
+            opened.append(conn)
+    except Exception as e:
+        print(f"Error warming database connections: {e}")
+    finally:
+        for conn in opened:
+            conn.close()
+    return len(opened)
+
+def ensure_columns():
+    """Add model columns missing from existing tables (create_all never alters a table)"""
+    inspector = inspect(engine)
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(engine.dialect)}"
+            print(f"Migrating database: {ddl}")
+            with engine.begin() as conn:
+                conn.exec_driver_sql(ddl)
+
+def ensure_indexes():
+    """Create model indexes missing from existing tables"""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(engine, checkfirst=True)
+
 def init_db():
     Base.metadata.create_all(engine)
+    ensure_columns()
+    ensure_indexes()
 
 def get_db():
     db = SessionLocal()
@@ -127,3 +431,11 @@ def get_db():
     finally:
         db.close()
 
+def get_read_db():
+    """Session for read-only queries (see create_read_engine)"""
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
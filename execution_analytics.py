@@ -0,0 +1,224 @@
+#!/usr/bin/env python3
+"""
+Execution quality of the strategy's orders.
+
+Every strategy buy is stored in broker_orders (order_store.py) with the
+allocation's estimated_price. That is the scan quote the position was sized
+from. The buy also carries signal_at, the time of that quote. This module
+joins each buy with its fill and with the stop orders placed for the
+position that day:
+
+- slippage: fill price against the signal quote, in basis points and in
+  dollars for the filled shares (positive = cost)
+- latency: signal to submission, submission to fill, and signal to fill
+- stop-outs: whether a stop for the position filled, and the stop fill's
+  slippage against the stop price
+
+Daily aggregates are served at /api/executions/daily, and the orders behind
+them at /api/executions. The execution_report job (EXECUTION_REPORT, on by
+default) runs after the close. It records the day's numbers in the metrics
+and the event log. The same report is available on the command line:
+
+    python execution_analytics.py --days 5
+    python execution_analytics.py --day 2024-03-12 --orders
+"""
+
+import argparse
+from datetime import datetime, timedelta
+import numpy as np
+from database import BrokerOrder, SessionLocal, ReadSessionLocal
+from metrics import EXECUTION_SLIPPAGE, SIGNAL_TO_FILL, STOP_OUTS, log_event
+from order_store import created_between, sync_orders
+
+
+def _bps(price, reference, side='buy'):
+    """Signed slippage in basis points; positive means the fill cost money"""
+    if not price or not reference:
+        return None
+    bps = (price - reference) / reference * 10000
+    return bps if side == 'buy' else -bps
+
+
+def _seconds(start, end):
+    return (end - start).total_seconds() if start and end else None
+
+
+def order_executions(db, start=None, end=None, strategy=None, symbol=None):
+    """Strategy buys with their fill, latency and stop-out details, newest first
+
+    start and end are YYYY-MM-DD days (UTC, inclusive).
+    """
+    query = db.query(BrokerOrder).filter(BrokerOrder.side == 'buy', BrokerOrder.estimated_price.isnot(None))
+    if strategy:
+        query = query.filter(BrokerOrder.strategy == strategy)
+    if symbol:
+        query = query.filter(BrokerOrder.symbol == symbol.upper())
+    buys = created_between(query, start, end).order_by(BrokerOrder.created_at.desc()).all()
+    if not buys:
+        return []
+
+    # Stops placed for these positions: the initial stop plus any trailing replacements
+    stops = {}
+    first_day = min(b.created_at for b in buys).replace(hour=0, minute=0, second=0, microsecond=0)
+    last_day = max(b.created_at for b in buys).replace(hour=0, minute=0, second=0, microsecond=0)
+    for stop in db.query(BrokerOrder).filter(
+            BrokerOrder.side == 'sell', BrokerOrder.order_type == 'stop',
+            BrokerOrder.symbol.in_({b.symbol for b in buys}),
+            BrokerOrder.created_at >= first_day, BrokerOrder.created_at < last_day + timedelta(days=1)):
+        stops.setdefault(stop.symbol, []).append(stop)
+
+    executions = []
+    for buy in buys:
+        filled_qty = buy.filled_qty or 0.0
+        slippage_bps = _bps(buy.filled_avg_price, buy.estimated_price) if buy.status == 'filled' else None
+        day_stops = sorted((s for s in stops.get(buy.symbol, [])
+                            if s.created_at >= buy.created_at and s.created_at.date() == buy.created_at.date()),
+                           key=lambda s: s.created_at)
+        stop_fill = next((s for s in day_stops if s.status == 'filled'), None)
+        stop = stop_fill or (day_stops[-1] if day_stops else None)
+        stop_slippage_bps = _bps(stop_fill.filled_avg_price, stop_fill.stop_price, 'sell') if stop_fill else None
+
+        executions.append({
+            'date': buy.created_at.date().isoformat(),
+            'order_id': buy.id,
+            'symbol': buy.symbol,
+            'strategy': buy.strategy,
+            'status': buy.status,
+            'qty': buy.qty,
+            'filled_qty': filled_qty,
+            'signal_price': buy.estimated_price,
+            'filled_avg_price': buy.filled_avg_price,
+            'slippage_bps': round(slippage_bps, 2) if slippage_bps is not None else None,
+            'slippage_dollars': round((buy.filled_avg_price - buy.estimated_price) * filled_qty, 2)
+            if slippage_bps is not None else None,
+            'signal_at': buy.signal_at.isoformat() if buy.signal_at else None,
+            'submitted_at': buy.created_at.isoformat() if buy.created_at else None,
+            'filled_at': buy.filled_at.isoformat() if buy.filled_at else None,
+            'signal_to_submit_seconds': _seconds(buy.signal_at, buy.created_at),
+            'submit_to_fill_seconds': _seconds(buy.created_at, buy.filled_at),
+            'signal_to_fill_seconds': _seconds(buy.signal_at, buy.filled_at),
+            'stop_price': stop.stop_price if stop else None,
+            'stop_status': stop.status if stop else None,
+            'stopped_out': stop_fill is not None,
+            'stop_fill_price': stop_fill.filled_avg_price if stop_fill else None,
+            'stop_slippage_bps': round(stop_slippage_bps, 2) if stop_slippage_bps is not None else None,
+            'stop_slippage_dollars': round((stop_fill.stop_price - stop_fill.filled_avg_price)
+                                           * (stop_fill.filled_qty or 0), 2) if stop_slippage_bps is not None else None
+        })
+    return executions
+
+
+def _percentile(values, q):
+    return round(float(np.percentile(values, q)), 3) if values else None
+
+
+def daily_summary(executions):
+    """Per-day aggregates of order_executions(), newest day first"""
+    by_day = {}
+    for execution in executions:
+        by_day.setdefault(execution['date'], []).append(execution)
+
+    summary = []
+    for day in sorted(by_day, reverse=True):
+        rows = by_day[day]
+        filled = [r for r in rows if r['slippage_bps'] is not None]
+        latencies = [r['signal_to_fill_seconds'] for r in filled if r['signal_to_fill_seconds'] is not None]
+        with_stop = [r for r in filled if r['stop_status']]
+        stopped = [r for r in with_stop if r['stopped_out']]
+        signal_notional = sum(r['signal_price'] * r['filled_qty'] for r in filled)
+        slippage_dollars = sum(r['slippage_dollars'] for r in filled)
+        stop_slippage_dollars = sum(r['stop_slippage_dollars'] or 0 for r in stopped)
+        summary.append({
+            'date': day,
+            'orders': len(rows),
+            'filled': len(filled),
+            'fill_rate': round(len(filled) / len(rows), 4),
+            # Notional-weighted, so a large position counts for more than a small one
+            'slippage_bps': round(slippage_dollars / signal_notional * 10000, 2) if signal_notional else None,
+            'median_slippage_bps': _percentile([r['slippage_bps'] for r in filled], 50),
+            'slippage_dollars': round(slippage_dollars, 2),
+            'signal_to_fill_p50_seconds': _percentile(latencies, 50),
+            'signal_to_fill_p95_seconds': _percentile(latencies, 95),
+            'stops': len(with_stop),
+            'stop_outs': len(stopped),
+            'stop_out_rate': round(len(stopped) / len(with_stop), 4) if with_stop else None,
+            'stop_slippage_dollars': round(stop_slippage_dollars, 2),
+            'execution_cost_dollars': round(slippage_dollars + stop_slippage_dollars, 2)
+        })
+    return summary
+
+
+def run_report(alpaca=None, day=None):
+    """Sync orders and record one day's execution quality (default: today, UTC)"""
+    day = (day or datetime.utcnow().date()).isoformat()
+    if alpaca is not None:
+        sync_orders(alpaca, force=True)
+
+    db = SessionLocal()
+    try:
+        executions = order_executions(db, start=day, end=day)
+    finally:
+        db.close()
+
+    for execution in executions:
+        labels = {'strategy': execution['strategy'] or 'momentum'}
+        if execution['slippage_bps'] is not None:
+            EXECUTION_SLIPPAGE.observe(execution['slippage_bps'], **labels)
+        if execution['signal_to_fill_seconds'] is not None:
+            SIGNAL_TO_FILL.observe(execution['signal_to_fill_seconds'], **labels)
+        if execution['stopped_out']:
+            STOP_OUTS.inc(**labels)
+
+    summary = daily_summary(executions)
+    day_summary = summary[0] if summary else {'date': day, 'orders': 0}
+    log_event('execution_report', **day_summary)
+    print_summary(summary)
+    return day_summary
+
+
+def print_summary(summary):
+    if not summary:
+        print("No strategy orders in range")
+        return
+    print(f"{'date':<11} {'orders':>6} {'filled':>6} {'slip bps':>9} {'slip $':>9} "
+          f"{'p50 s':>7} {'p95 s':>7} {'stop-outs':>10} {'cost $':>9}")
+    for row in summary:
+        print(f"{row['date']:<11} {row['orders']:>6} {row['filled']:>6} "
+              f"{row['slippage_bps'] if row['slippage_bps'] is not None else '-':>9} {row['slippage_dollars']:>9.2f} "
+              f"{row['signal_to_fill_p50_seconds'] if row['signal_to_fill_p50_seconds'] is not None else '-':>7} "
+              f"{row['signal_to_fill_p95_seconds'] if row['signal_to_fill_p95_seconds'] is not None else '-':>7} "
+              f"{row['stop_outs']:>4}/{row['stops']:<5} {row['execution_cost_dollars']:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Slippage, fill latency and stop-outs of the strategy's orders")
+    parser.add_argument('--day', help="one trading day (YYYY-MM-DD)")
+    parser.add_argument('--days', type=int, default=5, help="days back from today when --day is not given")
+    parser.add_argument('--orders', action='store_true', help="also list the individual orders")
+    parser.add_argument('--no-sync', action='store_true', help="use the stored orders without asking the broker")
+    args = parser.parse_args()
+
+    if not args.no_sync:
+        from alpaca_client import AlpacaClient
+        sync_orders(AlpacaClient(), force=True)
+
+    start = args.day or (datetime.utcnow().date() - timedelta(days=args.days - 1)).isoformat()
+    db = ReadSessionLocal()
+    try:
+        executions = order_executions(db, start=start, end=args.day)
+    finally:
+        db.close()
+
+    print_summary(daily_summary(executions))
+    if args.orders:
+        print()
+        for e in executions:
+            print(f"{e['date']} {e['symbol']:<6} {e['status']:<9} signal ${e['signal_price']:.2f} "
+                  f"fill {'$%.2f' % e['filled_avg_price'] if e['filled_avg_price'] else '-'} "
+                  f"({e['slippage_bps'] if e['slippage_bps'] is not None else '-'} bps) "
+                  f"signal→fill {e['signal_to_fill_seconds'] if e['signal_to_fill_seconds'] is not None else '-'}s"
+                  f"{'  STOPPED at $%.2f' % e['stop_fill_price'] if e['stopped_out'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Gunicorn settings for the API server (loaded automatically by `gunicorn app:app`).
+
+Workers use the gthread worker class: every worker process serves requests
+on a pool of threads, so a route blocked on a broker or database call only
+holds one thread and the rest of the dashboard keeps responding. The
+strategy, signal and stock-check endpoints share module-level objects that
+keep per-run state, so app.py runs one request of each kind at a time per
+worker and answers 409 to the others. gevent is not used because its
+monkey-patching does not mix with Gemini's gRPC channel.
+
+    WEB_CONCURRENCY    worker processes (default 2)
+    WEB_THREADS        threads per worker (default 8)
+    WEB_WORKER_CLASS   'gthread' (default) or 'sync' for the old behavior
+
+Compare the modes with `python load_test.py --compare`.
+"""
+
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = os.getenv('WEB_WORKER_CLASS', 'gthread')
+threads = int(os.getenv('WEB_THREADS', '8'))
+timeout = int(os.getenv('WEB_TIMEOUT', '120'))
+# Idle keep-alive connections hold a thread in gthread workers; keep them short
+keepalive = 5
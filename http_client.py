@@ -0,0 +1,73 @@
+"""
+Shared HTTP connection pools for outbound API calls.
+
+yfinance and the Alpaca SDK both speak HTTP through `requests`. Left alone,
+yfinance opens a fresh connection (and TLS handshake) for many calls. One
+process-wide Session with a tuned HTTPAdapter keeps connections alive and
+sizes each per-host pool to the scan's concurrency:
+
+- HTTP_POOL_HOSTS:   number of hosts to keep pools for
+- HTTP_POOL_MAXSIZE: keep-alive connections per host (match the thread count)
+- HTTP_POOL_BLOCK:   wait for a free connection instead of opening extras
+- HTTP_RETRIES:      retries for idempotent requests on 429/5xx
+
+Only GET/HEAD are retried; order submissions are never replayed.
+"""
+
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from config import Config
+
+_session = None
+_lock = threading.Lock()
+
+
+def build_adapter():
+    retry = Retry(
+        total=Config.HTTP_RETRIES,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(['GET', 'HEAD']),
+        respect_retry_after_header=True,
+        raise_on_status=False
+    )
+    return HTTPAdapter(
+        pool_connections=Config.HTTP_POOL_HOSTS,
+        pool_maxsize=Config.HTTP_POOL_MAXSIZE,
+        pool_block=Config.HTTP_POOL_BLOCK,
+        max_retries=retry
+    )
+
+
+def configure_session(session):
+    """Mount the pooled adapter on an existing requests.Session (e.g. one owned by an SDK client)"""
+    adapter = build_adapter()
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+def get_http_session():
+    """Process-wide pooled requests.Session"""
+    global _session
+    if _session is None:
+        with _lock:
+            if _session is None:
+                session = requests.Session()
+                session.headers['User-Agent'] = Config.HTTP_USER_AGENT
+                _session = configure_session(session)
+    return _session
+
+
+def pool_sdk_client(client):
+    """Give an SDK client that keeps its own requests.Session the tuned pool
+
+    alpaca-py REST clients hold a Session in `_session`; anything else is
+    returned unchanged.
+    """
+    session = getattr(client, '_session', None)
+    if isinstance(session, requests.Session):
+        configure_session(session)
+    return client
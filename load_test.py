@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""
+Concurrent load test for the API server.
+
+Sends requests from many client threads at once to a running server and
+reports throughput and p50/p99 latency per endpoint:
+
+    python load_test.py --url http://localhost:5000 --concurrency 16 --requests 200
+
+--compare starts the API under gunicorn twice on local ports against the
+broker simulator with SIM_LATENCY_MS of broker latency. The first run uses
+sync workers and the second gthread workers. It then prints both results
+side by side:
+
+    python load_test.py --compare --latency-ms 300
+
+With sync workers the server handles at most WEB_CONCURRENCY requests at a
+time, so slow broker calls queue behind each other. With gthread workers
+they overlap.
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+DEFAULT_PATHS = ['/api/account', '/api/alpaca/positions', '/api/orders', '/api/health']
+
+_local = threading.local()
+
+
+def _session():
+    """One keep-alive session per client thread"""
+    if not hasattr(_local, 'session'):
+        _local.session = requests.Session()
+    return _local.session
+
+
+def _get(url):
+    started = time.perf_counter()
+    try:
+        ok = _session().get(url, timeout=60).status_code < 500
+    except requests.RequestException:
+        ok = False
+    return time.perf_counter() - started, ok
+
+
+def run_load(base_url, paths, concurrency, total_requests):
+    """Fire total_requests GETs spread across paths from `concurrency` threads"""
+    urls = [base_url.rstrip('/') + paths[i % len(paths)] for i in range(total_requests)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(_get, urls))
+    elapsed = time.perf_counter() - started
+
+    by_path = {}
+    for i, (seconds, ok) in enumerate(results):
+        stats = by_path.setdefault(paths[i % len(paths)], {'latencies': [], 'errors': 0})
+        stats['latencies'].append(seconds)
+        stats['errors'] += 0 if ok else 1
+
+    report = {'elapsed': elapsed, 'throughput': total_requests / elapsed, 'paths': {}}
+    for path, stats in by_path.items():
+        latencies = np.array(stats['latencies'])
+        report['paths'][path] = {
+            'requests': len(latencies),
+            'errors': stats['errors'],
+            'p50': float(np.percentile(latencies, 50)),
+            'p99': float(np.percentile(latencies, 99))
+        }
+    return report
+
+
+def print_report(title, report):
+    print(f"\n{title}: {report['throughput']:.1f} req/s ({report['elapsed']:.1f}s)")
+    print(f"  {'path':<26} {'requests':>8} {'errors':>6} {'p50 ms':>8} {'p99 ms':>8}")
+    for path, stats in report['paths'].items():
+        print(f"  {path:<26} {stats['requests']:>8} {stats['errors']:>6} "
+              f"{stats['p50'] * 1000:>8.0f} {stats['p99'] * 1000:>8.0f}")
+
+
+def _wait_until_up(url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError("gunicorn exited during startup")
+        try:
+            if requests.get(url + '/api/health', timeout=1).ok:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"Server at {url} did not start within {timeout}s")
+
+
+def serve_and_load(worker_class, port, args, work_dir):
+    """Start gunicorn with worker_class against the broker simulator and load it"""
+    env = dict(os.environ,
+               PORT=str(port),
+               WEB_WORKER_CLASS=worker_class,
+               WEB_CONCURRENCY=str(args.workers),
+               WEB_THREADS=str(args.threads),
+               BROKER_BACKEND='simulator',
+               SIM_LATENCY_MS=str(args.latency_ms),
+               SIM_RATE_LIMIT_PER_MINUTE='0',
+               DATABASE_URL=f"sqlite:///{os.path.join(work_dir, f'{worker_class}.db')}")
+    process = subprocess.Popen([sys.executable, '-m', 'gunicorn', 'app:app'], env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_until_up(url, process)
+        return run_load(url, args.paths, args.concurrency, args.requests)
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent load test for the MangoTrades API")
+    parser.add_argument('--url', default='http://localhost:5000')
+    parser.add_argument('--paths', type=lambda v: v.split(','), default=DEFAULT_PATHS,
+                        help="comma-separated endpoints to cycle through")
+    parser.add_argument('--concurrency', type=int, default=16, help="client threads")
+    parser.add_argument('--requests', type=int, default=200, help="total requests")
+    parser.add_argument('--compare', action='store_true', help="start sync and gthread servers and load both")
+    parser.add_argument('--latency-ms', type=float, default=300, help="simulated broker latency (--compare)")
+    parser.add_argument('--workers', type=int, default=2, help="gunicorn workers (--compare)")
+    parser.add_argument('--threads', type=int, default=8, help="threads per gthread worker (--compare)")
+    parser.add_argument('--port', type=int, default=5055, help="first local port (--compare)")
+    args = parser.parse_args()
+
+    if not args.compare:
+        print_report(f"{args.url} with {args.concurrency} clients", run_load(args.url, args.paths, args.concurrency, args.requests))
+        return
+
+    print(f"Broker latency {args.latency_ms:.0f}ms, {args.workers} workers, {args.concurrency} clients, {args.requests} requests")
+    with tempfile.TemporaryDirectory(prefix='mangotrades-load-') as work_dir:
+        sync = serve_and_load('sync', args.port, args, work_dir)
+        threaded = serve_and_load('gthread', args.port + 1, args, work_dir)
+    print_report('sync workers', sync)
+    print_report(f"gthread workers ({args.threads} threads each)", threaded)
+    print(f"\nThroughput gain: {threaded['throughput'] / sync['throughput']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""
+NYSE trading calendar.
+
+Holidays and early closes are derived from the exchange's standing rules so
+the calendar needs no network access or yearly data file:
+
+- Holidays falling on a Saturday are observed the Friday before (except New
+  Year's Day, which is then not observed), Sunday holidays the Monday after.
+- Early closes (1:00 PM) on July 3, the day after Thanksgiving and Christmas
+  Eve when those are regular trading days.
+
+One-off closures (e.g. national days of mourning) can be added with the
+MARKET_EXTRA_HOLIDAYS setting as comma-separated YYYY-MM-DD dates.
+"""
+
+from datetime import date, datetime, time, timedelta
+import pytz
+from config import Config
+
+MARKET_OPEN = time(9, 30)
+MARKET_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+
+def _nth_weekday(year, month, weekday, n):
+    """n-th given weekday (0=Monday) of a month; n=-1 for the last one"""
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    last = date(year, month + 1, 1) - timedelta(days=1) if month < 12 else date(year, 12, 31)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year):
+    """Gregorian Easter Sunday (anonymous algorithm)"""
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month, day = divmod(h + l - 7 * m + 114, 31)
+    return date(year, month, day + 1)
+
+
+def _observed(day):
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+class MarketCalendar:
+    def __init__(self, extra_holidays=None):
+        self.est = pytz.timezone(Config.STOCK_CHECK_TIMEZONE)
+        if extra_holidays is None:
+            extra_holidays = [d for d in Config.MARKET_EXTRA_HOLIDAYS.split(',') if d.strip()]
+        self.extra_holidays = {datetime.strptime(d.strip(), '%Y-%m-%d').date() for d in extra_holidays}
+        self._holidays = {}
+
+    def holidays(self, year):
+        """Full-day market closures for a year"""
+        if year not in self._holidays:
+            days = {
+                _nth_weekday(year, 1, 0, 3),                   # Martin Luther King Jr. Day
+                _nth_weekday(year, 2, 0, 3),                   # Presidents' Day
+                _easter(year) - timedelta(days=2),             # Good Friday
+                _nth_weekday(year, 5, 0, -1),                  # Memorial Day
+                _observed(date(year, 7, 4)),                   # Independence Day
+                _nth_weekday(year, 9, 0, 1),                   # Labor Day
+                _nth_weekday(year, 11, 3, 4),                  # Thanksgiving
+                _observed(date(year, 12, 25)),                 # Christmas
+            }
+            new_year = date(year, 1, 1)
+            if new_year.weekday() != 5:
+                days.add(_observed(new_year))
+            if year >= 2022:
+                days.add(_observed(date(year, 6, 19)))         # Juneteenth
+            days.update(d for d in self.extra_holidays if d.year == year)
+            self._holidays[year] = days
+        return self._holidays[year]
+
+    def is_trading_day(self, day):
+        return day.weekday() < 5 and day not in self.holidays(day.year)
+
+    def is_early_close(self, day):
+        if not self.is_trading_day(day):
+            return False
+        thanksgiving = _nth_weekday(day.year, 11, 3, 4)
+        return day in (date(day.year, 7, 3), thanksgiving + timedelta(days=1), date(day.year, 12, 24))
+
+    def session(self, day):
+        """(open, close) as EST datetimes, or None when the market is closed"""
+        if not self.is_trading_day(day):
+            return None
+        close = EARLY_CLOSE if self.is_early_close(day) else MARKET_CLOSE
+        return (self.est.localize(datetime.combine(day, MARKET_OPEN)),
+                self.est.localize(datetime.combine(day, close)))
+
+    def next_trading_day(self, day, include_today=False):
+        day = day if include_today else day + timedelta(days=1)
+        while not self.is_trading_day(day):
+            day += timedelta(days=1)
+        return day
+
+    def previous_trading_day(self, day):
+        day -= timedelta(days=1)
+        while not self.is_trading_day(day):
+            day -= timedelta(days=1)
+        return day
+
+    def is_open(self, moment=None):
+        moment = moment or datetime.now(self.est)
+        session = self.session(moment.astimezone(self.est).date())
+        return session is not None and session[0] <= moment < session[1]
@@ -0,0 +1,423 @@
+"""
+Market data providers.
+
+Every provider returns bars the same way: get_bars(tickers, start, end,
+interval) -> {ticker: DataFrame} with Open/High/Low/Close/Volume columns and
+an America/New_York DatetimeIndex. Tickers with no data are left out of the
+result. Select the provider with the MARKET_DATA_PROVIDER setting:
+
+- yfinance: Yahoo Finance via batched yf.download calls (default)
+- alpaca:   Alpaca market data API
+- replay:   recorded sessions from the bar store, served offline
+
+DayBars.from_frame() turns one day of a ticker's bars into plain arrays for
+scans that hold the whole universe in memory.
+"""
+
+import time as time_module
+from datetime import datetime, timedelta, time
+import numpy as np
+import pandas as pd
+import pytz
+from bar_store import BarStore, SESSION_MINUTES
+from config import Config
+from metrics import FETCH_LATENCY, FETCH_FAILURES
+from http_client import get_http_session, pool_sdk_client
+
+BAR_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Volume']
+INTERVAL_MINUTES = {'1m': 1, '2m': 2, '5m': 5, '15m': 15, '30m': 30, '60m': 60, '1h': 60}
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class DayBars:
+    """One ticker's bars for a single day as plain numpy arrays
+
+    The momentum scan and its bar cache hold one of these per ticker instead
+    of a DataFrame. That is a few hundred bytes of arrays, not a DataFrame,
+    its index and block manager. times are UTC epoch nanoseconds and seconds
+    is the wall-clock second of the day in the bars' timezone, which is what
+    entry-time lookups compare against.
+    """
+
+    __slots__ = ('times', 'seconds', 'open', 'high', 'low', 'close', 'volume', 'tz')
+
+    def __init__(self, times, seconds, open_, high, low, close, volume, tz):
+        self.times = times
+        self.seconds = seconds
+        self.open = open_
+        self.high = high
+        self.low = low
+        self.close = close
+        self.volume = volume
+        self.tz = tz
+
+    @classmethod
+    def from_frame(cls, df, day=None):
+        """Bars from a provider DataFrame, keeping only `day` when given; None if nothing is left"""
+        if df is None or df.empty:
+            return None
+        index = df.index
+        if day is not None:
+            day_start, day_end = (pd.Timestamp(datetime.combine(d, time(0, 0))).tz_localize(index.tz)
+                                  for d in (day, day + timedelta(days=1)))
+            mask = (index >= day_start) & (index < day_end)
+            if not mask.all():
+                df, index = df[mask], index[mask]
+                if df.empty:
+                    return None
+        seconds = (index.hour * 3600 + index.minute * 60 + index.second).to_numpy(dtype=np.int32)
+        return cls(index.as_unit('ns').asi8.copy(), seconds,
+                   *(df[column].to_numpy(dtype=np.float64, copy=True) for column in BAR_COLUMNS), index.tz)
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def empty(self):
+        return len(self.times) == 0
+
+    def timestamp(self, position):
+        """Bar time at position as a timestamp in the bars' timezone"""
+        return pd.Timestamp(int(self.times[position]), tz='UTC').tz_convert(self.tz)
+
+    def merge(self, newer):
+        """These bars followed by newer ones; newer wins where they overlap"""
+        keep = self.times < newer.times[0]
+        return DayBars(*(np.concatenate([getattr(self, name)[keep], getattr(newer, name)])
+                         for name in self.__slots__[:-1]), self.tz)
+
+    def open_at(self, hour, minute):
+        """Open of the first bar at or after hour:minute, else of the first bar"""
+        after = np.flatnonzero(self.seconds >= hour * 3600 + minute * 60)
+        return float(self.open[after[0] if len(after) else 0])
+
+    def close_at(self, hour, minute):
+        """Close of the last bar at or before hour:minute, else of the last bar"""
+        upto = np.searchsorted(self.seconds, hour * 3600 + minute * 60, side='right')
+        return float(self.close[upto - 1 if upto else -1])
+
+    def dollar_volume_until(self, hour, minute):
+        """Close x volume summed over the bars at or before hour:minute"""
+        upto = np.searchsorted(self.seconds, hour * 3600 + minute * 60, side='right')
+        return float(np.nansum(self.close[:upto] * self.volume[:upto]))
+
+    def day_bar(self):
+        """The day so far as one daily OHLCV bar (open, high, low, close, volume)"""
+        closes = self.close[~np.isnan(self.close)]
+        with np.errstate(invalid='ignore'):
+            high = np.nanmax(self.high) if not np.isnan(self.high).all() else np.nan
+            low = np.nanmin(self.low) if not np.isnan(self.low).all() else np.nan
+        return (float(self.open[0]), float(high), float(low),
+                float(closes[-1]) if len(closes) else np.nan, float(np.nansum(self.volume)))
+
+
+class MarketDataProvider:
+    """Interface shared by all market data backends"""
+
+    name = 'base'
+    batch_size = 200
+
+    def __init__(self):
+        self.est = pytz.timezone(Config.STOCK_CHECK_TIMEZONE)
+
+    def now(self):
+        """Current market time (replay providers return the simulated clock)"""
+        return datetime.now(self.est)
+
+    def get_bars(self, tickers, start, end=None, interval='1m'):
+        """Fetch OHLCV bars in [start, end) for many tickers at once"""
+        raise NotImplementedError
+
+    def get_quote(self, ticker):
+        """Latest price and previous close as {'price': ..., 'previous_close': ...}"""
+        start = self.now() - timedelta(days=7)
+        hist = self.get_bars([ticker], start, interval='1d').get(ticker)
+        if hist is None or hist.empty:
+            return {'price': None, 'previous_close': None}
+        closes = hist['Close'].dropna()
+        return {
+            'price': float(closes.iloc[-1]) if len(closes) else None,
+            'previous_close': float(closes.iloc[-2]) if len(closes) > 1 else None
+        }
+
+    def _timestamp(self, value):
+        """Coerce a date/datetime/string to an EST pandas Timestamp"""
+        value = pd.Timestamp(value)
+        return value.tz_localize(self.est) if value.tz is None else value.tz_convert(self.est)
+
+    def _normalize(self, df):
+        """Coerce a frame to BAR_COLUMNS with an EST index"""
+        if df is None or df.empty:
+            return None
+        df = df.rename(columns=str.capitalize)
+        if not set(BAR_COLUMNS).issubset(df.columns):
+            return None
+        df = df[BAR_COLUMNS].dropna(how='all')
+        if df.empty:
+            return None
+        index = pd.to_datetime(df.index)
+        index = index.tz_localize(self.est) if index.tz is None else index.tz_convert(self.est)
+        df.index = index
+        return df
+
+
+class YFinanceProvider(MarketDataProvider):
+    name = 'yfinance'
+
+    def get_bars(self, tickers, start, end=None, interval='1m'):
+        import yfinance as yf
+
+        tickers = list(tickers)
+        end = end or self.now() + timedelta(minutes=1)
+        results = {}
+
+        for chunk in _chunks(tickers, self.batch_size):
+            try:
+                with FETCH_LATENCY.time(provider=self.name, interval=interval):
+                    data = yf.download(chunk, start=start, end=end, interval=interval,
+                                       group_by='ticker', auto_adjust=True, threads=True,
+                                       progress=False, session=get_http_session())
+            except Exception as e:
+                FETCH_FAILURES.inc(provider=self.name, interval=interval)
+                print(f"Error downloading {interval} bars for {len(chunk)} tickers: {e}")
+                continue
+            if data is None or data.empty:
+                continue
+
+            for ticker in chunk:
+                try:
+                    df = data[ticker] if isinstance(data.columns, pd.MultiIndex) else data
+                except KeyError:
+                    continue
+                df = self._normalize(df)
+                if df is not None:
+                    results[ticker] = df
+
+        return results
+
+    def get_quote(self, ticker):
+        import yfinance as yf
+
+        try:
+            with FETCH_LATENCY.time(provider=self.name, interval='quote'):
+                info = yf.Ticker(ticker, session=get_http_session()).info
+            price = info.get('currentPrice') or info.get('regularMarketPrice')
+            return {
+                'price': float(price) if price else None,
+                'previous_close': float(info['previousClose']) if info.get('previousClose') else None
+            }
+        except Exception as e:
+            FETCH_FAILURES.inc(provider=self.name, interval='quote')
+            print(f"Error getting quote for {ticker}: {e}")
+            return {'price': None, 'previous_close': None}
+
+
+class AlpacaDataProvider(MarketDataProvider):
+    name = 'alpaca'
+
+    def __init__(self):
+        super().__init__()
+        from alpaca.data.historical import StockHistoricalDataClient
+
+        self.client = pool_sdk_client(StockHistoricalDataClient(Config.ALPACA_API_KEY, Config.ALPACA_SECRET_KEY))
+
+    def _timeframe(self, interval):
+        from alpaca.data.timeframe import TimeFrame, TimeFrameUnit
+
+        if interval == '1d':
+            return TimeFrame.Day
+        if interval in INTERVAL_MINUTES:
+            minutes = INTERVAL_MINUTES[interval]
+            if minutes == 60:
+                return TimeFrame.Hour
+            return TimeFrame(minutes, TimeFrameUnit.Minute)
+        raise ValueError(f"Unsupported interval: {interval}")
+
+    def get_bars(self, tickers, start, end=None, interval='1m'):
+        from alpaca.data.requests import StockBarsRequest
+
+        tickers = list(tickers)
+        timeframe = self._timeframe(interval)
+        results = {}
+
+        for chunk in _chunks(tickers, self.batch_size):
+            try:
+                request = StockBarsRequest(symbol_or_symbols=chunk, timeframe=timeframe,
+                                           start=start, end=end)
+                with FETCH_LATENCY.time(provider=self.name, interval=interval):
+                    data = self.client.get_stock_bars(request).df
+            except Exception as e:
+                FETCH_FAILURES.inc(provider=self.name, interval=interval)
+                print(f"Error fetching {interval} bars from Alpaca for {len(chunk)} tickers: {e}")
+                continue
+            if data is None or data.empty:
+                continue
+
+            for ticker, df in data.groupby(level='symbol'):
+                df = self._normalize(df.droplevel('symbol'))
+                if df is not None:
+                    results[ticker] = df
+
+        return results
+
+    def get_quote(self, ticker):
+        from alpaca.data.requests import StockLatestTradeRequest
+
+        quote = super().get_quote(ticker)
+        try:
+            with FETCH_LATENCY.time(provider=self.name, interval='quote'):
+                trade = self.client.get_stock_latest_trade(StockLatestTradeRequest(symbol_or_symbols=ticker))
+            quote['price'] = float(trade[ticker].price)
+        except Exception as e:
+            FETCH_FAILURES.inc(provider=self.name, interval='quote')
+            print(f"Error getting latest trade for {ticker}: {e}")
+        return quote
+
+
+class ReplayProvider(MarketDataProvider):
+    """Serves recorded bar store sessions as if they were live
+
+    The replay clock starts at `start_at` on the replayed session and runs at
+    `speed` times wall-clock speed (speed=60 plays one minute of market time
+    per second). Only bars that have closed on the replay clock are returned.
+    With speed=None the clock is frozen at `start_at`. Until start() is
+    called, every recorded bar is visible.
+    """
+
+    name = 'replay'
+
+    def __init__(self, store=None, session_date=None, start_at=None, speed=None):
+        super().__init__()
+        self.store = store or BarStore()
+        self._sessions = {}
+        self._indexes = {}
+        self.session_date = None
+        self._replay_start = None
+        self._wall_start = None
+        self.speed = None
+        if session_date is not None:
+            self.start(session_date, start_at, speed)
+
+    def start(self, session_date, start_at=None, speed=None):
+        """Begin replaying session_date from start_at (a datetime.time, default 9:30)"""
+        self.session_date = session_date
+        self.speed = speed
+        start_at = start_at or time(9, 30)
+        self._replay_start = self.est.localize(datetime.combine(session_date, start_at))
+        self._wall_start = time_module.monotonic()
+
+    def now(self):
+        if self._replay_start is None:
+            return super().now()
+        if not self.speed:
+            return self._replay_start
+        elapsed = time_module.monotonic() - self._wall_start
+        return self._replay_start + timedelta(seconds=elapsed * self.speed)
+
+    def _session(self, day):
+        if day not in self._sessions:
+            self._sessions[day] = self.store.load(day) if self.store.has(day) else None
+        return self._sessions[day]
+
+    def _session_index(self, day):
+        if day not in self._indexes:
+            day_start = self.est.localize(datetime.combine(day, time(0, 0)))
+            self._indexes[day] = pd.DatetimeIndex([day_start + timedelta(minutes=int(m)) for m in SESSION_MINUTES])
+        return self._indexes[day]
+
+    def _minute_frames(self, session, tickers, visible_until):
+        index = self._session_index(session.date)
+        if visible_until is None:
+            visible = np.ones(len(index), dtype=bool)
+        else:
+            # A 1-minute bar labelled hh:mm closes at hh:mm+1
+            visible = (index + timedelta(minutes=1)) <= visible_until
+
+        frames = {}
+        for ticker in tickers:
+            row = session.ticker_index.get(ticker)
+            if row is None:
+                continue
+            df = pd.DataFrame({
+                'Open': session.open[row], 'High': session.high[row], 'Low': session.low[row],
+                'Close': session.close[row], 'Volume': session.volume[row]
+            }, index=index)[visible].dropna(how='all')
+            if not df.empty:
+                frames[ticker] = df
+        return frames
+
+    def get_bars(self, tickers, start, end=None, interval='1m'):
+        with FETCH_LATENCY.time(provider=self.name, interval=interval):
+            return self._replay_bars(list(tickers), start, end, interval)
+
+    def _replay_bars(self, tickers, start, end, interval):
+        visible_until = pd.Timestamp(self.now()) if self._replay_start is not None else None
+        start = self._timestamp(start)
+        end = self._timestamp(end) if end is not None else None
+        if visible_until is not None:
+            end = visible_until if end is None else min(end, visible_until)
+
+        parts = {t: [] for t in tickers}
+        for day in self.store.dates(start.date(), end.date() if end is not None else None):
+            session = self._session(day)
+            if session is None:
+                continue
+            for ticker, df in self._minute_frames(session, tickers, visible_until).items():
+                parts[ticker].append(df)
+
+        results = {}
+        for ticker, frames in parts.items():
+            if not frames:
+                continue
+            df = pd.concat(frames) if len(frames) > 1 else frames[0]
+            mask = df.index >= start
+            if end is not None:
+                mask &= df.index < end
+            df = df[mask]
+            if interval != '1m':
+                df = self._resample(df, interval)
+            if not df.empty:
+                results[ticker] = df
+        return results
+
+    def _resample(self, df, interval):
+        rule = '1D' if interval == '1d' else f"{INTERVAL_MINUTES[interval]}min"
+        out = df.resample(rule).agg({'Open': 'first', 'High': 'max', 'Low': 'min',
+                                     'Close': 'last', 'Volume': 'sum'})
+        return out.dropna(subset=['Close'])
+
+
+PROVIDERS = {
+    'yfinance': YFinanceProvider,
+    'alpaca': AlpacaDataProvider,
+    'replay': ReplayProvider,
+}
+
+_provider = None
+
+
+def get_market_data_provider():
+    """Shared provider instance selected by Config.MARKET_DATA_PROVIDER"""
+    global _provider
+    if _provider is None:
+        name = Config.MARKET_DATA_PROVIDER
+        if name not in PROVIDERS:
+            raise ValueError(f"Unknown market data provider: {name}")
+        _provider = PROVIDERS[name]()
+        if isinstance(_provider, ReplayProvider) and Config.REPLAY_SESSION_DATE:
+            _provider.start(
+                datetime.strptime(Config.REPLAY_SESSION_DATE, '%Y-%m-%d').date(),
+                speed=Config.REPLAY_SPEED or None
+            )
+    return _provider
+
+
+def set_market_data_provider(provider):
+    """Install a specific provider instance (used by backtests and benchmarks)"""
+    global _provider
+    _provider = provider
+    return provider
@@ -0,0 +1,260 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters, gauges and histograms are registered once at import time and
+updated from the hot paths (market data fetches, order submission, DB
+commits, scans). The web service exposes them at /metrics; the scheduler
+worker can serve them on METRICS_PORT.
+
+With LOG_FORMAT=json, log_event() also emits one JSON object per line so
+runs can be analysed from the Render logs without parsing free text.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from config import Config
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + (extra or [])
+    if not pairs:
+        return ''
+    escaped = [(k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for k, v in pairs]
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        lines.extend(self._render_samples(items))
+        return lines
+
+    def _render_samples(self, items):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {value}" for key, value in items]
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels))
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = {'counts': [0] * len(self.buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state['counts'][i] += 1
+            state['sum'] += value
+            state['count'] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall-clock duration of the with-block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _render_samples(self, items):
+        lines = []
+        for key, state in items:
+            for bound, count in zip(self.buckets, state['counts']):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', bound)])} {count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, [('le', '+Inf')])} {state['count']}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state['sum']}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state['count']}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                return self._metrics[metric.name]
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = MetricsRegistry()
+
+# Market data
+FETCH_LATENCY = REGISTRY.histogram(
+    'mangotrades_market_data_fetch_seconds', 'Latency of one market data provider request',
+    ['provider', 'interval'])
+FETCH_FAILURES = REGISTRY.counter(
+    'mangotrades_market_data_fetch_failures_total', 'Market data requests that raised an error',
+    ['provider', 'interval'])
+PRICE_FALLBACKS = REGISTRY.counter(
+    'mangotrades_price_fallback_total', 'Momentum prices resolved by a fallback source instead of 1-minute bars',
+    ['price', 'source'])
+
+# Orders
+ORDER_SUBMIT_LATENCY = REGISTRY.histogram(
+    'mangotrades_order_submit_seconds', 'Round trip of a broker order submission',
+    ['side', 'order_type'])
+ORDER_FILL_LATENCY = REGISTRY.histogram(
+    'mangotrades_order_submit_to_fill_seconds', 'Broker-reported time from order submission to fill',
+    ['side', 'order_type'])
+ORDER_FAILURES = REGISTRY.counter(
+    'mangotrades_order_failures_total', 'Order submissions that raised an error',
+    ['side', 'order_type'])
+EXECUTION_SLIPPAGE = REGISTRY.histogram(
+    'mangotrades_execution_slippage_bps', 'Strategy buy fill price against the signal quote (positive = cost)',
+    ['strategy'], buckets=(-25, -10, -5, 0, 5, 10, 25, 50, 100, 250))
+SIGNAL_TO_FILL = REGISTRY.histogram(
+    'mangotrades_signal_to_fill_seconds', 'Time from the scan quote to the fill of a strategy buy',
+    ['strategy'], buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800))
+STOP_OUTS = REGISTRY.counter(
+    'mangotrades_stop_outs_total', 'Strategy positions closed by their stop-loss order', ['strategy'])
+
+# Database
+DB_COMMIT_LATENCY = REGISTRY.histogram(
+    'mangotrades_db_commit_seconds', 'Duration of ORM session commits',
+    [], buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+
+# Scans and strategy stages
+SCAN_TICKERS = REGISTRY.counter(
+    'mangotrades_scan_tickers_total', 'Tickers processed by scans', ['scan'])
+SCAN_DURATION = REGISTRY.histogram(
+    'mangotrades_scan_seconds', 'Duration of a full scan', ['scan'])
+SCAN_THROUGHPUT = REGISTRY.gauge(
+    'mangotrades_scan_throughput_tickers_per_second', 'Throughput of the most recent scan', ['scan'])
+STAGE_DURATION = REGISTRY.histogram(
+    'mangotrades_strategy_stage_seconds', 'Duration of each daily strategy stage', ['stage'])
+
+MONITOR_ACTIONS = REGISTRY.counter(
+    'mangotrades_position_monitor_actions_total', 'Stop updates and exits made by the intraday position monitor',
+    ['action'])
+MONITOR_TICK_DURATION = REGISTRY.histogram(
+    'mangotrades_position_monitor_tick_seconds', 'Duration of one position monitor check')
+
+
+SIGNAL_WRITES = REGISTRY.counter(
+    'mangotrades_ai_signal_writes_total', 'AI signals stored as new rows or folded into the previous row',
+    ['result'])
+
+LLM_REQUESTS = REGISTRY.counter(
+    'mangotrades_llm_requests_total', 'LLM explanation requests by outcome (ok, error, timeout, over_budget)',
+    ['provider', 'result'])
+LLM_LATENCY = REGISTRY.histogram(
+    'mangotrades_llm_request_seconds', 'Latency of one LLM explanation request', ['provider'])
+LLM_TOKENS = REGISTRY.counter(
+    'mangotrades_llm_tokens_total', 'LLM tokens used (reported by the API, or estimated)', ['provider', 'kind'])
+LLM_COST = REGISTRY.counter(
+    'mangotrades_llm_cost_dollars_total', 'Estimated LLM spend at the configured per-token price', ['provider'])
+
+
+def record_scan(scan, tickers, seconds):
+    """Record the size, duration and throughput of a completed scan"""
+    SCAN_TICKERS.inc(tickers, scan=scan)
+    SCAN_DURATION.observe(seconds, scan=scan)
+    SCAN_THROUGHPUT.set(tickers / seconds if seconds > 0 else 0.0, scan=scan)
+    log_event('scan_complete', scan=scan, tickers=tickers, seconds=round(seconds, 3))
+
+
+def log_event(event, **fields):
+    """Emit a structured log line when LOG_FORMAT=json"""
+    if Config.LOG_FORMAT != 'json':
+        return
+    record = {'ts': datetime.utcnow().isoformat() + 'Z', 'event': event}
+    record.update(fields)
+    print(json.dumps(record, default=str), flush=True)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?')[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_metrics_server(port):
+    """Serve /metrics from a background thread (used by the scheduler worker)"""
+    server = ThreadingHTTPServer(('0.0.0.0', port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='metrics-server', daemon=True)
+    thread.start()
+    print(f"Metrics available at http://0.0.0.0:{port}/metrics")
+    return server
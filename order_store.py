@@ -0,0 +1,246 @@
+"""
+Local copy of the broker's orders for the order views.
+
+The broker_orders table mirrors the account's orders and is synced
+incrementally instead of pulling the full order list on every request:
+
+- orders created after the newest stored order, paged oldest first
+- the currently open orders
+- stored orders that were open and no longer are, looked up by ID
+
+A row is only rewritten when the broker's updated_at changed. /api/orders
+syncs at most every ORDER_SYNC_SECONDS and then filters, pages and
+aggregates in the database. Daily stats include fill rate, slippage
+against the allocation's estimated_price (recorded when the buy is placed)
+and stop-loss hits; execution_analytics.py breaks them down per order. The first sync backfills ORDER_SYNC_BACKFILL_DAYS.
+
+API requests fetch at most ORDER_SYNC_REQUEST_PAGES pages and don't wait
+for a sync that is already running; a longer backfill continues on the
+following requests, from the newest order stored so far.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+import pytz
+from sqlalchemy import case, func
+from database import BrokerOrder, SessionLocal
+from metrics import log_event
+from config import Config
+
+# Statuses after which an order never changes again
+TERMINAL_STATUSES = ('filled', 'canceled', 'expired', 'replaced', 'rejected')
+
+_sync_lock = threading.Lock()
+_last_sync = None
+
+
+def _status(value):
+    return str(getattr(value, 'value', value)).lower() if value is not None else None
+
+
+def _utc(value):
+    """Naive UTC datetime from a datetime or ISO string"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    return value.astimezone(pytz.utc).replace(tzinfo=None) if value.tzinfo else value
+
+
+def _float(value):
+    return float(value) if value not in (None, '') else None
+
+
+def save_orders(orders, plans=None):
+    """Insert new orders and update those whose updated_at changed: (inserted, updated)
+
+    plans maps order IDs to what the strategy knew when it sent them
+    (estimated_price, signal_at, strategy); those are only known locally.
+    """
+    if not orders:
+        return 0, 0
+    plans = plans or {}
+    db = SessionLocal()
+    try:
+        ids = [str(o['id']) for o in orders]
+        existing = {row.id: row for row in db.query(BrokerOrder).filter(BrokerOrder.id.in_(ids))}
+        inserted = updated = 0
+        now = datetime.utcnow()
+        for order in orders:
+            order_id = str(order['id'])
+            row = existing.get(order_id)
+            updated_at = _utc(order.get('updated_at')) or _utc(order.get('created_at'))
+            if row is not None and row.updated_at == updated_at and order_id not in plans:
+                row.synced_at = row.synced_at or now
+                continue
+            if row is None:
+                row = BrokerOrder(id=order_id)
+                db.add(row)
+                existing[order_id] = row
+                inserted += 1
+            else:
+                updated += 1
+            row.client_order_id = order.get('client_order_id')
+            row.symbol = order['symbol']
+            row.side = _status(order.get('side'))
+            row.order_type = _status(order.get('order_type'))
+            row.time_in_force = _status(order.get('time_in_force'))
+            row.qty = _float(order.get('qty'))
+            row.filled_qty = _float(order.get('filled_qty')) or 0.0
+            row.filled_avg_price = _float(order.get('filled_avg_price'))
+            row.limit_price = _float(order.get('limit_price'))
+            row.stop_price = _float(order.get('stop_price'))
+            row.status = _status(order.get('status'))
+            row.created_at = _utc(order.get('created_at'))
+            row.updated_at = updated_at
+            row.filled_at = _utc(order.get('filled_at'))
+            if order_id not in plans:
+                row.synced_at = now
+            for key, value in plans.get(order_id, {}).items():
+                setattr(row, key, _utc(value) if key == 'signal_at' else value)
+        db.commit()
+        return inserted, updated
+    except Exception as e:
+        db.rollback()
+        print(f"Error saving orders: {e}")
+        return 0, 0
+    finally:
+        db.close()
+
+
+def sync_orders(alpaca, force=False, max_pages=None, wait=True):
+    """Bring broker_orders up to date; skipped if synced within ORDER_SYNC_SECONDS
+
+    max_pages caps the new-order pages fetched by this call; wait=False
+    returns None at once while another sync holds the lock.
+    """
+    global _last_sync
+    if not _sync_lock.acquire(blocking=wait):
+        return None
+    try:
+        if not force and _last_sync is not None and time.monotonic() - _last_sync < Config.ORDER_SYNC_SECONDS:
+            return None
+        started = time.perf_counter()
+
+        db = SessionLocal()
+        try:
+            # Rows saved at submission haven't been listed yet; orders sent just before them may be missing
+            newest = db.query(func.max(BrokerOrder.created_at)).filter(BrokerOrder.synced_at.isnot(None)).scalar()
+            stored_open = {order_id for (order_id,) in
+                           db.query(BrokerOrder.id).filter(~BrokerOrder.status.in_(TERMINAL_STATUSES))}
+        finally:
+            db.close()
+
+        # 1. New orders, oldest first; `after` is exclusive, so step back to re-read the newest
+        cursor = (newest - timedelta(microseconds=1)) if newest else \
+            datetime.utcnow() - timedelta(days=Config.ORDER_SYNC_BACKFILL_DAYS)
+        inserted = updated = pages = 0
+        seen = set()
+        complete = True
+        while True:
+            page = alpaca.get_orders(status='all', after=pytz.utc.localize(cursor).isoformat(),
+                                     limit=Config.ORDER_SYNC_PAGE_SIZE, direction='asc')
+            added, changed = save_orders(page)
+            inserted, updated = inserted + added, updated + changed
+            seen.update(str(o['id']) for o in page)
+            pages += 1
+            if len(page) < Config.ORDER_SYNC_PAGE_SIZE:
+                break
+            if max_pages and pages >= max_pages:
+                complete = False
+                break
+            cursor = _utc(page[-1]['created_at'])
+
+        # 2. Orders open right now, and 3. orders that closed since the last sync
+        open_orders = alpaca.get_orders(status='open')
+        added, changed = save_orders(open_orders)
+        inserted, updated = inserted + added, updated + changed
+        seen.update(str(o['id']) for o in open_orders)
+        closed = [order for order in (alpaca.get_order(order_id) for order_id in stored_open - seen) if order]
+        added, changed = save_orders(closed)
+        inserted, updated = inserted + added, updated + changed
+
+        # An unfinished backfill isn't throttled, so the next request carries on
+        if complete:
+            _last_sync = time.monotonic()
+        summary = {'inserted': inserted, 'updated': updated, 'rechecked': len(stored_open - seen),
+                   'pages': pages, 'complete': complete, 'seconds': round(time.perf_counter() - started, 3)}
+        log_event('orders_synced', **summary)
+        return summary
+    finally:
+        _sync_lock.release()
+
+
+def created_between(query, start, end):
+    """Limit a query to orders created on days start..end (YYYY-MM-DD, inclusive)"""
+    if start:
+        query = query.filter(BrokerOrder.created_at >= datetime.strptime(start, '%Y-%m-%d'))
+    if end:
+        query = query.filter(BrokerOrder.created_at < datetime.strptime(end, '%Y-%m-%d') + timedelta(days=1))
+    return query
+
+
+def query_orders(db, status='all', symbol=None, side=None, order_type=None, start=None, end=None):
+    """Filtered order query, newest first; status is 'all', 'open', 'closed' or an exact status
+
+    Days are UTC dates, which match the session date for regular-hours orders.
+    """
+    query = db.query(BrokerOrder)
+    if status == 'open':
+        query = query.filter(~BrokerOrder.status.in_(TERMINAL_STATUSES))
+    elif status == 'closed':
+        query = query.filter(BrokerOrder.status.in_(TERMINAL_STATUSES))
+    elif status and status != 'all':
+        query = query.filter(BrokerOrder.status == status.lower())
+    if symbol:
+        query = query.filter(BrokerOrder.symbol == symbol.upper())
+    if side:
+        query = query.filter(BrokerOrder.side == side.lower())
+    if order_type:
+        query = query.filter(BrokerOrder.order_type == order_type.lower())
+    return created_between(query, start, end).order_by(BrokerOrder.created_at.desc())
+
+
+def daily_stats(db, start=None, end=None):
+    """Per-day order counts, fill rate, slippage and stop-loss hits, newest day first"""
+    day = func.date(BrokerOrder.created_at)
+    filled = BrokerOrder.status == 'filled'
+    open_ = ~BrokerOrder.status.in_(TERMINAL_STATUSES)
+    # Signed so a positive number is always a cost: paid above the estimate, or sold below it
+    slippage = case(
+        (filled & (BrokerOrder.estimated_price > 0),
+         (BrokerOrder.filled_avg_price - BrokerOrder.estimated_price) / BrokerOrder.estimated_price * 10000
+         * case((BrokerOrder.side == 'sell', -1), else_=1)),
+        else_=None)
+
+    query = db.query(
+        day.label('day'),
+        func.count(BrokerOrder.id),
+        func.sum(case((filled, 1), else_=0)),
+        func.sum(case((open_, 1), else_=0)),
+        func.sum(case((BrokerOrder.status.in_(('canceled', 'expired', 'rejected')), 1), else_=0)),
+        func.sum(case((filled & (BrokerOrder.order_type == 'stop'), 1), else_=0)),
+        func.sum(case((filled, BrokerOrder.filled_qty * BrokerOrder.filled_avg_price), else_=0)),
+        func.avg(slippage),
+        func.count(slippage)
+    )
+    query = created_between(query, start, end)
+
+    stats = []
+    for row_day, orders, filled_count, open_count, canceled, stop_hits, notional, avg_slippage, slippage_orders \
+            in query.group_by(day).order_by(day.desc()):
+        done = orders - (open_count or 0)
+        stats.append({
+            'date': str(row_day),
+            'orders': orders,
+            'filled': filled_count or 0,
+            'open': open_count or 0,
+            'canceled': canceled or 0,
+            'fill_rate': round((filled_count or 0) / done, 4) if done else None,
+            'stop_loss_hits': stop_hits or 0,
+            'filled_notional': round(float(notional or 0), 2),
+            'avg_slippage_bps': round(float(avg_slippage), 2) if avg_slippage is not None else None,
+            'slippage_orders': slippage_orders
+        })
+    return stats
@@ -0,0 +1,199 @@
+"""
+Parallel parameter sweep for the 30-Minute Momentum Strategy.
+
+Evaluates every combination of momentum threshold, stop-loss percent, entry
+time and max positions over the recorded sessions in the bar store, and
+returns a ranked table of backtest summaries.
+
+The sessions are aligned to one ticker universe and written once to
+memory-mapped .npy files shaped (days, tickers, minutes). Worker processes
+map those files read-only, so the bar data is shared through the OS page
+cache instead of being pickled to every worker.
+"""
+
+import argparse
+import itertools
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from bar_store import BarStore, BarSession, minute_index
+from backtester import replay
+from config import Config
+
+PANEL_FIELDS = ('open', 'low', 'close', 'volume')  # volume feeds the allocation liquidity rank
+
+# Populated in each worker process by _init_worker
+_panel = {}
+
+
+def build_panel(store, days, work_dir, universe=None):
+    """Write the sessions for `days` to memory-mapped arrays in work_dir
+
+    Returns the aligned ticker list. Tickers missing on a given day are NaN.
+    """
+    if universe is None:
+        seen = {}
+        for day in days:
+            for ticker in store.load(day, fields=()).tickers:
+                seen.setdefault(str(ticker), None)
+        universe = list(seen)
+
+    arrays = {}
+    for d, day in enumerate(days):
+        session = store.load(day, fields=PANEL_FIELDS).reindex(universe)
+        if not arrays:
+            shape = (len(days), len(universe), session.close.shape[1])
+            arrays = {
+                field: np.lib.format.open_memmap(
+                    os.path.join(work_dir, f"{field}.npy"), mode='w+', dtype=np.float32, shape=shape)
+                for field in PANEL_FIELDS
+            }
+        for field in PANEL_FIELDS:
+            arrays[field][d] = getattr(session, field)
+        if d % 20 == 0:
+            print(f"Building panel: {d}/{len(days)} sessions")
+
+    for values in arrays.values():
+        values.flush()
+    np.save(os.path.join(work_dir, 'tickers.npy'), np.asarray(universe, dtype=str))
+    np.save(os.path.join(work_dir, 'dates.npy'), np.asarray([d.isoformat() for d in days]))
+    return universe
+
+
+def _init_worker(work_dir):
+    """Map the panel read-only once per worker process"""
+    for field in PANEL_FIELDS:
+        _panel[field] = np.load(os.path.join(work_dir, f"{field}.npy"), mmap_mode='r')
+    _panel['tickers'] = np.load(os.path.join(work_dir, 'tickers.npy'))
+    _panel['dates'] = [datetime.strptime(d, '%Y-%m-%d').date()
+                       for d in np.load(os.path.join(work_dir, 'dates.npy'))]
+
+
+def _panel_session(d):
+    return BarSession(_panel['dates'][d], _panel['tickers'], _panel['open'][d], None,
+                      _panel['low'][d], _panel['close'][d], _panel['volume'][d])
+
+
+def _day_pairs():
+    days = len(_panel['dates'])
+    for d in range(days):
+        yield _panel_session(d), (_panel_session(d + 1) if d + 1 < days else None)
+
+
+def _evaluate(combo):
+    """Backtest one parameter combination inside a worker"""
+    threshold, stop_loss, entry_time, max_positions, initial_capital, slippage_bps = combo
+    hour, minute = (int(part) for part in entry_time.split(':'))
+
+    result = replay(
+        _day_pairs(), initial_capital, collect_fills=False,
+        momentum_threshold=threshold,
+        stop_loss_percent=stop_loss,
+        entry_index=minute_index(hour, minute),
+        slippage_bps=slippage_bps,
+        max_positions=max_positions
+    )
+    summary = result.summary()
+    summary.update({
+        'momentum_threshold': threshold,
+        'stop_loss_percent': stop_loss,
+        'entry_time': entry_time,
+        'max_positions': max_positions
+    })
+    return summary
+
+
+def run_sweep(thresholds, stop_losses, entry_times, max_positions, start=None, end=None,
+              store=None, initial_capital=100000.0, slippage_bps=0.0, rank_by='sharpe',
+              workers=None, work_dir=None, universe=None):
+    """Evaluate the full parameter grid and return a DataFrame ranked by `rank_by`"""
+    store = store or BarStore()
+    days = store.dates(start, end)
+    if not days:
+        print("No recorded sessions found for the requested range")
+        return pd.DataFrame()
+
+    grid = [combo + (initial_capital, slippage_bps) for combo in
+            itertools.product(thresholds, stop_losses, entry_times, max_positions)]
+    workers = workers or os.cpu_count() or 1
+
+    panel_dir = tempfile.mkdtemp(prefix='sweep-', dir=work_dir)
+    try:
+        build_panel(store, days, panel_dir, universe=universe)
+        print(f"Sweeping {len(grid)} combinations over {len(days)} sessions with {workers} workers...")
+
+        rows = []
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(panel_dir,)) as executor:
+            for i, summary in enumerate(executor.map(_evaluate, grid)):
+                rows.append(summary)
+                if (i + 1) % 10 == 0:
+                    print(f"Progress: {i + 1}/{len(grid)} combinations evaluated")
+    finally:
+        shutil.rmtree(panel_dir, ignore_errors=True)
+
+    columns = ['momentum_threshold', 'stop_loss_percent', 'entry_time', 'max_positions']
+    table = pd.DataFrame(rows)
+    table = table[columns + [c for c in table.columns if c not in columns]]
+    table = table.sort_values(rank_by, ascending=False).reset_index(drop=True)
+    table.index = table.index + 1
+    table.index.name = 'rank'
+    return table
+
+
+def _float_list(value):
+    return [float(v) for v in value.split(',') if v]
+
+
+def _int_list(value):
+    return [int(v) for v in value.split(',') if v]
+
+
+def _str_list(value):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep momentum strategy parameters over recorded bars")
+    parser.add_argument('--thresholds', type=_float_list, default=[1.0, 1.5, 2.0, 2.5, 3.0, 4.0])
+    parser.add_argument('--stop-losses', type=_float_list, default=[0.5, 1.0, 1.5, 2.0, 3.0])
+    parser.add_argument('--entry-times', type=_str_list, default=['09:45', '10:00', '10:15', '10:30'])
+    parser.add_argument('--max-positions', type=_int_list, default=[0, 10, 25, 50])
+    parser.add_argument('--start', type=_parse_date)
+    parser.add_argument('--end', type=_parse_date)
+    parser.add_argument('--bars-dir', help="Bar store directory (default: Config.BAR_CACHE_DIR)")
+    parser.add_argument('--capital', type=float, default=100000.0)
+    parser.add_argument('--slippage-bps', type=float, default=0.0)
+    parser.add_argument('--rank-by', default='sharpe')
+    parser.add_argument('--workers', type=int, help="Worker processes (default: all cores)")
+    parser.add_argument('--work-dir', help="Where to place the memory-mapped panel (default: system temp)")
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--output', help="Write the full ranked table to this CSV file")
+    args = parser.parse_args()
+
+    table = run_sweep(
+        args.thresholds, args.stop_losses, args.entry_times, args.max_positions,
+        start=args.start, end=args.end, store=BarStore(args.bars_dir),
+        initial_capital=args.capital, slippage_bps=args.slippage_bps,
+        rank_by=args.rank_by, workers=args.workers, work_dir=args.work_dir
+    )
+
+    if not table.empty:
+        print("\n" + "=" * 60)
+        print(f"🏆 Top {args.top} combinations by {args.rank_by}")
+        print("=" * 60)
+        print(table.head(args.top).to_string())
+        print(f"\nCurrent settings: threshold={Config.MOMENTUM_THRESHOLD}, stop_loss={Config.STOP_LOSS_PERCENT}, "
+              f"entry={Config.STOCK_CHECK_HOUR:02d}:{Config.STOCK_CHECK_MINUTE:02d}, max_positions={Config.MAX_POSITIONS}")
+
+        if args.output:
+            table.to_csv(args.output)
+            print(f"\nRanked table written to {args.output}")
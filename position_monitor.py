@@ -0,0 +1,196 @@
+"""
+Intraday position monitor.
+
+After the entry run, the only protection used to be the static GTC stop
+placed at purchase. The monitor manages exits for every open position until
+the close. It reads the latest 1-minute bars for all held symbols in one
+request per bar and applies the exit rules to the whole book with numpy:
+
+- Trailing stop: the stop follows the highest price seen since entry at
+  TRAILING_STOP_PERCENT below it and never moves down. The broker stop is
+  only amended when the new level beats the current one by
+  STOP_UPDATE_MIN_STEP_PERCENT, which keeps API calls to a minimum.
+- Take profit: exit at market once the close is TAKE_PROFIT_PERCENT above
+  the entry price (0 = off).
+- Time exit: exit everything at MONITOR_EXIT_TIME (HH:MM EST, empty = hold
+  overnight as the strategy does by default).
+
+Stop fills themselves stay with the broker. The monitor re-reads positions
+and orders every MONITOR_RESYNC_MINUTES to pick them up.
+
+Enable with POSITION_MONITOR=true. The scheduler then starts it one minute
+after entry, and it runs until the session closes.
+"""
+
+import time
+from datetime import datetime, timedelta
+import numpy as np
+from alpaca_client import AlpacaClient
+from market_calendar import MarketCalendar
+from market_data import get_market_data_provider
+from metrics import MONITOR_ACTIONS, MONITOR_TICK_DURATION, log_event
+from config import Config
+
+
+def _side(value):
+    return str(getattr(value, 'value', value)).lower()
+
+
+class PositionMonitor:
+    def __init__(self, alpaca=None, market_data=None):
+        self.alpaca = alpaca or AlpacaClient()
+        self.market_data = market_data or get_market_data_provider()
+        self.calendar = MarketCalendar()
+        self.trail_percent = Config.TRAILING_STOP_PERCENT
+        self.take_profit_percent = Config.TAKE_PROFIT_PERCENT
+        self.min_step_percent = Config.STOP_UPDATE_MIN_STEP_PERCENT
+        self.exit_time = datetime.strptime(Config.MONITOR_EXIT_TIME, '%H:%M').time() if Config.MONITOR_EXIT_TIME else None
+        self._set_book([], [], [], [], [], [])
+        self._since = None
+
+    def _set_book(self, symbols, qty, entry, high_water, stop, stop_ids):
+        self.symbols = list(symbols)
+        self.qty = np.asarray(qty, dtype=np.int64)
+        self.entry = np.asarray(entry, dtype=np.float64)
+        self.high_water = np.asarray(high_water, dtype=np.float64)
+        self.stop = np.asarray(stop, dtype=np.float64)
+        self.stop_ids = list(stop_ids)
+
+    def sync(self):
+        """Rebuild the book from broker positions and open stop orders (two API calls)"""
+        positions = self.alpaca.get_positions()
+        stops = {}
+        for order in self.alpaca.get_orders(status='open'):
+            if _side(order['side']) == 'sell' and order.get('stop_price'):
+                stops[order['symbol']] = order
+
+        previous_high = dict(zip(self.symbols, self.high_water))
+        rows = [p for p in positions if int(p['qty']) > 0 and _side(p.get('side', 'long')) == 'long']
+        self._set_book(
+            [p['symbol'] for p in rows],
+            [int(p['qty']) for p in rows],
+            [p['avg_entry_price'] for p in rows],
+            [max(previous_high.get(p['symbol'], 0.0), p['avg_entry_price'], p['current_price']) for p in rows],
+            [stops[p['symbol']]['stop_price'] if p['symbol'] in stops else np.nan for p in rows],
+            [stops[p['symbol']]['id'] if p['symbol'] in stops else None for p in rows]
+        )
+        return len(self.symbols)
+
+    def evaluate(self, high, close, now):
+        """Apply the exit rules to the whole book for the latest bar
+
+        high and close are per-position arrays (NaN where no new bar arrived).
+        Returns (new_stop, move_stop, exit_reason) where exit_reason holds ''
+        for positions that stay open.
+        """
+        self.high_water = np.fmax(self.high_water, high)
+
+        if self.trail_percent:
+            trail = self.high_water * (1 - self.trail_percent / 100)
+        else:
+            trail = np.full(len(self.symbols), np.nan)
+        new_stop = np.fmax(self.stop, trail)
+        with np.errstate(invalid='ignore'):
+            move_stop = np.where(np.isnan(self.stop), ~np.isnan(new_stop),
+                                 new_stop >= self.stop * (1 + self.min_step_percent / 100))
+
+            exit_reason = np.full(len(self.symbols), '', dtype=object)
+            # A stop raised to or above the market would fill at once, so exit directly
+            exit_reason[move_stop & (close <= new_stop)] = 'trailing_stop'
+            if self.take_profit_percent:
+                exit_reason[close >= self.entry * (1 + self.take_profit_percent / 100)] = 'take_profit'
+        if self.exit_time and now.time() >= self.exit_time:
+            exit_reason[:] = 'time_exit'
+
+        move_stop &= exit_reason == ''
+        return new_stop, move_stop, exit_reason
+
+    def _latest_bars(self, now):
+        """Highest high and last close per position since the previous check (one request)"""
+        high = np.full(len(self.symbols), np.nan)
+        close = np.full(len(self.symbols), np.nan)
+        if not self.symbols:
+            return high, close
+        since = self._since or now.replace(hour=0, minute=0, second=0, microsecond=0)
+        bars = self.market_data.get_bars(self.symbols, since, interval='1m')
+        for i, symbol in enumerate(self.symbols):
+            df = bars.get(symbol)
+            if df is None or df.empty:
+                continue
+            high[i] = df['High'].max()
+            close[i] = df['Close'].dropna().iloc[-1] if df['Close'].notna().any() else np.nan
+        self._since = now.replace(second=0, microsecond=0)
+        return high, close
+
+    def tick(self):
+        """One check of every open position; returns the actions taken"""
+        with MONITOR_TICK_DURATION.time():
+            now = self.market_data.now()
+            high, close = self._latest_bars(now)
+            new_stop, move_stop, exit_reason = self.evaluate(high, close, now)
+            actions = []
+
+            for i in np.flatnonzero(exit_reason != ''):
+                symbol, reason = self.symbols[i], exit_reason[i]
+                print(f"🚪 {reason}: selling {self.qty[i]} {symbol} at ~${close[i]:.2f}")
+                if self.stop_ids[i]:
+                    self.alpaca.cancel_order(self.stop_ids[i])
+                order = self.alpaca.place_market_order(symbol, int(self.qty[i]), 'sell')
+                if order:
+                    MONITOR_ACTIONS.inc(action=reason)
+                    actions.append({'symbol': symbol, 'action': reason, 'price': float(close[i])})
+                    self.qty[i] = 0
+                elif self.stop_ids[i] and not np.isnan(self.stop[i]):
+                    # Don't leave the position unprotected if the exit was rejected
+                    restored = self.alpaca.place_stop_loss_order(symbol, int(self.qty[i]), float(self.stop[i]))
+                    self.stop_ids[i] = restored['id'] if restored else None
+
+            stale = False
+            for i in np.flatnonzero(move_stop):
+                symbol = self.symbols[i]
+                order = self.alpaca.replace_stop_order(self.stop_ids[i], symbol, int(self.qty[i]), new_stop[i])
+                if not order:
+                    # Usually the old stop already filled; the resync below drops the position
+                    stale = True
+                    continue
+                print(f"⬆️  {symbol} stop ${self.stop[i]:.2f} -> ${new_stop[i]:.2f}")
+                self.stop[i] = round(new_stop[i], 2)
+                self.stop_ids[i] = order['id']
+                MONITOR_ACTIONS.inc(action='stop_raised')
+                actions.append({'symbol': symbol, 'action': 'stop_raised', 'price': float(new_stop[i])})
+
+            keep = self.qty > 0
+            if not keep.all():
+                self._set_book([s for s, k in zip(self.symbols, keep) if k], self.qty[keep], self.entry[keep],
+                               self.high_water[keep], self.stop[keep],
+                               [o for o, k in zip(self.stop_ids, keep) if k])
+            if stale:
+                self.sync()
+
+        if actions:
+            log_event('monitor_tick', positions=len(self.symbols), actions=len(actions))
+        return actions
+
+    def run(self, until=None):
+        """Check the book once per bar until `until` (default: the session close)"""
+        now = self.market_data.now()
+        session = self.calendar.session(now.date())
+        until = until or (session[1] if session else now)
+        resync_every = timedelta(minutes=Config.MONITOR_RESYNC_MINUTES)
+
+        print(f"\n👀 Position monitor running until {until.strftime('%H:%M %Z')}")
+        self.sync()
+        last_sync = now
+        while now < until:
+            if now - last_sync >= resync_every:
+                self.sync()
+                last_sync = now
+            if self.symbols:
+                self.tick()
+            if not self.symbols:
+                break
+            # Wake a few seconds after each minute so the bar that just closed is published
+            wait = 60 - now.second + Config.MONITOR_BAR_DELAY_SECONDS - now.microsecond / 1e6
+            time.sleep(max(1.0, min(wait, Config.MONITOR_INTERVAL_SECONDS)))
+            now = self.market_data.now()
+        print(f"👀 Position monitor stopped with {len(self.symbols)} open positions")
@@ -0,0 +1,136 @@
+"""
+Low-overhead sampling profiler for scheduled strategy runs.
+
+A background thread snapshots the target thread's Python stack every
+PROFILE_INTERVAL_MS via sys._current_frames() and counts identical stacks.
+The result is written in the folded-stack format ("frame;frame;frame count"
+per line) read by flamegraph.pl, speedscope and inferno.
+
+Profiling is opt-in: set PROFILE_STRATEGY=true. Profiles are written to
+PROFILE_DIR and only the most recent PROFILE_KEEP files are kept.
+"""
+
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+from config import Config
+
+PROFILE_SUFFIX = '.folded'
+_PROFILE_NAME = re.compile(r'^[A-Za-z0-9_.-]+\.folded$')
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class SamplingProfiler:
+    def __init__(self, interval=None, thread_id=None):
+        self.interval = (Config.PROFILE_INTERVAL_MS if interval is None else interval * 1000) / 1000
+        self.thread_id = thread_id
+        self.samples = Counter()
+        self.sample_count = 0
+        self._stop = threading.Event()
+        self._thread = None
+        self.started_at = None
+        self.duration = 0.0
+
+    def _sample(self):
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+        stack = []
+        while frame is not None:
+            stack.append(_frame_label(frame))
+            frame = frame.f_back
+        self.samples[';'.join(reversed(stack))] += 1
+        self.sample_count += 1
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self._sample()
+
+    def start(self):
+        """Start sampling the calling thread (or the thread_id given at construction)"""
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self.started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name='sampling-profiler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self.started_at if self.started_at else 0.0
+
+    def folded(self):
+        """Profile in folded-stack format, heaviest stacks first"""
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def write(self, path):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(self.folded())
+        return path
+
+
+def list_profiles():
+    """Recent profiles, newest first"""
+    if not os.path.isdir(Config.PROFILE_DIR):
+        return []
+    profiles = []
+    for name in os.listdir(Config.PROFILE_DIR):
+        if not name.endswith(PROFILE_SUFFIX):
+            continue
+        path = os.path.join(Config.PROFILE_DIR, name)
+        stat = os.stat(path)
+        profiles.append({
+            'name': name,
+            'size_bytes': stat.st_size,
+            'created_at': datetime.utcfromtimestamp(stat.st_mtime).isoformat()
+        })
+    return sorted(profiles, key=lambda p: p['created_at'], reverse=True)
+
+
+def profile_path(name):
+    """Absolute path of a stored profile, or None for unknown or unsafe names"""
+    if not _PROFILE_NAME.match(name):
+        return None
+    path = os.path.join(os.path.abspath(Config.PROFILE_DIR), name)
+    return path if os.path.isfile(path) else None
+
+
+def _prune_profiles():
+    for profile in list_profiles()[Config.PROFILE_KEEP:]:
+        try:
+            os.remove(os.path.join(Config.PROFILE_DIR, profile['name']))
+        except OSError:
+            pass
+
+
+@contextmanager
+def profile_run(name):
+    """Profile the with-block when PROFILE_STRATEGY is enabled; a no-op otherwise"""
+    if not Config.PROFILE_STRATEGY:
+        yield None
+        return
+
+    profiler = SamplingProfiler()
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        filename = f"{name}-{datetime.utcnow().strftime('%Y%m%dT%H%M%SZ')}{PROFILE_SUFFIX}"
+        try:
+            path = profiler.write(os.path.join(Config.PROFILE_DIR, filename))
+            _prune_profiles()
+            print(f"📈 Profile written to {path} ({profiler.sample_count} samples over {profiler.duration:.1f}s)")
+        except Exception as e:
+            print(f"Error writing profile: {e}")
@@ -0,0 +1,192 @@
+"""
+Checkpoints for the daily strategy run.
+
+One strategy_runs row per trading day and run records how far the run
+got. The single momentum run is named 'momentum'; with STRATEGIES_FILE,
+each cycle (strategies_1000) and each strategy in it (strategy_<name>)
+has its own row.
+
+Stages:
+
+- liquidated: close_all_positions finished
+- scanned: the qualifying stocks from the scan
+- planned: the allocation plan and the buying power it was sized with
+- orders: one run_orders row per broker order (close, buy or stop), written
+  before the order is sent and updated with the broker's answer
+
+Every order carries a client order ID derived from the date, ticker and
+order kind (mt-20240312-AAPL-buy), plus the strategy for runs opened with
+a tag (mt-20240312-momentum_1030-AAPL-buy), so two strategies buying the
+same ticker on the same day don't collide. The broker rejects a second order with
+the same ID, so an order is never sent twice, even when the process dies
+between sending it and recording the result. A restarted run skips the
+finished stages, reuses the stored scan and plan, and only sends the
+orders that are still missing. Recovery takes a few seconds instead of a
+full rescan.
+"""
+
+import json
+from datetime import datetime
+from database import StrategyRun, RunOrder, SessionLocal
+
+
+class RunCheckpoint:
+    def __init__(self, run_id, session_date, name, tag=None):
+        self.run_id = run_id
+        self.session_date = session_date
+        self.name = name
+        self.tag = tag
+
+    @classmethod
+    def open(cls, session_date, name='momentum', tag=None):
+        """Today's run record, created on first use; resuming counts an attempt
+
+        tag goes into the client order IDs of the run's orders.
+        """
+        db = SessionLocal()
+        try:
+            run = db.query(StrategyRun).filter_by(session_date=session_date.isoformat(), name=name).first()
+            if run is None:
+                run = StrategyRun(session_date=session_date.isoformat(), name=name, status='running', attempts=1)
+                db.add(run)
+            elif run.status != 'complete':
+                run.attempts += 1
+                print(f"♻️  Resuming {name} run for {run.session_date} (attempt {run.attempts})")
+            db.commit()
+            return cls(run.id, session_date, name, tag)
+        finally:
+            db.close()
+
+    @staticmethod
+    def find(session_date, name='momentum'):
+        """Today's run record as a dict, or None"""
+        db = SessionLocal()
+        try:
+            run = db.query(StrategyRun).filter_by(session_date=session_date.isoformat(), name=name).first()
+            return run.to_dict() if run else None
+        finally:
+            db.close()
+
+    @staticmethod
+    def bought_tickers(session_date, names):
+        """Tickers the named runs sent (or started sending) a buy for on session_date"""
+        if not names:
+            return set()
+        db = SessionLocal()
+        try:
+            run_ids = [run_id for (run_id,) in db.query(StrategyRun.id).filter(
+                StrategyRun.session_date == session_date.isoformat(), StrategyRun.name.in_(names))]
+            return {ticker for (ticker,) in db.query(RunOrder.ticker).filter(
+                RunOrder.run_id.in_(run_ids), RunOrder.kind == 'buy', RunOrder.status != 'failed')}
+        finally:
+            db.close()
+
+    def _load(self):
+        db = SessionLocal()
+        try:
+            return db.get(StrategyRun, self.run_id)
+        finally:
+            db.close()
+
+    def _update(self, **values):
+        db = SessionLocal()
+        try:
+            run = db.get(StrategyRun, self.run_id)
+            for key, value in values.items():
+                setattr(run, key, value)
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error saving run checkpoint: {e}")
+        finally:
+            db.close()
+
+    # Stages
+
+    def state(self):
+        """Completed stages and their stored outputs"""
+        run = self._load()
+        return {
+            'complete': run.status == 'complete',
+            'liquidated': run.liquidated_at is not None,
+            'positions_closed': run.positions_closed or 0,
+            'scanned': run.scanned_at is not None,
+            'scanned_at': run.scanned_at,
+            'analyzed_count': run.analyzed_count or 0,
+            'qualifying': json.loads(run.qualifying) if run.qualifying else [],
+            'planned': run.planned_at is not None,
+            'buying_power': run.buying_power,
+            'plan': json.loads(run.plan) if run.plan else [],
+            'summary': json.loads(run.summary) if run.summary else None
+        }
+
+    def mark_liquidated(self, positions_closed):
+        self._update(liquidated_at=datetime.utcnow(), positions_closed=positions_closed)
+
+    def mark_scanned(self, qualifying, analyzed_count):
+        self._update(scanned_at=datetime.utcnow(), qualifying=json.dumps(qualifying), analyzed_count=analyzed_count)
+
+    def save_plan(self, plan, buying_power):
+        self._update(planned_at=datetime.utcnow(), plan=json.dumps(plan), buying_power=buying_power)
+
+    def complete(self, summary):
+        self._update(status='complete', finished_at=datetime.utcnow(), summary=json.dumps(summary, default=str))
+
+    # Orders
+
+    def client_order_id(self, ticker, kind):
+        prefix = f"mt-{self.session_date.strftime('%Y%m%d')}"
+        if self.tag:
+            prefix += f"-{self.tag}"
+        return f"{prefix}-{ticker}-{kind}"
+
+    def order(self, ticker, kind):
+        """The recorded order for (ticker, kind) today, or None"""
+        db = SessionLocal()
+        try:
+            order = db.query(RunOrder).filter_by(client_order_id=self.client_order_id(ticker, kind)).first()
+            return order.to_dict() if order else None
+        finally:
+            db.close()
+
+    def begin_order(self, ticker, kind, qty):
+        """Record the intent to send an order before it goes to the broker"""
+        client_order_id = self.client_order_id(ticker, kind)
+        db = SessionLocal()
+        try:
+            order = db.query(RunOrder).filter_by(client_order_id=client_order_id).first()
+            if order is None:
+                order = RunOrder(run_id=self.run_id, client_order_id=client_order_id, ticker=ticker, kind=kind)
+                db.add(order)
+            order.qty = qty
+            order.status = 'submitting'
+            order.updated_at = datetime.utcnow()
+            db.commit()
+        finally:
+            db.close()
+        return client_order_id
+
+    def finish_order(self, client_order_id, status, broker_order=None):
+        """Record the broker's answer for an order"""
+        db = SessionLocal()
+        try:
+            order = db.query(RunOrder).filter_by(client_order_id=client_order_id).first()
+            order.status = status
+            if broker_order:
+                order.broker_order_id = str(broker_order.get('id'))
+                order.filled_avg_price = broker_order.get('filled_avg_price')
+                order.stop_price = broker_order.get('stop_price')
+            order.updated_at = datetime.utcnow()
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"Error saving order checkpoint {client_order_id}: {e}")
+        finally:
+            db.close()
+
+    def orders(self):
+        db = SessionLocal()
+        try:
+            return [o.to_dict() for o in db.query(RunOrder).filter_by(run_id=self.run_id).order_by(RunOrder.id)]
+        finally:
+            db.close()
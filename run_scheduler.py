@@ -6,11 +6,16 @@ This will check stocks at 10 AM EST and generate AI signals at 10:30 AM EST
 
 from scheduler import Scheduler
 from database import init_db
+from config import Config
+from metrics import start_metrics_server
 
 if __name__ == "__main__":
     print("Initializing database...")
     init_db()
     
+    if Config.METRICS_PORT:
+        start_metrics_server(Config.METRICS_PORT)
+    
     print("Starting scheduler...")
     scheduler = Scheduler()
     scheduler.start()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Sharded momentum scan across worker processes.
+
+With SCAN_SHARDS > 1 the 10:00 scan splits the universe into that many
+shards, stored as rows in the scan_shards table. Any process connected to
+the same database can lease a shard, scan it and write its results back.
+That includes the strategy process, workers on the same box and separate
+Render workers. The strategy merges the results for the purchase stage.
+
+- A lease lasts SCAN_LEASE_SECONDS and is renewed after every batch. A
+  worker that dies mid-shard loses its lease, and the next free worker
+  rescans the shard. A shard that raises or is abandoned
+  SCAN_SHARD_MAX_ATTEMPTS times is marked failed.
+- Leasing is a compare-and-set UPDATE, so two workers never hold the same
+  shard. On PostgreSQL the candidate rows are also read with
+  FOR UPDATE SKIP LOCKED, so workers don't queue behind each other.
+- The strategy process works shards itself while it waits, so the scan
+  still completes when no worker is running. Once every shard is done or
+  failed, or after SCAN_SHARD_DEADLINE_SECONDS, it scans the tickers of
+  the unfinished shards itself.
+- Every worker prices against the scan time stored on the shard.
+
+    python scan_shards.py worker                  # one scan worker
+    python scan_shards.py worker --processes 4    # four on this machine
+
+Workers on separate machines need a shared database (PostgreSQL). SQLite
+only works for processes on one box.
+"""
+
+import argparse
+import json
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from multiprocessing import get_context
+import pytz
+from sqlalchemy import and_, or_, update
+from sqlalchemy.exc import IntegrityError
+from database import ScanShard, SessionLocal, init_db
+from metrics import log_event
+from scan_snapshots import ScanResults
+from config import Config
+
+# Workers ignore shards of runs older than this (e.g. a coordinator that died)
+RUN_MAX_AGE = timedelta(hours=1)
+
+
+def worker_name():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def create_shards(run_key, tickers, as_of, shard_count):
+    """Split tickers into pending shards for run_key (no-op if the run already exists)"""
+    db = SessionLocal()
+    try:
+        if db.query(ScanShard.id).filter_by(run_key=run_key).first():
+            return False
+        as_of_utc = as_of.astimezone(pytz.utc).replace(tzinfo=None)
+        for index in range(shard_count):
+            # Strided so every shard gets a similar mix of liquid and illiquid names
+            shard_tickers = tickers[index::shard_count]
+            if shard_tickers:
+                db.add(ScanShard(run_key=run_key, shard_index=index, shard_count=shard_count, as_of=as_of_utc,
+                                 tickers=json.dumps(shard_tickers), status='pending', attempts=0))
+        cutoff = datetime.utcnow() - timedelta(days=Config.SCAN_SHARD_RETENTION_DAYS)
+        db.query(ScanShard).filter(ScanShard.created_at < cutoff).delete(synchronize_session=False)
+        db.commit()
+        return True
+    except IntegrityError:
+        # Another coordinator created the same run first
+        db.rollback()
+        return False
+    finally:
+        db.close()
+
+
+def lease_shard(worker_id, run_key=None):
+    """Claim a pending or abandoned shard; returns its details or None
+
+    Abandoned shards that used up their attempts are marked failed instead.
+    """
+    now = datetime.utcnow()
+    db = SessionLocal()
+    try:
+        abandoned = update(ScanShard).where(ScanShard.status == 'leased', ScanShard.lease_expires_at < now,
+                                            ScanShard.attempts >= Config.SCAN_SHARD_MAX_ATTEMPTS)
+        if run_key:
+            abandoned = abandoned.where(ScanShard.run_key == run_key)
+        db.execute(abandoned.values(status='failed', lease_expires_at=None, finished_at=now)
+                   .execution_options(synchronize_session=False))
+
+        query = db.query(ScanShard).filter(ScanShard.attempts < Config.SCAN_SHARD_MAX_ATTEMPTS, or_(
+            ScanShard.status == 'pending',
+            and_(ScanShard.status == 'leased', ScanShard.lease_expires_at < now)
+        ))
+        if run_key:
+            query = query.filter(ScanShard.run_key == run_key)
+        else:
+            query = query.filter(ScanShard.created_at >= now - RUN_MAX_AGE)
+        candidates = query.order_by(ScanShard.id).limit(5).with_for_update(skip_locked=True).all()
+
+        for shard in candidates:
+            claimed = db.execute(
+                update(ScanShard)
+                .where(ScanShard.id == shard.id, ScanShard.status == shard.status,
+                       ScanShard.attempts == shard.attempts)
+                .values(status='leased', worker_id=worker_id, attempts=shard.attempts + 1,
+                        lease_expires_at=now + timedelta(seconds=Config.SCAN_LEASE_SECONDS))
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if claimed:
+                details = {
+                    'id': shard.id,
+                    'run_key': shard.run_key,
+                    'shard_index': shard.shard_index,
+                    'shard_count': shard.shard_count,
+                    'as_of': pytz.utc.localize(shard.as_of),
+                    'tickers': json.loads(shard.tickers),
+                    'attempt': shard.attempts + 1
+                }
+                db.commit()
+                return details
+        db.commit()
+        return None
+    except Exception as e:
+        db.rollback()
+        print(f"Error leasing scan shard: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def _update_own_shard(shard_id, worker_id, **values):
+    """Update a shard only while this worker still holds its lease"""
+    db = SessionLocal()
+    try:
+        updated = db.execute(
+            update(ScanShard)
+            .where(ScanShard.id == shard_id, ScanShard.worker_id == worker_id, ScanShard.status == 'leased')
+            .values(**values)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.commit()
+        return bool(updated)
+    except Exception as e:
+        db.rollback()
+        print(f"Error updating scan shard {shard_id}: {e}")
+        return False
+    finally:
+        db.close()
+
+
+def renew_lease(shard_id, worker_id):
+    return _update_own_shard(shard_id, worker_id,
+                             lease_expires_at=datetime.utcnow() + timedelta(seconds=Config.SCAN_LEASE_SECONDS))
+
+
+def complete_shard(shard_id, worker_id, result_json):
+    return _update_own_shard(shard_id, worker_id, status='done', result=result_json,
+                             finished_at=datetime.utcnow(), lease_expires_at=None)
+
+
+def release_shard(shard, worker_id):
+    """Give up a shard after an error: back to pending, or failed on its last attempt"""
+    status = 'failed' if shard['attempt'] >= Config.SCAN_SHARD_MAX_ATTEMPTS else 'pending'
+    _update_own_shard(shard['id'], worker_id, status=status, lease_expires_at=None,
+                      finished_at=datetime.utcnow() if status == 'failed' else None)
+    return status
+
+
+def work_shard(momentum, shard, worker_id):
+    """Scan one leased shard and store its results; False if it failed or the lease was lost"""
+    as_of = shard['as_of'].astimezone(momentum.est)
+    print(f"🧩 {worker_id}: shard {shard['shard_index'] + 1}/{shard['shard_count']} of {shard['run_key']} "
+          f"({len(shard['tickers'])} tickers, attempt {shard['attempt']})")
+    started = time.perf_counter()
+    try:
+        # Each result is encoded as it streams out of the scan; only the JSON text is kept
+        encoded = [json.dumps(result) for result in momentum.iter_momentum(
+            shard['tickers'], as_of, on_batch=lambda: renew_lease(shard['id'], worker_id))]
+    except Exception as e:
+        status = release_shard(shard, worker_id)
+        print(f"❌ Error scanning shard {shard['shard_index']} of {shard['run_key']} ({status}): {e}")
+        log_event('scan_shard_failed', run_key=shard['run_key'], shard=shard['shard_index'], worker=worker_id,
+                  attempt=shard['attempt'], status=status, error=str(e))
+        return False
+    stored = complete_shard(shard['id'], worker_id, f"[{','.join(encoded)}]")
+    if not stored:
+        print(f"⚠️  Lost the lease on shard {shard['shard_index']} of {shard['run_key']}; results discarded")
+    log_event('scan_shard_complete', run_key=shard['run_key'], shard=shard['shard_index'], worker=worker_id,
+              tickers=len(shard['tickers']), seconds=round(time.perf_counter() - started, 3), stored=stored)
+    return stored
+
+
+def shard_progress(run_key):
+    """Shard counts by status for a run"""
+    db = SessionLocal()
+    try:
+        counts = {'pending': 0, 'leased': 0, 'done': 0, 'failed': 0}
+        for (status,) in db.query(ScanShard.status).filter_by(run_key=run_key):
+            counts[status] = counts.get(status, 0) + 1
+        counts['total'] = sum(counts.values())
+        return counts
+    finally:
+        db.close()
+
+
+def unfinished_shards(run_key):
+    """(done shard IDs, tickers of every shard that isn't done) for a run"""
+    db = SessionLocal()
+    try:
+        done, unfinished = [], []
+        for shard_id, status, shard_tickers in db.query(ScanShard.id, ScanShard.status, ScanShard.tickers) \
+                .filter_by(run_key=run_key).order_by(ScanShard.id):
+            if status == 'done':
+                done.append(shard_id)
+            else:
+                unfinished.extend(json.loads(shard_tickers))
+        return done, unfinished
+    finally:
+        db.close()
+
+
+def merge_results(run_key, tickers, shard_ids=None, extra=()):
+    """Combine the done shards' results (or only shard_ids) and extra results into a ScanResults
+
+    Shards are read one at a time.
+    """
+    scan = ScanResults(tickers)
+    db = SessionLocal()
+    try:
+        query = db.query(ScanShard.id).filter_by(run_key=run_key, status='done')
+        if shard_ids is not None:
+            query = query.filter(ScanShard.id.in_(shard_ids))
+        for (shard_id,) in query.order_by(ScanShard.id):
+            for result in json.loads(db.query(ScanShard.result).filter_by(id=shard_id).scalar() or '[]'):
+                scan.add(result)
+    finally:
+        db.close()
+    for result in extra:
+        scan.add(result)
+    order = {ticker: i for i, ticker in enumerate(tickers)}
+    scan.qualifying.sort(key=lambda r: order.get(r['ticker'], len(order)))
+    return scan
+
+
+class ShardCoordinator:
+    def __init__(self, momentum, shard_count=None, worker_id=None):
+        self.momentum = momentum
+        self.shard_count = shard_count or Config.SCAN_SHARDS
+        self.worker_id = worker_id or worker_name()
+
+    def scan(self, tickers, now):
+        """Shard the scan, work shards alongside the workers and merge the results into a ScanResults"""
+        run_key = f"momentum-{now.strftime('%Y%m%d-%H%M')}"
+        if create_shards(run_key, tickers, now, self.shard_count):
+            print(f"🧩 Split {len(tickers)} tickers into {self.shard_count} shards ({run_key})")
+        else:
+            print(f"🧩 Resuming sharded scan {run_key}")
+
+        worked = 0
+        deadline = time.monotonic() + Config.SCAN_SHARD_DEADLINE_SECONDS
+        while time.monotonic() < deadline:
+            shard = lease_shard(self.worker_id, run_key)
+            if shard:
+                worked += work_shard(self.momentum, shard, self.worker_id)
+                continue
+            progress = shard_progress(run_key)
+            if progress['done'] + progress['failed'] >= progress['total']:
+                break
+            time.sleep(Config.SCAN_WORKER_POLL_SECONDS)
+
+        # Failed shards, and any still out with workers at the deadline, are scanned here
+        done, unfinished = unfinished_shards(run_key)
+        if unfinished:
+            print(f"⚠️  {len(unfinished)} tickers in unfinished shards; scanning them here")
+        scan = merge_results(run_key, tickers, shard_ids=done, extra=self._scan_locally(unfinished, now))
+        print(f"🧩 Merged {len(done)} shards ({worked} scanned here) and {len(unfinished)} tickers "
+              f"scanned locally: {len(scan)} results")
+        log_event('scan_shards_merged', run_key=run_key, shards=len(done), local_shards=worked,
+                  local_tickers=len(unfinished), results=len(scan), qualifying=len(scan.qualifying))
+        return scan
+
+    def _scan_locally(self, tickers, now):
+        """Momentum results for tickers, one batch at a time; a failing batch is skipped"""
+        for batch_start in range(0, len(tickers), Config.SCAN_BATCH_SIZE):
+            batch = tickers[batch_start:batch_start + Config.SCAN_BATCH_SIZE]
+            try:
+                yield from list(self.momentum.iter_momentum(batch, now))
+            except Exception as e:
+                print(f"❌ Error scanning {len(batch)} tickers locally; they are left out of the scan: {e}")
+                log_event('scan_batch_failed', tickers=len(batch), error=str(e))
+
+
+def run_worker(worker_id=None, idle_exit_seconds=None):
+    """Lease and scan shards until stopped (or idle for idle_exit_seconds)"""
+    from trading_strategy import MomentumStrategy
+
+    worker_id = worker_id or worker_name()
+    momentum = MomentumStrategy()
+    print(f"🧩 Scan worker {worker_id} polling every {Config.SCAN_WORKER_POLL_SECONDS}s")
+    idle_since = time.monotonic()
+    while True:
+        shard = lease_shard(worker_id)
+        if shard:
+            work_shard(momentum, shard, worker_id)
+            idle_since = time.monotonic()
+            continue
+        if idle_exit_seconds is not None and time.monotonic() - idle_since > idle_exit_seconds:
+            return
+        time.sleep(Config.SCAN_WORKER_POLL_SECONDS)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded momentum scan workers")
+    sub = parser.add_subparsers(dest='command', required=True)
+    worker = sub.add_parser('worker', help="lease and scan shards")
+    worker.add_argument('--processes', type=int, default=1)
+    worker.add_argument('--idle-exit', type=float, default=None, help="exit after this many idle seconds")
+    args = parser.parse_args()
+
+    init_db()
+    if args.processes <= 1:
+        run_worker(idle_exit_seconds=args.idle_exit)
+        return
+
+    # Spawn rather than fork so every process opens its own database and HTTP connections
+    ctx = get_context('spawn')
+    processes = [ctx.Process(target=run_worker, kwargs={'idle_exit_seconds': args.idle_exit})
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+"""
+Compact daily scan snapshots.
+
+Every momentum scan result is kept, not just the top 100 in the API
+response. Each trading day's scan is stored as one scan_snapshots row.
+The row holds the metadata plus a single compressed blob of columnar numpy
+arrays: ticker, open_price, current_price, change_percent, dollar_volume
+and qualifies. A 7,700-ticker scan is around 150 KB, and a whole day loads
+in one read. The data lives in the database rather than on disk, so the
+web service can read what the scheduler worker wrote. A later scan on the
+same day replaces the earlier one.
+
+Saved by the trading runs unless SAVE_SCAN_SNAPSHOTS=false: the momentum
+run's scan, and in a strategy cycle the scan of each momentum strategy
+under the strategy's name. Scans started from the dashboard aren't saved.
+"""
+
+import io
+from array import array
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytz
+from sqlalchemy import func
+from database import ScanSnapshot, SessionLocal, ReadSessionLocal
+from config import Config
+
+PRICE_FIELDS = ('open_price', 'current_price', 'change_percent', 'dollar_volume')
+
+
+class ScanResults:
+    """calculate_momentum() dicts reduced into columns as a scan streams them
+
+    Holds about 40 bytes per analyzed ticker (the snapshot columns) plus the
+    qualifying dicts, instead of every result dict. Results may arrive in
+    any order (sharded scans); columns() and rows() return stock-list order.
+    """
+
+    def __init__(self, tickers):
+        self.tickers = tickers
+        self.qualifying = []
+        self._ticker = []
+        self._columns = {field: array('d') for field in PRICE_FIELDS}
+        self._qualifies = array('b')
+
+    def add(self, result):
+        self._ticker.append(result['ticker'])
+        for field, column in self._columns.items():
+            value = result.get(field)
+            column.append(value if value is not None else np.nan)
+        self._qualifies.append(bool(result.get('qualifies')))
+        if result.get('qualifies'):
+            self.qualifying.append(result)
+
+    def __len__(self):
+        return len(self._ticker)
+
+    def _order(self):
+        """Positions that sort the stored results into stock-list order"""
+        position = {ticker: i for i, ticker in enumerate(self.tickers)}
+        return np.argsort([position.get(t, len(position)) for t in self._ticker], kind='stable')
+
+    def columns(self):
+        """ticker, PRICE_FIELDS and qualifies as numpy arrays in stock-list order"""
+        order = self._order()
+        columns = {'ticker': np.array(self._ticker, dtype=str)[order]}
+        for field, column in self._columns.items():
+            columns[field] = np.frombuffer(column, dtype=np.float64)[order]
+        columns['qualifies'] = np.frombuffer(self._qualifies, dtype=np.int8)[order].astype(bool)
+        return columns
+
+    def rows(self, limit=None):
+        """The first `limit` results as dicts, in stock-list order"""
+        columns = self.columns()
+        count = len(self) if limit is None else min(limit, len(self))
+        return [{'ticker': str(columns['ticker'][i]),
+                 **{field: None if np.isnan(columns[field][i]) else float(columns[field][i]) for field in PRICE_FIELDS},
+                 'qualifies': bool(columns['qualifies'][i])} for i in range(count)]
+
+
+def pack_columns(columns):
+    """ScanResults.columns() -> compressed npz bytes"""
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **columns)
+    return buffer.getvalue()
+
+
+def unpack_results(data):
+    """Compressed npz bytes -> DataFrame with one row per ticker"""
+    with np.load(io.BytesIO(data)) as arrays:
+        return pd.DataFrame({name: arrays[name] for name in ('ticker',) + PRICE_FIELDS + ('qualifies',)})
+
+
+def save_scan(results, scanned_at, threshold=None, scan='momentum'):
+    """Store (or replace) the day's snapshot from a ScanResults; returns the row id"""
+    columns = results.columns()
+    data = pack_columns(columns)
+    session_date = scanned_at.date().isoformat()
+    db = SessionLocal()
+    try:
+        snapshot = db.query(ScanSnapshot).filter_by(session_date=session_date, scan=scan).first()
+        if snapshot is None:
+            snapshot = ScanSnapshot(session_date=session_date, scan=scan)
+            db.add(snapshot)
+        snapshot.scanned_at = scanned_at.astimezone(pytz.utc).replace(tzinfo=None)
+        snapshot.ticker_count = len(results)
+        snapshot.qualifying_count = int(columns['qualifies'].sum())
+        snapshot.threshold = threshold
+        snapshot.data = data
+        db.commit()
+        return snapshot.id
+    except Exception as e:
+        db.rollback()
+        print(f"Error saving scan snapshot: {e}")
+        return None
+    finally:
+        db.close()
+
+
+def list_scans(start=None, end=None, scan='momentum'):
+    """Snapshot metadata (without the data), newest first"""
+    db = ReadSessionLocal()
+    try:
+        query = db.query(ScanSnapshot, func.length(ScanSnapshot.data)).filter(ScanSnapshot.scan == scan)
+        if start:
+            query = query.filter(ScanSnapshot.session_date >= start)
+        if end:
+            query = query.filter(ScanSnapshot.session_date <= end)
+        return [{**snapshot.to_dict(), 'size_bytes': size}
+                for snapshot, size in query.order_by(ScanSnapshot.session_date.desc())]
+    finally:
+        db.close()
+
+
+def load_scan(session_date, scan='momentum'):
+    """The day's full scan as a DataFrame, or None"""
+    db = ReadSessionLocal()
+    try:
+        row = db.query(ScanSnapshot.data).filter_by(session_date=str(session_date), scan=scan).first()
+    finally:
+        db.close()
+    return unpack_results(row[0]) if row else None
+
+
+def ticker_history(ticker, start=None, end=None, scan='momentum'):
+    """One ticker's scan results across days, oldest first"""
+    db = ReadSessionLocal()
+    try:
+        query = db.query(ScanSnapshot.session_date, ScanSnapshot.data).filter(ScanSnapshot.scan == scan)
+        if start:
+            query = query.filter(ScanSnapshot.session_date >= start)
+        if end:
+            query = query.filter(ScanSnapshot.session_date <= end)
+        rows = query.order_by(ScanSnapshot.session_date).all()
+    finally:
+        db.close()
+
+    history = []
+    for session_date, data in rows:
+        df = unpack_results(data)
+        match = df[df['ticker'] == ticker]
+        if not match.empty:
+            history.append({'session_date': session_date, **records(match)[0]})
+    return history
+
+
+def records(df):
+    """DataFrame rows as JSON-safe dicts (NaN -> None)"""
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict(orient='records')
@@ -1,23 +1,217 @@
-import schedule
 import time
 import pytz
-from datetime import datetime
+from datetime import datetime, timedelta
 from trading_strategy import MomentumStrategy
+from market_calendar import MarketCalendar
+from database import JobRun, SessionLocal
+from profiler import profile_run
+from run_checkpoint import RunCheckpoint
 from config import Config
 
+
+class ScheduledJob:
+    """A job that runs once per trading day
+
+    The trigger is either a fixed EST wall-clock time (`at`) or an offset in
+    minutes from the session's open or close (`anchor`), so close-anchored
+    jobs follow early closes automatically.
+    """
+
+    def __init__(self, name, func, at=None, anchor=None, offset_minutes=0, grace_seconds=None):
+        if (at is None) == (anchor is None):
+            raise ValueError("Give a job either a fixed time or an anchor")
+        if anchor not in (None, 'open', 'close'):
+            raise ValueError(f"Unknown anchor: {anchor}")
+        self.name = name
+        self.func = func
+        self.at = at
+        self.anchor = anchor
+        self.offset_minutes = offset_minutes
+        self.grace_seconds = Config.SCHEDULER_GRACE_SECONDS if grace_seconds is None else grace_seconds
+
+    def trigger_time(self, calendar, day):
+        """EST datetime the job fires on `day`, or None on non-trading days"""
+        session = calendar.session(day)
+        if session is None:
+            return None
+        if self.at is not None:
+            return calendar.est.localize(datetime.combine(day, self.at))
+        base = session[0] if self.anchor == 'open' else session[1]
+        # Offset in UTC then convert back so the result stays DST-correct
+        return calendar.est.normalize(base + timedelta(minutes=self.offset_minutes))
+
+
 class Scheduler:
     def __init__(self):
         self.strategy = MomentumStrategy()
+        self.runner = None
+        if Config.STRATEGIES_FILE:
+            from strategies import StrategyRunner
+            self.runner = StrategyRunner(momentum=self.strategy)
         self.est = pytz.timezone(Config.STOCK_CHECK_TIMEZONE)
-    
+        self.calendar = MarketCalendar()
+        self.jobs = []
+        self._register_default_jobs()
+
+    def _register_default_jobs(self):
+        entry_times = self.runner.entry_times() if self.runner else \
+            [(Config.STOCK_CHECK_HOUR, Config.STOCK_CHECK_MINUTE)]
+        first_entry, last_entry = [datetime.strptime(f"{hour:02d}:{minute:02d}", '%H:%M')
+                                   for hour, minute in (entry_times[0], entry_times[-1])]
+        if Config.WARMUP_MINUTES:
+            self.add_job('warmup', self.runner.warmup if self.runner else self.strategy.warmup,
+                         at=(first_entry - timedelta(minutes=Config.WARMUP_MINUTES)).time())
+        if Config.WARMUP_MINUTES and Config.WARMUP_REFRESH_SECONDS:
+            self.add_job('warmup_refresh', self.strategy.refresh_bar_cache,
+                         at=(first_entry - timedelta(seconds=Config.WARMUP_REFRESH_SECONDS)).time())
+        if self.runner:
+            # One cycle per distinct entry time; each builds a single shared snapshot
+            for hour, minute in entry_times:
+                self.add_job(f'strategies_{hour:02d}{minute:02d}',
+                             lambda entry_time=(hour, minute): self.strategy_cycle_job(entry_time),
+                             at=datetime.strptime(f"{hour:02d}:{minute:02d}", '%H:%M').time())
+        else:
+            self.add_job('strategy_entry', self.execute_trading_strategy_job, at=first_entry.time())
+        if Config.POSITION_MONITOR:
+            # Holds the scheduler loop until the close, so it starts after the last entry run finishes
+            self.add_job('position_monitor', self.position_monitor_job,
+                         at=(last_entry + timedelta(minutes=1)).time(), grace_seconds=6 * 3600)
+        if Config.RECORD_SESSIONS:
+            # Give the data provider a few minutes to publish the final bars
+            self.add_job('record_session', self.record_session_job, anchor='close', offset_minutes=15)
+        if Config.EXECUTION_REPORT:
+            self.add_job('execution_report', self.execution_report_job, anchor='close', offset_minutes=5)
+        if Config.UNIVERSE_PREFILTER:
+            self.add_job('universe_prefilter', self.universe_prefilter_job, anchor='close', offset_minutes=30)
+
+    def add_job(self, name, func, at=None, anchor=None, offset_minutes=0, grace_seconds=None):
+        job = ScheduledJob(name, func, at=at, anchor=anchor, offset_minutes=offset_minutes,
+                           grace_seconds=grace_seconds)
+        self.jobs.append(job)
+        return job
+
+    def next_triggers(self, after):
+        """Earliest upcoming trigger time after `after` and the jobs due then"""
+        day = after.astimezone(self.est).date()
+        for _ in range(14):
+            if self.calendar.is_trading_day(day):
+                due = {}
+                for job in self.jobs:
+                    trigger = job.trigger_time(self.calendar, day)
+                    if trigger is not None and trigger > after:
+                        due.setdefault(trigger, []).append(job)
+                if due:
+                    trigger = min(due)
+                    return trigger, due[trigger]
+            day += timedelta(days=1)
+        return None, []
+
+    def _sleep_until(self, trigger):
+        """Sleep until the trigger, re-checking the clock at least once a minute"""
+        while True:
+            remaining = (trigger - datetime.now(self.est)).total_seconds()
+            if remaining <= 0:
+                return
+            time.sleep(min(remaining, 60))
+
+    def _record_run(self, job, scheduled_for, status, started_at=None, finished_at=None, lag=None, message=None, run_id=None):
+        db = SessionLocal()
+        try:
+            run = db.get(JobRun, run_id) if run_id else None
+            if run is None:
+                run = JobRun(job_name=job.name, session_date=scheduled_for.date().isoformat(),
+                             scheduled_for=scheduled_for.astimezone(pytz.utc).replace(tzinfo=None))
+                db.add(run)
+            run.status = status
+            run.started_at = started_at or run.started_at
+            run.finished_at = finished_at
+            run.lag_seconds = lag if lag is not None else run.lag_seconds
+            run.message = message[:1000] if message else None
+            db.commit()
+            return run.id
+        except Exception as e:
+            db.rollback()
+            print(f"Error recording {job.name} run: {e}")
+            return None
+        finally:
+            db.close()
+
+    def record_missed_runs(self, now=None):
+        """Mark today's jobs whose trigger passed without a recorded run as missed"""
+        now = now or datetime.now(self.est)
+        today = now.date()
+        db = SessionLocal()
+        try:
+            recorded = {name for (name,) in db.query(JobRun.job_name).filter_by(session_date=today.isoformat())}
+        finally:
+            db.close()
+
+        for job in self.jobs:
+            trigger = job.trigger_time(self.calendar, today)
+            if trigger is None or job.name in recorded:
+                continue
+            if (now - trigger).total_seconds() > job.grace_seconds:
+                print(f"⚠️  Missed {job.name} scheduled for {trigger.strftime('%H:%M:%S %Z')}")
+                self._record_run(job, trigger, 'missed', lag=(now - trigger).total_seconds(),
+                                 message='Scheduler was not running at the trigger time')
+
+    def run_job(self, job, scheduled_for, ignore_grace=False):
+        """Run a job now, or record it as missed if it is past the grace period"""
+        started_at = datetime.now(self.est)
+        lag = (started_at - scheduled_for).total_seconds()
+        if lag > job.grace_seconds and not ignore_grace:
+            print(f"⚠️  Skipping {job.name}: {lag:.0f}s late (grace {job.grace_seconds}s)")
+            self._record_run(job, scheduled_for, 'missed', lag=lag, message=f"Started {lag:.0f}s late")
+            return
+
+        run_id = self._record_run(job, scheduled_for, 'running', started_at=started_at.astimezone(pytz.utc).replace(tzinfo=None), lag=lag)
+        try:
+            job.func()
+            status, message = 'success', None
+        except Exception as e:
+            status, message = 'failed', str(e)
+            print(f"[{datetime.now(self.est)}] Error in {job.name}: {e}")
+        self._record_run(job, scheduled_for, status, finished_at=datetime.utcnow(),
+                         message=message, run_id=run_id)
+
+    def resume_interrupted_run(self, now=None):
+        """Finish today's strategy runs that a restart interrupted before the close"""
+        if not Config.RUN_CHECKPOINTS:
+            return False
+        now = now or datetime.now(self.est)
+        session = self.calendar.session(now.date())
+        if session is None or now >= session[1]:
+            return False
+        resumed = False
+        # The momentum run's checkpoint is 'momentum'; each strategy cycle's is named like its job
+        for job in self.jobs:
+            if job.name == 'strategy_entry':
+                name = 'momentum'
+            elif job.name.startswith('strategies_'):
+                name = job.name
+            else:
+                continue
+            trigger = job.trigger_time(self.calendar, now.date())
+            if trigger is None or now < trigger:
+                continue
+            run = RunCheckpoint.find(now.date(), name=name)
+            if not run or run['status'] == 'complete':
+                continue
+            print(f"♻️  Today's {job.name} run was interrupted (attempt {run['attempts']}); resuming it now")
+            # Completed stages and sent orders are skipped, so running late is safe here
+            self.run_job(job, trigger, ignore_grace=True)
+            resumed = True
+        return resumed
+
     def execute_trading_strategy_job(self):
         """Job to execute the 30-minute momentum strategy at 10 AM EST"""
         current_time = datetime.now(self.est)
         print(f"\n[{current_time.strftime('%Y-%m-%d %H:%M:%S %Z')}] Starting 30-Minute Momentum Strategy...")
-        
+
         try:
-            result = self.strategy.execute_daily_strategy()
-            
+            with profile_run('strategy'):
+                result = self.strategy.execute_daily_strategy()
+
             if result['success']:
                 print(f"[{datetime.now()}] Strategy executed successfully!")
                 print(f"  - Qualifying stocks: {result['qualifying_count']}")
@@ -25,24 +219,57 @@ class Scheduler:
                 print(f"  - Total invested: ${result.get('total_invested', 0):,.2f}")
             else:
                 print(f"[{datetime.now()}] Strategy completed: {result.get('message', 'No action taken')}")
-                
+
         except Exception as e:
             print(f"[{datetime.now()}] Error executing trading strategy: {e}")
             import traceback
             traceback.print_exc()
-    
+            raise
+
+    def strategy_cycle_job(self, entry_time):
+        """Run the configured strategies that enter at entry_time off one market snapshot"""
+        with profile_run(f'strategies-{entry_time[0]:02d}{entry_time[1]:02d}'):
+            result = self.runner.run(entry_time)
+        if not result['success']:
+            raise RuntimeError(result.get('message', 'Strategy cycle failed'))
+
+    def record_session_job(self):
+        """Save today's 1-minute bars to the bar store for backtests and replay"""
+        from bar_store import record_session
+
+        record_session(self.strategy.load_stock_list(), datetime.now(self.est).date())
+
+    def position_monitor_job(self):
+        """Manage trailing stops and exits for today's positions until the close"""
+        from position_monitor import PositionMonitor
+
+        PositionMonitor(alpaca=self.strategy.alpaca, market_data=self.strategy.market_data).run()
+
+    def execution_report_job(self):
+        """Record today's slippage, signal-to-fill latency and stop-outs"""
+        from execution_analytics import run_report
+
+        run_report(alpaca=self.strategy.alpaca)
+
+    def universe_prefilter_job(self):
+        """Rebuild the active universe for the next session's scan"""
+        from universe import build_active_universe, load_tickers
+
+        build_active_universe(load_tickers(), alpaca=self.strategy.alpaca)
+
     def start(self):
         """Start the scheduler - 100% AUTONOMOUS"""
-        # Schedule strategy execution at 10:00 AM EST daily (30 min after market open)
-        # Market opens at 9:30 AM EST, so 10:00 AM is exactly 30 minutes after
-        schedule.every().day.at("10:00").do(self.execute_trading_strategy_job)
-        
         print("=" * 60)
         print("🚀 MangoTrades V3 - 30-Minute Momentum Strategy Scheduler")
         print("=" * 60)
         print("✅ 100% AUTONOMOUS - No manual intervention required")
-        print("Strategy will execute daily at 10:00 AM EST")
-        print("(30 minutes after market open at 9:30 AM EST)")
+        print(f"Strategy will execute at {Config.STOCK_CHECK_HOUR:02d}:{Config.STOCK_CHECK_MINUTE:02d} EST on NYSE trading days")
+        print("(weekends, exchange holidays and missed triggers are skipped)")
+        print()
+        print("Scheduled jobs:")
+        for job in self.jobs:
+            when = job.at.strftime('%H:%M:%S EST') if job.at else f"{job.offset_minutes:+d} min from {job.anchor}"
+            print(f"  - {job.name}: {when}")
         print()
         print("Strategy Details:")
         print("  1. Closes ALL existing positions")
@@ -56,13 +283,27 @@ class Scheduler:
         print()
         print("Scheduler is running...")
         print("=" * 60)
-        
+
+        self.resume_interrupted_run()
+        self.record_missed_runs()
+
         # Run scheduler - infinite loop for 100% autonomy
+        # Advance from the last trigger rather than the clock so a job that overruns
+        # the next trigger still gets it (run late within the grace period or recorded as missed)
+        last_trigger = datetime.now(self.est)
         while True:
-            schedule.run_pending()
-            time.sleep(60)  # Check every minute
+            trigger, jobs = self.next_triggers(last_trigger)
+            if trigger is None:
+                print("No trading days in the next two weeks; checking again in an hour")
+                time.sleep(3600)
+                last_trigger = datetime.now(self.est)
+                continue
+            print(f"Next: {', '.join(job.name for job in jobs)} at {trigger.strftime('%Y-%m-%d %H:%M:%S %Z')}")
+            self._sleep_until(trigger)
+            for job in jobs:
+                self.run_job(job, trigger)
+            last_trigger = trigger
 
 if __name__ == "__main__":
     scheduler = Scheduler()
     scheduler.start()
-
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+"""
+Local signal model for AIDecisionMaker.
+
+Trains a classifier offline on daily bars: for every ticker and day, the
+features are the day's technical indicators and the outcome is the move to
+the close SIGNAL_MODEL_HORIZON_DAYS later. Days that moved at least
+SIGNAL_MODEL_TARGET_PERCENT either way are labelled up or down; smaller
+moves are left out. The model's probability of "up" is the signal
+confidence, so buy (> 0.6) and sell (< 0.4) mean the same as for the
+indicator rules. The fitted model, its feature scaling and holdout metrics
+are pickled to SIGNAL_MODEL_PATH.
+
+At signal time the features for the whole universe are computed as one
+matrix from the batched daily history and scored in a single predict call.
+Scoring is local and takes milliseconds. Only the strongest few signals
+(GEMINI_TOP_N) are sent to Gemini for a written explanation.
+
+scikit-learn is optional. With it the model is a RandomForestClassifier;
+without it a small numpy logistic regression is trained instead.
+
+    python signal_model.py train                  # 1 year of daily bars from the provider
+    python signal_model.py train --source bars    # recorded sessions in the bar store
+    python signal_model.py info
+"""
+
+import argparse
+import os
+import pickle
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from bar_store import BarStore
+from config import Config
+
+try:
+    from sklearn.ensemble import RandomForestClassifier
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    RandomForestClassifier = None
+    SKLEARN_AVAILABLE = False
+
+FEATURES = ('sma5_gap', 'sma20_gap', 'rsi', 'macd_hist', 'price_change', 'change_5d',
+            'volume_ratio', 'volatility_10d')
+
+# Calendar days of daily history needed to compute every feature at inference time
+FEATURE_LOOKBACK_DAYS = 60
+
+ARTIFACT_VERSION = 1
+
+
+# Features
+
+def daily_panel(history):
+    """Wide (dates x tickers) close and volume frames from {ticker: daily DataFrame}"""
+    frames = {ticker: df for ticker, df in history.items() if df is not None and not df.empty}
+    tickers = list(frames)
+    dates = {ticker: df.index.date for ticker, df in frames.items()}
+    all_dates = sorted(set().union(*dates.values())) if dates else []
+    row_of = {day: row for row, day in enumerate(all_dates)}
+
+    # Filled column by column in numpy; a DataFrame built from a dict of Series
+    # aligns every Series one at a time and is far slower for thousands of tickers
+    close = np.full((len(all_dates), len(tickers)), np.nan)
+    volume = np.full((len(all_dates), len(tickers)), np.nan)
+    for column, ticker in enumerate(tickers):
+        rows = [row_of[day] for day in dates[ticker]]
+        close[rows, column] = frames[ticker]['Close'].to_numpy(dtype=float)
+        volume[rows, column] = frames[ticker]['Volume'].to_numpy(dtype=float)
+    return (pd.DataFrame(close, index=all_dates, columns=tickers),
+            pd.DataFrame(volume, index=all_dates, columns=tickers))
+
+
+def daily_panel_from_store(store=None, start=None, end=None):
+    """Daily close and volume frames built from recorded 1-minute sessions"""
+    store = store or BarStore()
+    closes, volumes = {}, {}
+    for day in store.dates(start, end):
+        session = store.load(day, fields=('close', 'volume'))
+        valid = ~np.isnan(session.close)
+        last = session.close.shape[1] - 1 - valid[:, ::-1].argmax(axis=1)
+        close = session.close[np.arange(len(session)), last]
+        close[~valid.any(axis=1)] = np.nan
+        closes[day] = pd.Series(close, index=session.tickers)
+        volumes[day] = pd.Series(np.nansum(session.volume, axis=1), index=session.tickers)
+    close = pd.DataFrame(closes).T.sort_index()
+    volume = pd.DataFrame(volumes).T.reindex(index=close.index, columns=close.columns)
+    return close, volume
+
+
+def _rolling(values, window, reducer):
+    """Trailing-window reduction over axis 0, NaN until the window is full (like DataFrame.rolling)"""
+    out = np.full(values.shape, np.nan)
+    if len(values) >= window:
+        out[window - 1:] = reducer(np.lib.stride_tricks.sliding_window_view(values, window, axis=0), axis=-1)
+    return out
+
+
+def _rolling_mean(values, window):
+    return _rolling(values, window, np.mean)
+
+
+def _ewm_mean(values, span):
+    """Row-recursive equivalent of DataFrame.ewm(span=span).mean() (adjust=True)"""
+    decay = 1 - 2 / (span + 1)
+    out = np.empty(values.shape)
+    numerator = np.zeros(values.shape[1:])
+    denominator = np.zeros(values.shape[1:])
+    for row, x in enumerate(values):
+        present = ~np.isnan(x)
+        numerator = decay * numerator + np.where(present, x, 0)
+        denominator = decay * denominator + present
+        with np.errstate(divide='ignore', invalid='ignore'):
+            out[row] = numerator / denominator
+    return out
+
+
+def feature_cube(close, volume):
+    """Features for every (date, ticker) as an array shaped (dates, tickers, features)
+
+    Rolling and exponential indicators run over the whole (dates x tickers)
+    array at once; DataFrame.rolling and .ewm loop over the columns, which
+    dominates at universe size.
+    """
+    prices = close.to_numpy(dtype=float)
+    volumes = volume.to_numpy(dtype=float)
+
+    # Same RSI and MACD definitions as AIDecisionMaker's indicators
+    delta = np.full(prices.shape, np.nan)
+    delta[1:] = prices[1:] - prices[:-1]
+    gain = _rolling_mean(np.where(delta > 0, delta, 0), 14)
+    loss = _rolling_mean(np.where(delta < 0, -delta, 0), 14)
+    macd = _ewm_mean(prices, 12) - _ewm_mean(prices, 26)
+    macd_hist = macd - _ewm_mean(macd, 9)
+
+    returns = np.full(prices.shape, np.nan)
+    returns[1:] = prices[1:] / prices[:-1] - 1
+    change_5d = np.full(prices.shape, np.nan)
+    change_5d[5:] = prices[5:] / prices[:-5] - 1
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        features = {
+            'sma5_gap': prices / _rolling_mean(prices, 5) - 1,
+            'sma20_gap': prices / _rolling_mean(prices, 20) - 1,
+            'rsi': 100 - (100 / (1 + gain / loss)),
+            'macd_hist': macd_hist / prices,
+            'price_change': returns * 100,
+            'change_5d': change_5d * 100,
+            'volume_ratio': volumes / _rolling_mean(volumes, 20),
+            'volatility_10d': _rolling(returns, 10, lambda w, axis: np.std(w, axis=axis, ddof=1)) * 100
+        }
+    cube = np.stack([features[name] for name in FEATURES], axis=-1)
+    cube[~np.isfinite(cube)] = np.nan
+    return cube
+
+
+def latest_features(close, volume):
+    """(tickers, X, prices, volumes) from each ticker's most recent day with every feature"""
+    cube = feature_cube(close, volume)
+    valid = ~np.isnan(cube).any(axis=-1)
+    has = valid.any(axis=0)
+    last = cube.shape[0] - 1 - valid[::-1].argmax(axis=0)
+    columns = np.flatnonzero(has)
+    rows = last[columns]
+    tickers = [close.columns[c] for c in columns]
+    return (tickers, cube[rows, columns], close.to_numpy()[rows, columns],
+            volume.to_numpy()[rows, columns])
+
+
+def training_set(close, volume, horizon_days, target_percent):
+    """Feature rows, up/down labels and row dates for every day that moved at least target_percent"""
+    cube = feature_cube(close, volume)
+    future = close.shift(-horizon_days).to_numpy(dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        forward = (future / close.to_numpy(dtype=float) - 1) * 100
+    valid = ~np.isnan(cube).any(axis=-1) & np.isfinite(forward) & (np.abs(forward) >= target_percent)
+    date_index = np.broadcast_to(np.arange(len(close.index))[:, None], valid.shape)
+    return cube[valid], (forward[valid] > 0).astype(np.int8), date_index[valid]
+
+
+# Models
+
+class LogisticModel:
+    """Numpy logistic regression used when scikit-learn is not installed"""
+
+    def __init__(self, l2=1e-3, learning_rate=0.5, epochs=300):
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.epochs = epochs
+        self.weights = None
+        self.bias = 0.0
+
+    def fit(self, X, y):
+        self.weights = np.zeros(X.shape[1])
+        self.bias = 0.0
+        for _ in range(self.epochs):
+            error = self._sigmoid(X @ self.weights + self.bias) - y
+            self.weights -= self.learning_rate * (X.T @ error / len(y) + self.l2 * self.weights)
+            self.bias -= self.learning_rate * error.mean()
+        return self
+
+    def predict_proba(self, X):
+        p = self._sigmoid(X @ self.weights + self.bias)
+        return np.column_stack([1 - p, p])
+
+    @staticmethod
+    def _sigmoid(z):
+        return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+class SignalModel:
+    """A trained model artifact: feature scaling, classifier and metadata"""
+
+    def __init__(self, artifact):
+        self.artifact = artifact
+        self.model = artifact['model']
+        self.mean = artifact['mean']
+        self.scale = artifact['scale']
+        self.horizon_days = artifact['horizon_days']
+        self.target_percent = artifact['target_percent']
+
+    @classmethod
+    def load(cls, path=None):
+        """The saved model, or None when none has been trained"""
+        path = path or Config.SIGNAL_MODEL_PATH
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'rb') as f:
+                artifact = pickle.load(f)
+        except Exception as e:
+            print(f"Error loading signal model {path}: {e}")
+            return None
+        if artifact.get('version') != ARTIFACT_VERSION or tuple(artifact.get('features', ())) != FEATURES:
+            print(f"⚠️  Signal model {path} was trained with different features; retrain it")
+            return None
+        return cls(artifact)
+
+    def save(self, path=None):
+        path = path or Config.SIGNAL_MODEL_PATH
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self.artifact, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        return path
+
+    def predict(self, X):
+        """Probability of "up" for each feature row, given a move of at least target_percent either way"""
+        if len(X) == 0:
+            return np.empty(0)
+        return self.model.predict_proba((X - self.mean) / self.scale)[:, 1]
+
+    def describe(self):
+        return {key: value for key, value in self.artifact.items() if key not in ('model', 'mean', 'scale')}
+
+
+def _fit(X, y):
+    if SKLEARN_AVAILABLE:
+        model = RandomForestClassifier(n_estimators=100, max_depth=8, min_samples_leaf=50,
+                                       n_jobs=-1, random_state=42)
+        return 'random_forest', model.fit(X, y)
+    return 'logistic', LogisticModel().fit(X, y)
+
+
+def train(close, volume, horizon_days=None, target_percent=None, holdout_fraction=0.2):
+    """Fit a SignalModel, scoring it on the most recent holdout_fraction of days"""
+    horizon_days = horizon_days or Config.SIGNAL_MODEL_HORIZON_DAYS
+    target_percent = Config.SIGNAL_MODEL_TARGET_PERCENT if target_percent is None else target_percent
+    X, y, row_dates = training_set(close, volume, horizon_days, target_percent)
+    if len(y) < 1000:
+        raise ValueError(f"Only {len(y)} labelled rows; need more tickers or days of history")
+
+    # Split by date so the holdout is strictly later than the training rows. Row dates are
+    # trading-day positions; a training row's label is the close horizon_days later, so the
+    # last horizon_days before the split are dropped to keep holdout prices out of training
+    split_date = np.quantile(row_dates, 1 - holdout_fraction)
+    fit_rows = row_dates < split_date - horizon_days
+    holdout_rows = row_dates >= split_date
+    if not fit_rows.any():
+        raise ValueError(f"Not enough days of history for a {horizon_days}-day embargo before the holdout")
+    mean = X[fit_rows].mean(axis=0)
+    scale = X[fit_rows].std(axis=0)
+    scale[scale == 0] = 1.0
+
+    kind, model = _fit((X[fit_rows] - mean) / scale, y[fit_rows])
+    holdout = SignalModel({'model': model, 'mean': mean, 'scale': scale,
+                           'horizon_days': horizon_days, 'target_percent': target_percent})
+    p = holdout.predict(X[holdout_rows])
+    actual = y[holdout_rows]
+    buys = p > 0.6
+    metrics = {
+        'holdout_rows': int(len(actual)),
+        'embargo_days': horizon_days,
+        'base_rate': round(float(actual.mean()), 4) if len(actual) else None,
+        'accuracy': round(float(((p >= 0.5) == actual).mean()), 4) if len(actual) else None,
+        'buy_signals': int(buys.sum()),
+        'buy_precision': round(float(actual[buys].mean()), 4) if buys.any() else None
+    }
+
+    # Refit on every row for the saved model
+    mean = X.mean(axis=0)
+    scale = X.std(axis=0)
+    scale[scale == 0] = 1.0
+    kind, model = _fit((X - mean) / scale, y)
+    return SignalModel({
+        'version': ARTIFACT_VERSION,
+        'kind': kind,
+        'features': FEATURES,
+        'model': model,
+        'mean': mean,
+        'scale': scale,
+        'horizon_days': horizon_days,
+        'target_percent': target_percent,
+        'trained_at': datetime.utcnow().isoformat(),
+        'tickers': int(close.shape[1]),
+        'first_date': str(close.index[0]),
+        'last_date': str(close.index[-1]),
+        'rows': int(len(y)),
+        'metrics': metrics
+    })
+
+
+def fetch_history(tickers, days, provider=None):
+    """Daily bars for the universe from the market data provider, in scan-sized batches"""
+    from market_data import get_market_data_provider
+
+    provider = provider or get_market_data_provider()
+    start = provider.now() - timedelta(days=days)
+    history = {}
+    batch_size = Config.SCAN_BATCH_SIZE
+    for batch_start in range(0, len(tickers), batch_size):
+        print(f"Daily history: {batch_start}/{len(tickers)} tickers")
+        history.update(provider.get_bars(tickers[batch_start:batch_start + batch_size], start, interval='1d'))
+        time.sleep(Config.SCAN_BATCH_DELAY)
+    return history
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train or inspect the local signal model")
+    sub = parser.add_subparsers(dest='command', required=True)
+    train_parser = sub.add_parser('train', help="fit the model and save it")
+    train_parser.add_argument('--source', choices=('provider', 'bars'), default='provider')
+    train_parser.add_argument('--days', type=int, default=365, help="calendar days of daily history (provider)")
+    train_parser.add_argument('--bars-dir', help="Bar store directory (default: Config.BAR_CACHE_DIR)")
+    train_parser.add_argument('--limit', type=int, help="only the first N tickers of the universe")
+    train_parser.add_argument('--horizon-days', type=int)
+    train_parser.add_argument('--target-percent', type=float)
+    train_parser.add_argument('--output', help="Artifact path (default: Config.SIGNAL_MODEL_PATH)")
+    sub.add_parser('info', help="show the saved model")
+    args = parser.parse_args()
+
+    if args.command == 'info':
+        model = SignalModel.load()
+        if model is None:
+            print(f"No signal model at {Config.SIGNAL_MODEL_PATH}")
+        else:
+            for key, value in model.describe().items():
+                print(f"{key}: {value}")
+        return
+
+    if args.source == 'bars':
+        close, volume = daily_panel_from_store(BarStore(args.bars_dir))
+    else:
+        from universe import load_tickers
+        tickers = load_tickers()
+        close, volume = daily_panel(fetch_history(tickers[:args.limit] if args.limit else tickers, args.days))
+    if args.limit:
+        close, volume = close.iloc[:, :args.limit], volume.iloc[:, :args.limit]
+    print(f"🧠 Training on {close.shape[0]} days x {close.shape[1]} tickers")
+
+    started = time.perf_counter()
+    model = train(close, volume, args.horizon_days, args.target_percent)
+    path = model.save(args.output)
+    info = model.describe()
+    print(f"✅ {info['kind']} model trained on {info['rows']:,} rows in {time.perf_counter() - started:.1f}s")
+    print(f"   Holdout: {info['metrics']}")
+    print(f"   Saved to {path}")
+
+
+if __name__ == "__main__":
+    # Run through the importable module so pickled models reference signal_model.LogisticModel, not __main__
+    import signal_model
+    signal_model.main()
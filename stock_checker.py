@@ -1,14 +1,18 @@
-import yfinance as yf
+import heapq
 import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import pytz
+from sqlalchemy import insert
 from database import StockPrice, SessionLocal
 from config import Config
+from market_data import get_market_data_provider
+from metrics import record_scan
 import time
 
 class StockChecker:
     def __init__(self):
         self.est = pytz.timezone(Config.STOCK_CHECK_TIMEZONE)
+        self.market_data = get_market_data_provider()
         
     def load_stock_list(self):
         """Load stock tickers from CSV file"""
@@ -22,80 +26,126 @@ class StockChecker:
             print(f"Error loading stock list: {e}")
             return []
     
+    def get_daily_bars(self, tickers):
+        """Get the last few daily bars for a batch of tickers"""
+        start = self.market_data.now() - timedelta(days=7)
+        return self.market_data.get_bars(tickers, start, interval='1d')
+    
+    def price_from_bars(self, ticker, hist, current_price=None):
+        """Build a price record from daily bars"""
+        if hist is None or hist.empty:
+            return None
+        
+        # Plain arrays: building row Series for two bars costs more than the math
+        closes = hist['Close'].to_numpy(dtype=float)
+        latest_close = float(closes[-1])
+        previous_close = float(closes[-2]) if len(closes) > 1 else latest_close
+        current_price = current_price or latest_close
+        
+        change = latest_close - previous_close
+        change_percent = (change / previous_close) * 100 if previous_close != 0 else 0
+        latest_volume = hist['Volume'].to_numpy()[-1] if 'Volume' in hist else None
+        volume = int(latest_volume) if latest_volume is not None and not pd.isna(latest_volume) else None
+        
+        return {
+            'ticker': ticker,
+            'price': float(current_price),
+            'volume': volume,
+            'change': change,
+            'change_percent': change_percent
+        }
+    
     def get_stock_price(self, ticker):
         """Get current price for a single stock"""
         try:
-            stock = yf.Ticker(ticker)
-            info = stock.info
+            quote = self.market_data.get_quote(ticker)
             
             # Try to get current price
-            current_price = info.get('currentPrice') or info.get('regularMarketPrice') or info.get('previousClose')
+            current_price = quote.get('price') or quote.get('previous_close')
             
             if current_price:
                 # Get additional data
-                hist = stock.history(period="2d")
-                if not hist.empty:
-                    latest = hist.iloc[-1]
-                    previous = hist.iloc[-2] if len(hist) > 1 else latest
-                    
-                    change = float(latest['Close']) - float(previous['Close'])
-                    change_percent = (change / float(previous['Close'])) * 100 if float(previous['Close']) != 0 else 0
-                    volume = int(latest['Volume']) if 'Volume' in latest else None
-                    
-                    return {
-                        'ticker': ticker,
-                        'price': float(current_price),
-                        'volume': volume,
-                        'change': change,
-                        'change_percent': change_percent
-                    }
+                hist = self.get_daily_bars([ticker]).get(ticker)
+                return self.price_from_bars(ticker, hist, current_price)
             
             return None
         except Exception as e:
             print(f"Error fetching price for {ticker}: {e}")
             return None
     
-    def check_all_stocks(self):
-        """Check prices for all stocks in the list"""
+    def iter_prices(self, tickers):
+        """Price records for tickers, fetched and yielded one batch at a time"""
+        batch_size = Config.SCAN_BATCH_SIZE
+        for batch_start in range(0, len(tickers), batch_size):
+            print(f"Progress: {batch_start}/{len(tickers)} stocks checked")
+            batch = tickers[batch_start:batch_start + batch_size]
+            
+            # The latest daily bar's close is the current price during the session
+            batch_bars = self.get_daily_bars(batch)
+            
+            for ticker in batch:
+                price_data = self.price_from_bars(ticker, batch_bars.get(ticker))
+                if price_data:
+                    yield price_data
+            
+            # Rate limiting to avoid API issues
+            time.sleep(Config.SCAN_BATCH_DELAY)
+    
+    def check_all_stocks(self, top_n=10):
+        """Check prices for all stocks in the list and store them
+        
+        Prices are written with one INSERT per batch as they stream in, all
+        in one transaction, and only counts and the top_n gainers and
+        losers are kept in memory.
+        """
         tickers = self.load_stock_list()
         print(f"Checking prices for {len(tickers)} stocks...")
         
-        results = []
+        summary = {'checked': 0, 'advancing': 0, 'declining': 0}
+        gainers, losers = [], []  # min-heaps of (change_percent, ticker, record)
+        rows = []
         db = SessionLocal()
+        scan_start = time.perf_counter()
         
         try:
-            for i, ticker in enumerate(tickers):
-                if i % 100 == 0:
-                    print(f"Progress: {i}/{len(tickers)} stocks checked")
-                
-                price_data = self.get_stock_price(ticker)
+            for price_data in self.iter_prices(tickers):
+                rows.append({
+                    'ticker': price_data['ticker'],
+                    'price': price_data['price'],
+                    'volume': price_data.get('volume'),
+                    'change': price_data.get('change'),
+                    'change_percent': price_data.get('change_percent'),
+                    'timestamp': datetime.utcnow()
+                })
+                if len(rows) >= Config.SCAN_BATCH_SIZE:
+                    db.execute(insert(StockPrice), rows)
+                    rows = []
                 
-                if price_data:
-                    # Save to database
-                    stock_price = StockPrice(
-                        ticker=price_data['ticker'],
-                        price=price_data['price'],
-                        volume=price_data.get('volume'),
-                        change=price_data.get('change'),
-                        change_percent=price_data.get('change_percent'),
-                        timestamp=datetime.utcnow()
-                    )
-                    db.add(stock_price)
-                    results.append(price_data)
-                
-                # Rate limiting to avoid API issues
-                time.sleep(0.1)
+                change_percent = price_data['change_percent']
+                summary['checked'] += 1
+                summary['advancing'] += int(change_percent > 0)
+                summary['declining'] += int(change_percent < 0)
+                for heap, key in ((gainers, change_percent), (losers, -change_percent)):
+                    entry = (key, price_data['ticker'], price_data)
+                    if len(heap) < top_n:
+                        heapq.heappush(heap, entry)
+                    elif entry > heap[0]:
+                        heapq.heapreplace(heap, entry)
             
+            if rows:
+                db.execute(insert(StockPrice), rows)
             db.commit()
-            print(f"Successfully checked {len(results)} stocks")
-            return results
-            
+            record_scan('prices', len(tickers), time.perf_counter() - scan_start)
+            print(f"Successfully checked {summary['checked']} stocks")
         except Exception as e:
             db.rollback()
             print(f"Error checking stocks: {e}")
-            return results
         finally:
             db.close()
+        
+        summary['top_gainers'] = [record for _, _, record in sorted(gainers, reverse=True)]
+        summary['top_losers'] = [record for _, _, record in sorted(losers, reverse=True)]
+        return summary
     
     def get_latest_prices(self, limit=100):
         """Get latest prices from database"""
@@ -108,6 +158,6 @@ class StockChecker:
 
 if __name__ == "__main__":
     checker = StockChecker()
-    results = checker.check_all_stocks()
-    print(f"Checked {len(results)} stocks")
+    summary = checker.check_all_stocks()
+    print(f"Checked {summary['checked']} stocks")
 
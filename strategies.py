@@ -0,0 +1,428 @@
+"""
+Multi-strategy runner with shared market data.
+
+Several strategies can trade the same session without each one scanning
+the universe again. Every cycle builds one MarketSnapshot, and each
+strategy only selects candidates from it. The snapshot holds:
+
+- today's 1-minute bars for the universe (delta fetch from the warm bar cache)
+- daily history per ticker, fetched once per day at warmup, with today's
+  bar so far appended from the 1-minute bars
+- technical indicators, computed on first use and shared by every strategy
+  that asks for them
+
+Each strategy gets budget_percent of the day's capital, which is the
+buying power after the first cycle liquidates. Its orders and stop-losses
+are tagged with the strategy name in the trades table (Trade.strategy).
+A ticker bought by one strategy is skipped by the strategies that run
+after it, so every position belongs to exactly one strategy.
+
+Strategies come from STRATEGIES_FILE, a JSON list such as:
+
+    [
+      {"name": "momentum", "type": "momentum", "budget_percent": 60},
+      {"name": "momentum_1030", "type": "momentum", "budget_percent": 20,
+       "threshold": 3.0, "entry_time": "10:30", "max_positions": 10},
+      {"name": "indicators", "type": "indicator", "budget_percent": 20,
+       "min_confidence": 0.75, "max_positions": 10}
+    ]
+
+When STRATEGIES_FILE is unset, the scheduler runs the single momentum
+strategy exactly as before. Otherwise it schedules one cycle per distinct
+entry_time, and only the earliest cycle closes the previous day's positions.
+Cycles and strategies are checkpointed like the momentum run, and a
+restarted scheduler resumes an interrupted cycle.
+"""
+
+import json
+import time
+import pandas as pd
+from trading_strategy import MomentumStrategy
+from run_checkpoint import RunCheckpoint
+from scan_snapshots import ScanResults, save_scan
+from metrics import STAGE_DURATION, log_event
+from config import Config
+
+
+def _parse_entry_time(value):
+    if not value:
+        return (Config.STOCK_CHECK_HOUR, Config.STOCK_CHECK_MINUTE)
+    hour, minute = value.split(':')
+    return (int(hour), int(minute))
+
+
+class MarketSnapshot:
+    """Bars and indicators for one cycle, shared by every strategy"""
+
+    def __init__(self, bars, daily_history, now, ai=None):
+        self.bars = bars
+        self.daily_history = daily_history
+        self.now = now
+        self.ai = ai
+        self._indicators = {}
+
+    def history_with_today(self, ticker):
+        """Daily bars up to yesterday plus today's bar so far"""
+        hist = self.daily_history.get(ticker)
+        today = self.bars.get(ticker)
+        if today is None or today.empty:
+            return hist
+        today_row = pd.DataFrame([today.day_bar()], columns=['Open', 'High', 'Low', 'Close', 'Volume'],
+                                 index=[today.timestamp(0).normalize()])
+        if hist is None or hist.empty:
+            return today_row
+        return pd.concat([hist[['Open', 'High', 'Low', 'Close', 'Volume']], today_row])
+
+    def indicators(self, ticker):
+        """Technical indicators for the ticker (computed once per snapshot)"""
+        if ticker not in self._indicators:
+            self._indicators[ticker] = self.ai.get_technical_indicators(ticker, hist=self.history_with_today(ticker))
+        return self._indicators[ticker]
+
+
+class Strategy:
+    """A strategy selects candidates from the shared snapshot; the runner buys them"""
+
+    needs_daily_history = False
+
+    def __init__(self, name, budget_percent=100.0, max_positions=None, entry_time=None):
+        self.name = name
+        self.budget_percent = float(budget_percent)
+        self.max_positions = max_positions
+        self.entry_time = _parse_entry_time(entry_time)
+
+    def select(self, snapshot, momentum):
+        """Candidate dicts (ticker, current_price, change_percent, dollar_volume)"""
+        raise NotImplementedError
+
+    def scan(self, snapshot, momentum):
+        """Every ticker's result as ScanResults for the scan snapshot, or None"""
+        return None
+
+    def describe(self):
+        return {
+            'name': self.name,
+            'type': self.kind,
+            'budget_percent': self.budget_percent,
+            'max_positions': self.max_positions,
+            'entry_time': f"{self.entry_time[0]:02d}:{self.entry_time[1]:02d}"
+        }
+
+
+class MomentumSignalStrategy(Strategy):
+    """Gain from the open to the entry time above a threshold (the 30-minute strategy)"""
+
+    kind = 'momentum'
+
+    def __init__(self, name, threshold=None, **kwargs):
+        super().__init__(name, **kwargs)
+        self.threshold = Config.MOMENTUM_THRESHOLD if threshold is None else float(threshold)
+
+    def select(self, snapshot, momentum):
+        return self.scan(snapshot, momentum).qualifying
+
+    def scan(self, snapshot, momentum):
+        results = ScanResults(list(snapshot.bars))
+        for ticker, today_data in snapshot.bars.items():
+            if today_data is None or today_data.empty:
+                continue
+            open_price = momentum.open_price_from_bars(today_data)
+            current_price = momentum.current_price_from_bars(today_data, self.entry_time)
+            if not open_price or not current_price:
+                continue
+            change_percent = (current_price - open_price) / open_price * 100
+            results.add({
+                'ticker': ticker,
+                'open_price': open_price,
+                'current_price': current_price,
+                'change_percent': change_percent,
+                'dollar_volume': momentum.dollar_volume_from_bars(today_data, self.entry_time),
+                'qualifies': change_percent > self.threshold
+            })
+        return results
+
+    def describe(self):
+        return {**super().describe(), 'threshold': self.threshold}
+
+
+class IndicatorSignalStrategy(Strategy):
+    """Rule-based 'buy' signals from RSI, moving averages and MACD (ai_decision.py)
+
+    Only the rule score is used: no Gemini calls and no AISignal rows, so
+    the cycle stays fast enough to trade.
+    """
+
+    kind = 'indicator'
+    needs_daily_history = True
+
+    def __init__(self, name, min_confidence=0.7, **kwargs):
+        super().__init__(name, **kwargs)
+        self.min_confidence = float(min_confidence)
+
+    def select(self, snapshot, momentum):
+        candidates = []
+        for ticker, today_data in snapshot.bars.items():
+            if today_data is None or today_data.empty:
+                continue
+            indicators = snapshot.indicators(ticker)
+            if not indicators:
+                continue
+            signal_type, confidence, _ = snapshot.ai.score_indicators(indicators)
+            if signal_type != 'buy' or confidence < self.min_confidence:
+                continue
+            open_price = momentum.open_price_from_bars(today_data)
+            current_price = momentum.current_price_from_bars(today_data, self.entry_time)
+            candidates.append({
+                'ticker': ticker,
+                'open_price': open_price,
+                'current_price': current_price,
+                'change_percent': (current_price - open_price) / open_price * 100 if open_price else 0.0,
+                'dollar_volume': momentum.dollar_volume_from_bars(today_data, self.entry_time),
+                'confidence': confidence
+            })
+        return candidates
+
+    def describe(self):
+        return {**super().describe(), 'min_confidence': self.min_confidence}
+
+
+STRATEGY_TYPES = {
+    'momentum': MomentumSignalStrategy,
+    'indicator': IndicatorSignalStrategy
+}
+
+
+def load_strategies(path=None):
+    """Strategies from STRATEGIES_FILE, or the single default momentum strategy"""
+    path = path if path is not None else Config.STRATEGIES_FILE
+    if not path:
+        return [MomentumSignalStrategy('momentum')]
+
+    with open(path) as f:
+        specs = json.load(f)
+
+    strategies = []
+    for spec in specs:
+        spec = dict(spec)
+        kind = spec.pop('type', 'momentum')
+        if kind not in STRATEGY_TYPES:
+            raise ValueError(f"Unknown strategy type '{kind}' in {path}")
+        strategies.append(STRATEGY_TYPES[kind](**spec))
+
+    names = [s.name for s in strategies]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Strategy names must be unique in {path}")
+    total_budget = sum(s.budget_percent for s in strategies)
+    if total_budget > 100:
+        raise ValueError(f"Strategy budgets add up to {total_budget:.0f}% in {path}")
+    return strategies
+
+
+class StrategyRunner:
+    def __init__(self, strategies=None, momentum=None):
+        self.strategies = strategies if strategies is not None else load_strategies()
+        self.momentum = momentum or MomentumStrategy()
+        self.market_data = self.momentum.market_data
+        self.ai = None
+        self._daily_history = {}
+        self._daily_history_date = None
+        self._capital = None  # (date, day's capital after liquidation)
+        self._bought = set()  # tickers bought today by any strategy
+
+    def entry_times(self):
+        return sorted({s.entry_time for s in self.strategies})
+
+    def _needs_daily_history(self):
+        return any(s.needs_daily_history for s in self.strategies)
+
+    def load_daily_history(self, tickers, now=None):
+        """Daily bars up to yesterday for the universe (fetched once per day)"""
+        now = now or self.market_data.now()
+        if self._daily_history_date == now.date():
+            return self._daily_history
+        if self.ai is None:
+            from ai_decision import AIDecisionMaker
+            self.ai = AIDecisionMaker()
+
+        history = {}
+        batch_size = Config.SCAN_BATCH_SIZE
+        for batch_start in range(0, len(tickers), batch_size):
+            print(f"Daily history: {batch_start}/{len(tickers)} tickers")
+            batch = self.ai.get_daily_history(tickers[batch_start:batch_start + batch_size], period_days=60)
+            for ticker, df in batch.items():
+                if df is not None and not df.empty:
+                    history[ticker] = df[df.index.date < now.date()]
+            time.sleep(Config.SCAN_BATCH_DELAY)
+
+        self._daily_history = history
+        self._daily_history_date = now.date()
+        return history
+
+    def warmup(self):
+        """Warm the momentum strategy's caches plus daily history when a strategy needs it"""
+        snapshot = self.momentum.warmup()
+        if self._needs_daily_history():
+            with STAGE_DURATION.time(stage='warmup_daily_history'):
+                self.load_daily_history(self.momentum.load_stock_list())
+        return snapshot
+
+    def build_snapshot(self, tickers, now):
+        """One pass over the universe for every strategy in the cycle"""
+        bars = {}
+        batch_size = Config.SCAN_BATCH_SIZE
+        for batch_start in range(0, len(tickers), batch_size):
+            print(f"Snapshot progress: {batch_start}/{len(tickers)} stocks")
+            bars.update(self.momentum.get_batch_bars(tickers[batch_start:batch_start + batch_size], now))
+            time.sleep(Config.SCAN_BATCH_DELAY)
+
+        daily_history = self.load_daily_history(tickers, now) if self._needs_daily_history() else {}
+        return MarketSnapshot(bars, daily_history, now, ai=self.ai)
+
+    def run(self, entry_time=None):
+        """Run every strategy entering at entry_time (default: all of them) off one snapshot
+
+        With RUN_CHECKPOINTS the cycle and each of its strategies are
+        checkpointed (run_checkpoint.py), so running a cycle again the same
+        day resumes it: positions aren't closed twice, each strategy reuses
+        its candidates and plan, and orders already sent aren't sent again.
+        """
+        entry_times = self.entry_times()
+        entry_time = entry_time or entry_times[0]
+        strategies = [s for s in self.strategies if s.entry_time == entry_time]
+        now = self.market_data.now()
+        label = f"{entry_time[0]:02d}:{entry_time[1]:02d}"
+
+        print("=" * 60)
+        print(f"🚀 Strategy cycle {label}: {', '.join(s.name for s in strategies)}")
+        print("=" * 60)
+
+        cycle = None
+        checkpoints = {}
+        if Config.RUN_CHECKPOINTS:
+            cycle = RunCheckpoint.open(now.date(), name=f'strategies_{entry_time[0]:02d}{entry_time[1]:02d}')
+            cycle_state = cycle.state()
+            if cycle_state['complete']:
+                print(f"✅ Cycle {label} already completed today; nothing to do")
+                return {**cycle_state['summary'], 'already_completed': True}
+            checkpoints = {s.name: RunCheckpoint.open(now.date(), name=f'strategy_{s.name}', tag=s.name)
+                           for s in strategies}
+
+        positions_closed = 0
+        if entry_time == entry_times[0]:
+            self._capital = None
+            self._bought = set()
+            if cycle and cycle_state['liquidated']:
+                print("♻️  Positions were already closed in an earlier attempt")
+                positions_closed = cycle_state['positions_closed']
+            else:
+                with STAGE_DURATION.time(stage='close_all_positions'):
+                    close_result = self.momentum.close_all_positions(cycle)
+                log_event('stage_complete', stage='close_all_positions', **close_result)
+                positions_closed = close_result['closed']
+                if cycle:
+                    cycle.mark_liquidated(positions_closed)
+        else:
+            # A restarted process doesn't remember what the earlier cycles bought
+            earlier = [f'strategy_{s.name}' for s in self.strategies if s.entry_time < entry_time]
+            if Config.RUN_CHECKPOINTS:
+                self._bought |= RunCheckpoint.bought_tickers(now.date(), earlier)
+            self._bought |= {p['symbol'] for p in self.momentum.alpaca.get_positions()}
+
+        if cycle and cycle_state['planned']:
+            # A resumed cycle keeps the capital it started with; purchases since then lowered buying power
+            self._capital = (now.date(), cycle_state['buying_power'])
+        if self._capital is None or self._capital[0] != now.date():
+            account = self.momentum.alpaca.get_account()
+            if not account:
+                print("Error: Could not get account information")
+                return {'success': False, 'message': 'Could not get account information', 'strategies': {}}
+            # A later cycle in a fresh process sizes budgets from equity, which includes earlier purchases
+            capital = account['buying_power'] if entry_time == entry_times[0] else account['equity']
+            self._capital = (now.date(), capital)
+            if cycle:
+                # A cycle has no plan of its own; its checkpoint only keeps the capital
+                cycle.save_plan([], capital)
+        capital = self._capital[1]
+
+        tickers = self.momentum.load_stock_list()
+        states = {name: checkpoint.state() for name, checkpoint in checkpoints.items()}
+        snapshot = None
+        if not states or not all(state['scanned'] for state in states.values()):
+            with STAGE_DURATION.time(stage='build_snapshot'):
+                snapshot = self.build_snapshot(tickers, now)
+            # The snapshot holds this cycle's bars; the warmup cache isn't needed past the first cycle
+            self.momentum.release_bar_cache()
+            log_event('stage_complete', stage='build_snapshot', tickers=len(tickers),
+                      with_bars=sum(1 for b in snapshot.bars.values() if b is not None))
+
+        results = {}
+        for strategy in strategies:
+            checkpoint = checkpoints.get(strategy.name)
+            state = states.get(strategy.name)
+            if state and state['complete']:
+                print(f"\n♻️  {strategy.name} already completed in an earlier attempt")
+                results[strategy.name] = state['summary']
+                self._bought.update(p['ticker'] for p in state['summary']['purchases'])
+                continue
+            if state and state['scanned']:
+                candidates = state['qualifying']
+            else:
+                with STAGE_DURATION.time(stage=f'select_{strategy.name}'):
+                    scan = strategy.scan(snapshot, self.momentum)
+                    selected = scan.qualifying if scan is not None else strategy.select(snapshot, self.momentum)
+                    candidates = [c for c in selected if c['ticker'] not in self._bought]
+                if scan is not None and Config.SAVE_SCAN_SNAPSHOTS:
+                    save_scan(scan, now, threshold=strategy.describe().get('threshold'), scan=strategy.name)
+                if checkpoint:
+                    checkpoint.mark_scanned(candidates, len(candidates))
+            if state and state['planned']:
+                budget = state['buying_power']
+            else:
+                account = self.momentum.alpaca.get_account()
+                available = account['buying_power'] if account else 0.0
+                budget = min(capital * strategy.budget_percent / 100, available)
+
+            print(f"\n🧭 {strategy.name}: {len(candidates)} candidates, budget ${budget:,.2f}")
+            with STAGE_DURATION.time(stage='purchase_stocks'):
+                purchases = self.momentum.purchase_stocks(candidates, buying_power=budget, strategy=strategy.name,
+                                                          max_positions=strategy.max_positions,
+                                                          checkpoint=checkpoint, signal_at=now)
+            self._bought.update(p['ticker'] for p in purchases)
+            invested = sum(p['actual_cost'] for p in purchases)
+            log_event('strategy_complete', strategy=strategy.name, candidates=len(candidates),
+                      purchased=len(purchases), invested=round(invested, 2))
+            results[strategy.name] = {
+                'candidates': len(candidates),
+                'budget': budget,
+                'purchased_count': len(purchases),
+                'total_invested': invested,
+                'purchases': purchases
+            }
+            if checkpoint:
+                checkpoint.complete(results[strategy.name])
+
+        print("\n" + "=" * 60)
+        print("📊 Strategy Cycle Summary")
+        print("=" * 60)
+        print(f"Positions closed: {positions_closed}")
+        print(f"Stocks in snapshot: {len(tickers)}")
+        for name, result in results.items():
+            print(f"{name}: {result['purchased_count']} purchased of {result['candidates']} candidates, "
+                  f"${result['total_invested']:,.2f} of ${result['budget']:,.2f}")
+
+        result = {
+            'success': True,
+            'entry_time': label,
+            'positions_closed': positions_closed,
+            'purchased_count': sum(r['purchased_count'] for r in results.values()),
+            'total_invested': sum(r['total_invested'] for r in results.values()),
+            'strategies': results
+        }
+        if cycle:
+            cycle.complete(result)
+        return result
+
+if __name__ == "__main__":
+    runner = StrategyRunner()
+    for entry_time in runner.entry_times():
+        runner.run(entry_time)
@@ -6,13 +6,19 @@
 4. Set stop-loss orders at 1% below purchase price
 """
 
-import yfinance as yf
 import pandas as pd
 from datetime import datetime, timedelta
 import pytz
 from alpaca_client import AlpacaClient
-from database import StockPrice, Position, Trade, SessionLocal
+from market_data import DayBars, get_market_data_provider
+from universe import active_universe_path
+from allocation import plan_purchases
+from run_checkpoint import RunCheckpoint
+from scan_snapshots import ScanResults, save_scan
+from metrics import PRICE_FALLBACKS, STAGE_DURATION, record_scan, log_event
+from database import StockPrice, Position, Trade, SessionLocal, warm_connection_pool
 from config import Config
+import os
 import time
 from alpaca.trade.requests import StopLossRequest, MarketOrderRequest
 from alpaca.trade.enums import OrderSide, TimeInForce, OrderType
@@ -20,70 +26,180 @@ from alpaca.trade.enums import OrderSide, TimeInForce, OrderType
 class MomentumStrategy:
     def __init__(self):
         self.alpaca = AlpacaClient()
+        self.market_data = get_market_data_provider()
         self.est = pytz.timezone(Config.STOCK_CHECK_TIMEZONE)
-        self.momentum_threshold = 2.0  # 2% minimum gain
-        self.stop_loss_percent = 1.0  # 1% stop loss
+        self.momentum_threshold = Config.MOMENTUM_THRESHOLD  # 2% minimum gain by default
+        self.stop_loss_percent = Config.STOP_LOSS_PERCENT  # 1% stop loss by default
+        self.max_positions = Config.MAX_POSITIONS  # 0 = no cap
+        self._stock_list = None  # (path, mtime, tickers)
+        self._bar_cache = {}  # today's 1-minute DayBars per ticker, filled by warmup()
+        self._bar_cache_date = None  # day warmup() enabled the cache; unset outside warmup-to-entry
+        self.warmup_snapshot = None
+        self.last_scan_at = None  # market time of the latest scan's quotes
         
     def load_stock_list(self):
-        """Load stock tickers from CSV file"""
+        """Load stock tickers from CSV file (cached until the file changes)
+        
+        Uses the pre-filtered active universe when it is enabled and fresh.
+        """
         try:
-            df = pd.read_csv(Config.STOCK_LIST_FILE)
+            path = active_universe_path() or Config.STOCK_LIST_FILE
+            mtime = os.path.getmtime(path)
+            if self._stock_list and self._stock_list[:2] == (path, mtime):
+                return list(self._stock_list[2])
+            df = pd.read_csv(path)
             tickers = df['Ticker'].dropna().unique().tolist()
             tickers = [t for t in tickers if isinstance(t, str) and len(t) > 0]
-            return tickers
+            self._stock_list = (path, mtime, tickers)
+            return list(tickers)
         except Exception as e:
             print(f"Error loading stock list: {e}")
             return []
     
-    def get_market_open_price(self, ticker):
+    def get_batch_bars(self, tickers, now=None):
+        """Today's 1-minute DayBars for a batch, fetching only what the bar cache lacks
+        
+        Tickers already cached by warmup() are fetched from their last cached
+        bar onwards (that bar is re-read in case it was still forming) and
+        merged into the cache; uncached tickers, including those that had no
+        bars yet, are fetched from midnight. Bars are only kept between
+        warmup() and the end of the entry run (release_bar_cache), so other
+        scans hold one batch at a time.
+        The provider's DataFrames are converted to arrays and dropped here.
+        """
+        now = now or self.market_data.now()
+        day_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        caching = self._bar_cache_date == now.date()
+        if not caching:
+            self._bar_cache = {}
+        
+        cached = [t for t in tickers if t in self._bar_cache]
+        uncached = [t for t in tickers if t not in self._bar_cache]
+        fetched = {}
+        if uncached:
+            fetched.update(self.market_data.get_bars(uncached, day_start, interval='1m'))
+        if cached:
+            since = min(self._bar_cache[t]['since'] for t in cached)
+            fetched.update(self.market_data.get_bars(cached, since, interval='1m'))
+        
+        bars = {}
+        for ticker in tickers:
+            entry = self._bar_cache.get(ticker)
+            delta = DayBars.from_frame(fetched.pop(ticker, None), now.date())
+            if entry is not None:
+                today_data = entry['bars'] if delta is None else entry['bars'].merge(delta)
+            else:
+                today_data = delta
+            # No bars yet stays uncached: a later fetch must start at midnight to see the open
+            if today_data is not None and caching:
+                self._bar_cache[ticker] = {'bars': today_data, 'since': today_data.timestamp(-1)}
+            bars[ticker] = today_data
+        return bars
+    
+    def release_bar_cache(self):
+        """Drop the bar cache and stop caching until the next warmup"""
+        self._bar_cache = {}
+        self._bar_cache_date = None
+    
+    def prefetch_today_bars(self, tickers):
+        """Fill the bar cache with today's bars so far (batched like the scan)"""
+        batch_size = Config.SCAN_BATCH_SIZE
+        now = self.market_data.now()
+        for batch_start in range(0, len(tickers), batch_size):
+            self.get_batch_bars(tickers[batch_start:batch_start + batch_size], now)
+            time.sleep(Config.SCAN_BATCH_DELAY)
+        return sum(1 for t in tickers if self._bar_cache.get(t, {}).get('bars') is not None)
+    
+    def warmup(self):
+        """Prime everything the entry run needs so only the last minutes are fetched at entry
+        
+        Loads the universe, opens database connections, touches the broker
+        (account, positions, open orders) and fills the bar cache. Account
+        and positions are re-read at entry because fills and stop triggers
+        can change them in the meantime; the snapshot is kept for logging.
+        """
+        print("\n🔥 Warming up for the entry run...")
+        with STAGE_DURATION.time(stage='warmup'):
+            tickers = self.load_stock_list()
+            warm_connection_pool()
+            account = self.alpaca.get_account()
+            positions = self.alpaca.get_positions()
+            open_orders = self.alpaca.get_orders(status='open')
+            self._bar_cache, self._bar_cache_date = {}, self.market_data.now().date()
+            cached = self.prefetch_today_bars(tickers)
+        
+        self.warmup_snapshot = {
+            'at': self.market_data.now().isoformat(),
+            'tickers': len(tickers),
+            'cached_tickers': cached,
+            'account': account,
+            'positions': len(positions),
+            'open_orders': len(open_orders)
+        }
+        if not account:
+            print("⚠️  Warmup could not read the account - check broker credentials before entry")
+        print(f"✅ Warmup complete: {len(tickers)} tickers loaded, {cached} with bars cached, "
+              f"{len(positions)} open positions")
+        log_event('stage_complete', stage='warmup', tickers=len(tickers), cached_tickers=cached,
+                  positions=len(positions), open_orders=len(open_orders))
+        return self.warmup_snapshot
+    
+    def refresh_bar_cache(self):
+        """Top up the bar cache shortly before entry (only after today's warmup)"""
+        if self._bar_cache_date != self.market_data.now().date():
+            print("⚠️  No warmup today; skipping the bar cache refresh")
+            return 0
+        with STAGE_DURATION.time(stage='warmup_refresh'):
+            return self.prefetch_today_bars(self.load_stock_list())
+    
+    def get_today_bars(self, ticker, interval='1m'):
+        """Get today's intraday bars for a single ticker as DayBars"""
+        now = self.market_data.now()
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        hist = self.market_data.get_bars([ticker], start, interval=interval).get(ticker)
+        return DayBars.from_frame(hist, now.date())
+    
+    def open_price_from_bars(self, today_data):
+        """Opening price from today's 1-minute bars"""
+        # The first price after 9:30 AM EST, or the first available
+        return today_data.open_at(9, 30)
+    
+    def current_price_from_bars(self, today_data, entry_time=None):
+        """Price at the entry time (10:00 AM by default, or an (hour, minute) pair) from today's 1-minute bars"""
+        hour, minute = entry_time or (Config.STOCK_CHECK_HOUR, Config.STOCK_CHECK_MINUTE)
+        # The last close at or before the entry time, or the latest available
+        return today_data.close_at(hour, minute)
+    
+    def dollar_volume_from_bars(self, today_data, entry_time=None):
+        """Dollar volume traded from the open up to the entry time"""
+        hour, minute = entry_time or (Config.STOCK_CHECK_HOUR, Config.STOCK_CHECK_MINUTE)
+        return today_data.dollar_volume_until(hour, minute)
+    
+    def get_market_open_price(self, ticker, today_data=None):
         """Get the opening price at 9:30 AM EST"""
         try:
-            stock = yf.Ticker(ticker)
-            today = datetime.now(self.est).date()
-            
             # Try to get intraday data (1-minute intervals)
             try:
-                hist = stock.history(period="1d", interval="1m")
-                
-                if not hist.empty:
-                    hist.index = pd.to_datetime(hist.index)
-                    # Convert to EST timezone
-                    hist.index = hist.index.tz_convert(self.est)
-                    today_data = hist[hist.index.date == today]
-                    
-                    if not today_data.empty:
-                        # Find the first price after 9:30 AM EST
-                        market_open_time = today_data.index[0].replace(hour=9, minute=30, second=0, microsecond=0)
-                        open_data = today_data[today_data.index >= market_open_time]
-                        
-                        if not open_data.empty:
-                            return float(open_data.iloc[0]['Open'])
-                        # If no data after 9:30, use first available
-                        return float(today_data.iloc[0]['Open'])
-                
+                today_data = today_data if today_data is not None else self.get_today_bars(ticker, '1m')
+                if today_data is not None:
+                    return self.open_price_from_bars(today_data)
             except Exception as e:
                 pass
             
             # Fallback: use 5-minute intervals
             try:
-                hist = stock.history(period="1d", interval="5m")
-                if not hist.empty:
-                    hist.index = pd.to_datetime(hist.index)
-                    hist.index = hist.index.tz_convert(self.est)
-                    today_data = hist[hist.index.date == today]
-                    if not today_data.empty:
-                        return float(today_data.iloc[0]['Open'])
+                today_data = self.get_today_bars(ticker, '5m')
+                if today_data is not None:
+                    PRICE_FALLBACKS.inc(price='open', source='5m')
+                    return float(today_data.open[0])
             except Exception as e:
                 pass
             
             # Last resort: use previous close
-            try:
-                info = stock.info
-                prev_close = info.get('previousClose')
-                if prev_close:
-                    return float(prev_close)
-            except:
-                pass
+            prev_close = self.market_data.get_quote(ticker).get('previous_close')
+            if prev_close:
+                PRICE_FALLBACKS.inc(price='open', source='previous_close')
+                return float(prev_close)
             
             return None
                 
@@ -91,46 +207,29 @@ class MomentumStrategy:
             print(f"Error getting open price for {ticker}: {e}")
             return None
     
-    def get_current_price(self, ticker):
+    def get_current_price(self, ticker, today_data=None):
         """Get current price at 10:00 AM (30 min after market open)"""
         try:
-            stock = yf.Ticker(ticker)
-            today = datetime.now(self.est).date()
-            
             # Try to get intraday data for current price
             try:
-                hist = stock.history(period="1d", interval="1m")
-                if not hist.empty:
-                    hist.index = pd.to_datetime(hist.index)
-                    hist.index = hist.index.tz_convert(self.est)
-                    today_data = hist[hist.index.date == today]
-                    
-                    if not today_data.empty:
-                        # Get price closest to 10:00 AM
-                        target_time = today_data.index[0].replace(hour=10, minute=0, second=0, microsecond=0)
-                        closest_data = today_data[today_data.index <= target_time]
-                        
-                        if not closest_data.empty:
-                            return float(closest_data.iloc[-1]['Close'])
-                        # Use latest available
-                        return float(today_data.iloc[-1]['Close'])
+                today_data = today_data if today_data is not None else self.get_today_bars(ticker, '1m')
+                if today_data is not None:
+                    return self.current_price_from_bars(today_data)
             except:
                 pass
             
-            # Fallback: use info API
-            try:
-                info = stock.info
-                current_price = info.get('currentPrice') or info.get('regularMarketPrice')
-                if current_price:
-                    return float(current_price)
-            except:
-                pass
+            # Fallback: use latest quote
+            current_price = self.market_data.get_quote(ticker).get('price')
+            if current_price:
+                PRICE_FALLBACKS.inc(price='current', source='quote')
+                return float(current_price)
             
             # Last resort: use latest history
             try:
-                hist = stock.history(period="1d", interval="5m")
-                if not hist.empty:
-                    return float(hist.iloc[-1]['Close'])
+                today_data = self.get_today_bars(ticker, '5m')
+                if today_data is not None:
+                    PRICE_FALLBACKS.inc(price='current', source='5m')
+                    return float(today_data.close[-1])
             except:
                 pass
             
@@ -139,10 +238,14 @@ class MomentumStrategy:
             print(f"Error getting current price for {ticker}: {e}")
             return None
     
-    def calculate_momentum(self, ticker):
-        """Calculate price movement from open to current (30 min after open)"""
-        open_price = self.get_market_open_price(ticker)
-        current_price = self.get_current_price(ticker)
+    def calculate_momentum(self, ticker, today_data=None):
+        """Calculate price movement from open to current (30 min after open)
+        
+        today_data may hold the ticker's 1-minute bars from a batched fetch;
+        without it the prices are fetched for this ticker alone.
+        """
+        open_price = self.get_market_open_price(ticker, today_data)
+        current_price = self.get_current_price(ticker, today_data)
         
         if not open_price or not current_price:
             return None
@@ -157,37 +260,108 @@ class MomentumStrategy:
             'open_price': open_price,
             'current_price': current_price,
             'change_percent': change_percent,
+            'dollar_volume': self.dollar_volume_from_bars(today_data) if today_data is not None else None,
             'qualifies': change_percent > self.momentum_threshold
         }
     
-    def analyze_all_stocks(self):
-        """Analyze all stocks to find those with >2% gain after 30 minutes"""
+    def analyze_all_stocks(self, save_snapshot=False):
+        """Analyze all stocks to find those with >2% gain after 30 minutes
+        
+        Returns (qualifying, scan): the qualifying momentum dicts and a
+        ScanResults with every ticker's result in columnar form. Results
+        are reduced as they stream out of the scan, so memory stays small
+        for any universe size. With SCAN_SHARDS > 1 the universe is split
+        into shards that scan workers lease through the database (see
+        scan_shards.py). save_snapshot stores the day's scan snapshot; only
+        the trading run sets it, so dashboard scans don't replace it.
+        """
         tickers = self.load_stock_list()
         print(f"Analyzing {len(tickers)} stocks for 30-minute momentum...")
         
-        qualifying_stocks = []
-        results = []
-        
-        for i, ticker in enumerate(tickers):
-            if i % 100 == 0:
-                print(f"Progress: {i}/{len(tickers)} stocks analyzed")
+        now = self.market_data.now()
+        self.last_scan_at = now
+        scan_start = time.perf_counter()
+        
+        if Config.SCAN_SHARDS > 1:
+            from scan_shards import ShardCoordinator
+            scan = ShardCoordinator(self).scan(tickers, now)
+        else:
+            scan = ScanResults(tickers)
+            for momentum_data in self.iter_momentum(tickers, now):
+                scan.add(momentum_data)
+        
+        record_scan('momentum', len(tickers), time.perf_counter() - scan_start)
+        print(f"\nFound {len(scan.qualifying)} stocks with >{self.momentum_threshold}% gain")
+        if save_snapshot and Config.SAVE_SCAN_SNAPSHOTS:
+            save_scan(scan, now, threshold=self.momentum_threshold)
+        return scan.qualifying, scan
+    
+    def iter_momentum(self, tickers, now, on_batch=None):
+        """Momentum dicts for a list of tickers, yielded batch by batch
+        
+        Only one batch of bars is fetched at a time. on_batch is called
+        after every batch (shard workers renew their lease there).
+        """
+        batch_size = Config.SCAN_BATCH_SIZE
+        qualifying = 0
+        
+        for batch_start in range(0, len(tickers), batch_size):
+            print(f"Progress: {batch_start}/{len(tickers)} stocks analyzed")
+            log_event('scan_progress', scan='momentum', done=batch_start, total=len(tickers),
+                      qualifying=qualifying)
+            batch = tickers[batch_start:batch_start + batch_size]
             
-            momentum_data = self.calculate_momentum(ticker)
+            # One request for the whole batch (only the delta when warmup cached it)
+            batch_bars = self.get_batch_bars(batch, now)
             
-            if momentum_data:
-                results.append(momentum_data)
+            for ticker in batch:
+                momentum_data = self.calculate_momentum(ticker, batch_bars.get(ticker))
                 
-                if momentum_data['qualifies']:
-                    qualifying_stocks.append(momentum_data)
-                    print(f"✅ {ticker}: {momentum_data['change_percent']:.2f}% gain")
+                if momentum_data:
+                    if momentum_data['qualifies']:
+                        qualifying += 1
+                        print(f"✅ {ticker}: {momentum_data['change_percent']:.2f}% gain")
+                    yield momentum_data
             
-            # Rate limiting
-            time.sleep(0.1)
-        
-        print(f"\nFound {len(qualifying_stocks)} stocks with >{self.momentum_threshold}% gain")
-        return qualifying_stocks, results
+            if on_batch:
+                on_batch()
+            
+            # Rate limiting between batches
+            time.sleep(Config.SCAN_BATCH_DELAY)
     
-    def close_all_positions(self):
+    def _submit_once(self, checkpoint, ticker, kind, qty, send, strategy=None):
+        """Send an order at most once per trading day, ticker and kind
+        
+        send(client_order_id) places the order; without a checkpoint it is
+        simply sent. Returns (order, resumed) where resumed means the order
+        already reached the broker in an earlier attempt.
+        """
+        if checkpoint is None:
+            return send(None), False
+        
+        existing = checkpoint.order(ticker, kind)
+        if existing and existing['status'] == 'submitted':
+            return {'id': existing['broker_order_id'], 'filled_avg_price': existing['filled_avg_price'],
+                    'stop_price': existing['stop_price']}, True
+        
+        client_order_id = checkpoint.client_order_id(ticker, kind)
+        if existing:
+            # The last attempt died mid-send or was rejected; only the broker knows if the order exists
+            found = self.alpaca.get_order_by_client_id(client_order_id)
+            if found:
+                checkpoint.finish_order(client_order_id, 'submitted', found)
+                if kind != 'stop' and found['filled_avg_price']:
+                    self.alpaca.record_trade(ticker, qty, 'buy' if kind == 'buy' else 'sell',
+                                             found['filled_avg_price'], strategy=strategy,
+                                             client_order_id=client_order_id)
+                return found, True
+        
+        checkpoint.begin_order(ticker, kind, qty)
+        order = send(client_order_id)
+        checkpoint.finish_order(client_order_id, 'submitted' if order else 'failed', order)
+        return order, False
+    
+    def close_all_positions(self, checkpoint=None):
         """Close all open positions before starting new day trades"""
         print("\n" + "=" * 60)
         print("🔄 Closing All Existing Positions")
@@ -201,6 +375,12 @@ class MomentumStrategy:
         
         print(f"Found {len(positions)} open positions to close...")
         
+        # Open sell orders (yesterday's GTC stop-losses) hold the shares, so cancel them first
+        open_sells = {}
+        for order in self.alpaca.get_orders(status='open'):
+            if str(getattr(order['side'], 'value', order['side'])).lower() == 'sell':
+                open_sells.setdefault(order['symbol'], []).append(order['id'])
+        
         closed_count = 0
         error_count = 0
         
@@ -211,8 +391,14 @@ class MomentumStrategy:
             print(f"\n📤 Closing {qty} shares of {symbol}...")
             
             try:
+                for order_id in open_sells.get(symbol, []):
+                    self.alpaca.cancel_order(order_id)
+                
                 # Place market sell order
-                order = self.alpaca.place_market_order(symbol, qty, 'sell')
+                order, _ = self._submit_once(
+                    checkpoint, symbol, 'close', qty,
+                    lambda client_order_id: self.alpaca.place_market_order(symbol, qty, 'sell',
+                                                                           client_order_id=client_order_id))
                 
                 if order:
                     print(f"   ✅ Successfully closed {symbol}")
@@ -226,7 +412,7 @@ class MomentumStrategy:
                 error_count += 1
             
             # Small delay between orders
-            time.sleep(0.5)
+            time.sleep(Config.ORDER_DELAY_SECONDS)
         
         print(f"\n✅ Closed {closed_count} positions")
         if error_count > 0:
@@ -234,69 +420,56 @@ class MomentumStrategy:
         
         # Wait a moment for orders to settle
         print("\n⏳ Waiting for orders to settle...")
-        time.sleep(2)
+        time.sleep(Config.ORDER_SETTLE_SECONDS)
         
         return {'closed': closed_count, 'errors': error_count}
     
-    def calculate_position_size(self, account_balance, num_stocks, price_per_share):
-        """Calculate how many shares to buy for each stock"""
-        if num_stocks == 0 or account_balance <= 0:
-            return 0
-        
-        # Use 100% of buying power for maximum capital utilization
-        available_cash = account_balance
-        
-        # Distribute evenly across all qualifying stocks
-        cash_per_stock = available_cash / num_stocks
-        
-        # Calculate shares (round down to whole shares)
-        shares = int(cash_per_stock / price_per_share)
-        
-        return max(1, shares)  # At least 1 share
-    
-    def purchase_stocks(self, qualifying_stocks):
-        """Purchase all qualifying stocks using 100% of available funds"""
+    def purchase_stocks(self, qualifying_stocks, buying_power=None, strategy=None, max_positions=None,
+                        checkpoint=None, signal_at=None):
+        """Purchase qualifying stocks in priority order using the allocation plan
+        
+        buying_power caps the capital used (default: the account's buying
+        power) and strategy is recorded on each trade for attribution. With
+        a checkpoint the plan is stored on first use and reused on resume,
+        and orders already sent are not sent again. signal_at is the time of
+        the quotes the plan is priced from (default: the latest scan).
+        """
         if not qualifying_stocks:
             print("No qualifying stocks to purchase")
             return []
         
-        # Get account balance
-        account = self.alpaca.get_account()
-        if not account:
-            print("Error: Could not get account information")
-            return []
-        
-        initial_buying_power = account['buying_power']
+        signal_at = signal_at or self.last_scan_at
+        state = checkpoint.state() if checkpoint else None
+        if state and state['planned']:
+            buying_power = state['buying_power']
+        elif buying_power is None:
+            # Get account balance
+            account = self.alpaca.get_account()
+            if not account:
+                print("Error: Could not get account information")
+                return []
+            buying_power = account['buying_power']
+        
+        initial_buying_power = buying_power
         print(f"\nAvailable buying power: ${initial_buying_power:,.2f}")
-        print(f"Using 100% of available funds for maximum capital utilization")
         
-        # Pre-calculate all position sizes based on initial buying power
-        num_stocks = len(qualifying_stocks)
-        position_plans = []
-        total_planned_cost = 0
-        
-        for stock_data in qualifying_stocks:
-            ticker = stock_data['ticker']
-            current_price = stock_data['current_price']
-            
-            # Calculate shares to buy
-            shares = self.calculate_position_size(initial_buying_power, num_stocks, current_price)
-            
-            # Calculate cost
-            cost = shares * current_price
-            total_planned_cost += cost
-            
-            position_plans.append({
-                'ticker': ticker,
-                'shares': shares,
-                'estimated_price': current_price,
-                'estimated_cost': cost
-            })
+        # Rank by momentum and liquidity and solve share counts for the whole list at once
+        max_positions = self.max_positions if max_positions is None else max_positions
+        if state and state['planned']:
+            position_plans = state['plan']
+        else:
+            position_plans = plan_purchases(qualifying_stocks, initial_buying_power, max_positions)
+            if checkpoint:
+                checkpoint.save_plan(position_plans, initial_buying_power)
+        total_planned_cost = sum(plan['estimated_cost'] for plan in position_plans)
+        dropped = len(qualifying_stocks) - len(position_plans)
         
         print(f"\n📊 Position Plan:")
-        print(f"   Stocks to purchase: {num_stocks}")
+        print(f"   Stocks to purchase: {len(position_plans)} of {len(qualifying_stocks)} qualifying")
+        if dropped:
+            print(f"   Not allocated (position cap, minimum size or price): {dropped}")
         print(f"   Total planned investment: ${total_planned_cost:,.2f}")
-        print(f"   Capital utilization: {(total_planned_cost / initial_buying_power * 100):.1f}%")
+        print(f"   Capital utilization: {(total_planned_cost / initial_buying_power * 100 if initial_buying_power > 0 else 0):.1f}%")
         
         # Execute purchases
         purchases = []
@@ -313,23 +486,34 @@ class MomentumStrategy:
                 print(f"   Needed: ${estimated_cost:.2f}, Available: ${remaining_buying_power:.2f}")
                 continue
             
-            print(f"\n📈 Purchasing {shares} shares of {ticker} at ~${estimated_price:.2f}")
+            print(f"\n📈 #{plan['rank']} Purchasing {shares} shares of {ticker} at ~${estimated_price:.2f}")
             print(f"   Estimated cost: ${estimated_cost:.2f}")
             
+            resumed = False
             try:
-                # Place market order
-                order = self.alpaca.place_market_order(ticker, shares, 'buy')
+                # Place market order (once per day and ticker when checkpointed)
+                order, resumed = self._submit_once(
+                    checkpoint, ticker, 'buy', shares,
+                    lambda client_order_id: self.alpaca.place_market_order(ticker, shares, 'buy', strategy=strategy,
+                                                                           client_order_id=client_order_id,
+                                                                           estimated_price=estimated_price,
+                                                                           signal_at=signal_at),
+                    strategy=strategy)
                 
                 if order:
+                    if resumed:
+                        print(f"   ♻️  Already purchased in an earlier attempt")
                     purchase_price = float(order.get('filled_avg_price') or estimated_price)
                     actual_cost = shares * purchase_price
                     
                     # Set stop-loss order
                     stop_loss_price = purchase_price * (1 - self.stop_loss_percent / 100)
-                    stop_loss_set = self.set_stop_loss(ticker, shares, stop_loss_price)
+                    stop_loss_set = self.set_stop_loss(ticker, shares, stop_loss_price, strategy=strategy,
+                                                       checkpoint=checkpoint)
                     
                     purchases.append({
                         'ticker': ticker,
+                        'strategy': strategy,
                         'shares': shares,
                         'purchase_price': purchase_price,
                         'stop_loss_price': stop_loss_price,
@@ -347,17 +531,23 @@ class MomentumStrategy:
             except Exception as e:
                 print(f"   ❌ Error purchasing {ticker}: {e}")
             
-            # Small delay between orders
-            time.sleep(0.5)
+            # Small delay between orders (nothing was sent for a resumed order)
+            if not resumed:
+                time.sleep(Config.ORDER_DELAY_SECONDS)
         
         return purchases
     
-    def set_stop_loss(self, symbol, qty, stop_price):
+    def set_stop_loss(self, symbol, qty, stop_price, strategy=None, checkpoint=None):
         """Set a stop-loss order at 1% below purchase price"""
         try:
             # Use AlpacaClient's stop-loss method
-            order = self.alpaca.place_stop_loss_order(symbol, qty, stop_price)
+            order, resumed = self._submit_once(
+                checkpoint, symbol, 'stop', qty,
+                lambda client_order_id: self.alpaca.place_stop_loss_order(symbol, qty, stop_price,
+                                                                          client_order_id=client_order_id))
             
+            if order and resumed:
+                return True
             if order:
                 # Save to database
                 db = SessionLocal()
@@ -367,6 +557,7 @@ class MomentumStrategy:
                         action='stop_loss',
                         quantity=qty,
                         price=stop_price,
+                        strategy=strategy,
                         timestamp=datetime.utcnow()
                     )
                     db.add(trade)
@@ -384,40 +575,77 @@ class MomentumStrategy:
             return False
     
     def execute_daily_strategy(self):
-        """Execute the complete daily trading strategy"""
+        """Execute the complete daily trading strategy
+        
+        With RUN_CHECKPOINTS (default on) the run is recorded per trading
+        day (run_checkpoint.py): calling it again the same day resumes where
+        the last attempt stopped, and a completed run is not repeated.
+        """
         print("=" * 60)
         print("🚀 Starting 30-Minute Momentum Strategy")
         print("=" * 60)
-        print(f"Time: {datetime.now(self.est).strftime('%Y-%m-%d %H:%M:%S %Z')}")
+        print(f"Time: {self.market_data.now().strftime('%Y-%m-%d %H:%M:%S %Z')}")
         print()
         
+        checkpoint = RunCheckpoint.open(self.market_data.now().date()) if Config.RUN_CHECKPOINTS else None
+        state = checkpoint.state() if checkpoint else None
+        if state and state['complete']:
+            print("✅ Today's run already completed; nothing to do")
+            return {**state['summary'], 'already_completed': True}
+        
         # Step 0: Close all existing positions first
-        close_result = self.close_all_positions()
+        if state and state['liquidated']:
+            print("♻️  Positions were already closed in an earlier attempt")
+            close_result = {'closed': state['positions_closed'], 'errors': 0}
+        else:
+            with STAGE_DURATION.time(stage='close_all_positions'):
+                close_result = self.close_all_positions(checkpoint)
+            log_event('stage_complete', stage='close_all_positions', **close_result)
+            if checkpoint:
+                checkpoint.mark_liquidated(close_result['closed'])
         
         # Step 1: Analyze all stocks
-        qualifying_stocks, all_results = self.analyze_all_stocks()
+        if state and state['scanned']:
+            print(f"♻️  Reusing the earlier scan: {len(state['qualifying'])} qualifying stocks")
+            qualifying_stocks, analyzed_count = state['qualifying'], state['analyzed_count']
+            self.last_scan_at = state['scanned_at']
+        else:
+            with STAGE_DURATION.time(stage='analyze_all_stocks'):
+                qualifying_stocks, scan = self.analyze_all_stocks(save_snapshot=True)
+            analyzed_count = len(scan)
+            log_event('stage_complete', stage='analyze_all_stocks', analyzed=analyzed_count,
+                      qualifying=len(qualifying_stocks))
+            if checkpoint:
+                checkpoint.mark_scanned(qualifying_stocks, analyzed_count)
+        # The entry scan was the bar cache's reader; don't hold the universe's bars until tomorrow
+        self.release_bar_cache()
         
         if not qualifying_stocks:
             print("\n❌ No stocks qualify for purchase today")
-            return {
+            result = {
                 'success': False,
                 'message': 'No qualifying stocks found',
                 'qualifying_count': 0,
                 'positions_closed': close_result['closed'],
                 'purchases': []
             }
+            if checkpoint:
+                checkpoint.complete(result)
+            return result
         
         # Step 2: Purchase qualifying stocks
         print(f"\n💰 Purchasing {len(qualifying_stocks)} qualifying stocks...")
-        purchases = self.purchase_stocks(qualifying_stocks)
+        with STAGE_DURATION.time(stage='purchase_stocks'):
+            purchases = self.purchase_stocks(qualifying_stocks, checkpoint=checkpoint)
+        log_event('stage_complete', stage='purchase_stocks', purchased=len(purchases))
         
         # Step 3: Summary
         print("\n" + "=" * 60)
         print("📊 Strategy Execution Summary")
         print("=" * 60)
         print(f"Positions closed: {close_result['closed']}")
-        print(f"Stocks analyzed: {len(all_results)}")
-        print(f"Stocks qualifying (>2% gain): {len(qualifying_stocks)}")
+        print(f"Stocks analyzed: {analyzed_count}")
+        print(f"Stocks qualifying (>{self.momentum_threshold}% gain): {len(qualifying_stocks)}")
         print(f"Stocks purchased: {len(purchases)}")
         print(f"Stop-loss orders set: {sum(1 for p in purchases if p['stop_loss_set'])}")
         
@@ -431,7 +659,7 @@ class MomentumStrategy:
             utilization = (total_invested / (total_invested + account['buying_power'])) * 100 if (total_invested + account['buying_power']) > 0 else 0
             print(f"Capital utilization: {utilization:.1f}%")
         
-        return {
+        result = {
             'success': True,
             'positions_closed': close_result['closed'],
             'qualifying_count': len(qualifying_stocks),
@@ -440,6 +668,9 @@ class MomentumStrategy:
             'total_invested': total_invested,
             'capital_utilization': utilization if account else 0
         }
+        if checkpoint:
+            checkpoint.complete(result)
+        return result
 
 if __name__ == "__main__":
     strategy = MomentumStrategy()
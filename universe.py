@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Nightly universe pre-filter.
+
+Narrows Stock_list.csv to an "active universe" the 10:00 scan can afford to
+check. A ticker is kept when it:
+
+- closed at or above UNIVERSE_MIN_PRICE
+- averaged at least UNIVERSE_MIN_AVG_VOLUME shares a day over the last
+  UNIVERSE_LOOKBACK_DAYS sessions
+- is an active, tradable Alpaca asset (and shortable when
+  UNIVERSE_REQUIRE_SHORTABLE is set)
+
+Survivors are ranked by average dollar volume and written to
+ACTIVE_UNIVERSE_FILE. With UNIVERSE_PREFILTER=true the scheduler rebuilds
+the file after each close and the strategy scans it instead of the full
+list, for as long as the file is fresher than UNIVERSE_MAX_AGE_HOURS.
+
+A rebuild that got daily data for fewer than UNIVERSE_MIN_COVERAGE of the
+tickers (a data outage, not a quiet market), or that kept none of them,
+leaves the previous file in place. An active universe file without rows
+is never scanned; the full list is used instead.
+
+    python universe.py                # build the active universe now
+"""
+
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+import pandas as pd
+from config import Config
+from market_data import get_market_data_provider
+
+_has_rows = None  # (path, mtime, bool) for the last active universe file checked
+
+
+def load_tickers(path=None):
+    df = pd.read_csv(path or Config.STOCK_LIST_FILE)
+    tickers = df['Ticker'].dropna().unique().tolist()
+    return [t for t in tickers if isinstance(t, str) and len(t) > 0]
+
+
+def liquidity_stats(tickers, provider=None, lookback_days=None):
+    """Last close, average volume and average dollar volume per ticker from daily bars"""
+    provider = provider or get_market_data_provider()
+    lookback_days = lookback_days or Config.UNIVERSE_LOOKBACK_DAYS
+    # Calendar days covering the lookback in sessions, with room for holidays
+    start = provider.now() - timedelta(days=int(lookback_days * 1.6) + 5)
+    stats = {}
+
+    for batch_start in range(0, len(tickers), Config.SCAN_BATCH_SIZE):
+        print(f"Pre-filter progress: {batch_start}/{len(tickers)} tickers")
+        batch = tickers[batch_start:batch_start + Config.SCAN_BATCH_SIZE]
+        bars = provider.get_bars(batch, start, interval='1d')
+        for ticker, df in bars.items():
+            df = df.dropna(subset=['Close']).tail(lookback_days)
+            if df.empty:
+                continue
+            stats[ticker] = {
+                'price': float(df['Close'].iloc[-1]),
+                'avg_volume': float(df['Volume'].mean()),
+                'avg_dollar_volume': float((df['Close'] * df['Volume']).mean()),
+                'sessions': len(df)
+            }
+        time.sleep(Config.SCAN_BATCH_DELAY)
+    return stats
+
+
+def build_active_universe(tickers=None, provider=None, alpaca=None, output=None):
+    """Filter and rank the stock list; returns the active universe as a DataFrame
+
+    Returns None and keeps the previous file when too few tickers had data
+    or none passed the filters.
+    """
+    tickers = tickers if tickers is not None else load_tickers()
+    output = output or Config.ACTIVE_UNIVERSE_FILE
+    print(f"Pre-filtering {len(tickers)} tickers...")
+
+    stats = liquidity_stats(tickers, provider)
+    coverage = len(stats) / len(tickers) if tickers else 0.0
+    if coverage < Config.UNIVERSE_MIN_COVERAGE:
+        print(f"⚠️  Only {len(stats)}/{len(tickers)} tickers had daily data; keeping the previous active universe")
+        return None
+
+    if alpaca is None:
+        from alpaca_client import AlpacaClient
+        alpaca = AlpacaClient()
+    assets = alpaca.get_assets()
+    if assets is None:
+        print("⚠️  Could not list broker assets; skipping the tradability filter")
+
+    rows = []
+    rejected = {'no_data': 0, 'price': 0, 'volume': 0, 'untradable': 0, 'not_shortable': 0}
+    for ticker in tickers:
+        stat = stats.get(ticker)
+        if stat is None:
+            rejected['no_data'] += 1
+            continue
+        if stat['price'] < Config.UNIVERSE_MIN_PRICE:
+            rejected['price'] += 1
+            continue
+        if stat['avg_volume'] < Config.UNIVERSE_MIN_AVG_VOLUME:
+            rejected['volume'] += 1
+            continue
+        asset = assets.get(ticker) if assets is not None else None
+        if assets is not None and (asset is None or not asset['tradable']):
+            rejected['untradable'] += 1
+            continue
+        if Config.UNIVERSE_REQUIRE_SHORTABLE and assets is not None and not asset['shortable']:
+            rejected['not_shortable'] += 1
+            continue
+        rows.append({
+            'Ticker': ticker,
+            'Price': round(stat['price'], 4),
+            'AvgVolume': round(stat['avg_volume']),
+            'AvgDollarVolume': round(stat['avg_dollar_volume'], 2),
+            'Shortable': asset['shortable'] if asset else None
+        })
+
+    universe = pd.DataFrame(rows, columns=['Ticker', 'Price', 'AvgVolume', 'AvgDollarVolume', 'Shortable'])
+    universe = universe.sort_values('AvgDollarVolume', ascending=False).reset_index(drop=True)
+    universe.insert(1, 'Rank', range(1, len(universe) + 1))
+    if universe.empty:
+        print(f"⚠️  No tickers passed the filters ({', '.join(f'{k}={v}' for k, v in rejected.items())}); "
+              f"keeping the previous active universe")
+        return None
+
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    tmp_path = f"{output}.tmp"
+    universe.to_csv(tmp_path, index=False)
+    os.replace(tmp_path, output)  # the scan never sees a half-written file
+
+    print(f"✅ Active universe: {len(universe)}/{len(tickers)} tickers written to {output}")
+    print(f"   Rejected: {', '.join(f'{k}={v}' for k, v in rejected.items())}")
+    return universe
+
+
+def active_universe_path():
+    """ACTIVE_UNIVERSE_FILE if pre-filtering is enabled and the file is fresh and has rows, else None"""
+    global _has_rows
+    if not Config.UNIVERSE_PREFILTER:
+        return None
+    path = Config.ACTIVE_UNIVERSE_FILE
+    if not os.path.exists(path):
+        return None
+    age_hours = (time.time() - os.path.getmtime(path)) / 3600
+    if age_hours > Config.UNIVERSE_MAX_AGE_HOURS:
+        print(f"⚠️  Active universe is {age_hours:.0f}h old; scanning the full stock list")
+        return None
+    mtime = os.path.getmtime(path)
+    if _has_rows is None or _has_rows[:2] != (path, mtime):
+        try:
+            has_rows = not pd.read_csv(path, usecols=['Ticker'])['Ticker'].dropna().empty
+        except Exception as e:
+            print(f"Error reading active universe: {e}")
+            has_rows = False
+        _has_rows = (path, mtime, has_rows)
+    if not _has_rows[2]:
+        print("⚠️  Active universe has no tickers; scanning the full stock list")
+        return None
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the pre-filtered active universe")
+    parser.add_argument('--stock-list', default=Config.STOCK_LIST_FILE)
+    parser.add_argument('--output', default=Config.ACTIVE_UNIVERSE_FILE)
+    args = parser.parse_args()
+
+    started = datetime.now()
+    build_active_universe(load_tickers(args.stock_list), output=args.output)
+    print(f"Finished in {(datetime.now() - started).total_seconds():.1f}s")
+
+
+if __name__ == "__main__":
+    main()